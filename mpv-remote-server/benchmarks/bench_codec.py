@@ -0,0 +1,213 @@
+"""Micro-benchmark of the IPC / WebSocket codec against the previous path.
+
+Each scenario runs the same messages through the way they used to be
+handled (str decode, json module, pydantic validation and model_dump) and
+through services.codec, and reports messages per second for both. Runs
+in-process; no mpv and no sockets involved.
+
+    cd mpv-remote-server
+    python -m benchmarks.bench_codec
+    python -m benchmarks.bench_codec --messages 20000 --repeat 7
+"""
+
+import argparse
+import json
+import time
+from typing import Callable, Dict, List, Tuple
+
+from models.model import MPVCommand, MPVResponse
+from services.codec import (
+    JSON_BACKEND,
+    LineFramer,
+    command_payload,
+    dumps_text,
+    encode_line,
+    loads,
+    response_dict,
+    to_response,
+)
+from services.mpv_ipc import READ_CHUNK_BYTES, STREAM_LIMIT
+from services.mpv_manager import POLLED_PROPERTIES
+
+SAMPLE_STATE = {
+    "time-pos": 612.418,
+    "duration": 1440.0,
+    "pause": False,
+    "volume": 100.0,
+    "title": "Episode 07 - Größe.mkv",
+    "path": "/media/anime/Show/Episode 07.mkv",
+    "aid": 1,
+    "sid": 2,
+    "track-list": [
+        {"id": 1, "type": "audio", "lang": "jpn", "codec": "aac", "selected": True},
+        {"id": 1, "type": "sub", "lang": "eng", "codec": "ass", "selected": False},
+        {"id": 2, "type": "sub", "lang": "ger", "codec": "ass", "selected": True},
+    ],
+}
+
+
+def ipc_stream(messages: int) -> List[bytes]:
+    """What mpv writes back: replies interleaved with property-change
+    events, cut into socket sized chunks"""
+    lines = []
+    for i in range(messages):
+        if i % 2:
+            lines.append(
+                {
+                    "event": "property-change",
+                    "id": 1,
+                    "name": "time-pos",
+                    "data": i / 10,
+                }
+            )
+        else:
+            lines.append({"data": i / 10, "request_id": i, "error": "success"})
+    data = "".join(json.dumps(line) + "\n" for line in lines).encode()
+    return [
+        data[i : i + READ_CHUNK_BYTES] for i in range(0, len(data), READ_CHUNK_BYTES)
+    ]
+
+
+def legacy_decode(chunks: List[bytes]) -> int:
+    """readline framing, then strip, json.loads and MPVResponse(**res)"""
+    count = 0
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines[-1]
+        for line in lines[:-1]:
+            line_str = line.decode().strip()
+            if not line_str:
+                continue
+            message = json.loads(line_str)
+            if "event" not in message:
+                MPVResponse(**message)
+            count += 1
+    return count
+
+
+def codec_decode(chunks: List[bytes]) -> int:
+    count = 0
+    framer = LineFramer(STREAM_LIMIT)
+    for chunk in chunks:
+        for line in framer.feed(chunk):
+            message = loads(line)
+            if "event" not in message:
+                to_response(message)
+            count += 1
+    return count
+
+
+def legacy_encode(messages: int) -> int:
+    cmd = MPVCommand(command=["get_property", "time-pos"], **{})
+    for request_id in range(messages):
+        cmd_dict = cmd.model_dump(exclude_none=True, by_alias=True)
+        cmd_dict["request_id"] = request_id
+        (json.dumps(cmd_dict) + "\n").encode()
+    return messages
+
+
+def codec_encode(messages: int) -> int:
+    cmd = MPVCommand(command=["get_property", "time-pos"], **{})
+    for request_id in range(messages):
+        encode_line(command_payload(cmd, request_id))
+    return messages
+
+
+def legacy_state_push(messages: int) -> int:
+    for _ in range(messages):
+        json.dumps(
+            [
+                {
+                    "command": ["get_property", name],
+                    "data": MPVResponse(
+                        error="success"
+                        if SAMPLE_STATE.get(name) is not None
+                        else "property unavailable",
+                        data=SAMPLE_STATE.get(name),
+                    ).model_dump(),
+                }
+                for name in POLLED_PROPERTIES
+            ]
+        )
+    return messages
+
+
+def codec_state_push(messages: int) -> int:
+    for _ in range(messages):
+        dumps_text(
+            [
+                {
+                    "command": ["get_property", name],
+                    "data": response_dict(
+                        "success"
+                        if SAMPLE_STATE.get(name) is not None
+                        else "property unavailable",
+                        SAMPLE_STATE.get(name),
+                    ),
+                }
+                for name in POLLED_PROPERTIES
+            ]
+        )
+    return messages
+
+
+def measure(run: Callable[[], int], repeat: int) -> float:
+    """Best-of-``repeat`` messages per second"""
+    rates = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = run()
+        rates.append(count / (time.perf_counter() - started))
+    return max(rates)
+
+
+def main(args):
+    chunks = ipc_stream(args.messages)
+    scenarios: Dict[str, Tuple[Callable[[], int], Callable[[], int]]] = {
+        "ipc decode": (
+            lambda: legacy_decode(chunks),
+            lambda: codec_decode(chunks),
+        ),
+        "ipc encode": (
+            lambda: legacy_encode(args.messages),
+            lambda: codec_encode(args.messages),
+        ),
+        "state push": (
+            lambda: legacy_state_push(args.messages // 10),
+            lambda: codec_state_push(args.messages // 10),
+        ),
+    }
+
+    print(f"JSON backend: {JSON_BACKEND}")
+    results = []
+    for scenario, (legacy, codec) in scenarios.items():
+        legacy_best = measure(legacy, args.repeat)
+        codec_best = measure(codec, args.repeat)
+        speedup = codec_best / legacy_best
+        print(
+            f"{scenario:<12} legacy={legacy_best:>12,.0f} msg/s  "
+            f"codec={codec_best:>12,.0f} msg/s  x{speedup:.2f}"
+        )
+        results.append(
+            {
+                "scenario": scenario,
+                "backend": JSON_BACKEND,
+                "legacy_per_sec": round(legacy_best, 1),
+                "codec_per_sec": round(codec_best, 1),
+                "speedup": round(speedup, 2),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+
+    main(parser.parse_args())
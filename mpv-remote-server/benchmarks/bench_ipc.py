@@ -0,0 +1,227 @@
+"""IPC latency benchmarks against the fake mpv server.
+
+Measures MPVManager.send_command throughput and p50/p99 latency, and state
+WebSocket fan-out through the state hub, for 1, 10 and 100 concurrent
+clients. Runs headless; no mpv binary is needed.
+
+    cd mpv-remote-server
+    python -m benchmarks.bench_ipc
+    python -m benchmarks.bench_ipc --clients 1,10 --requests 2000 --delay 0.0005
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+from benchmarks.fake_mpv import FakeMPVServer
+from config import settings
+from models.model import MPVCommand, MPVInstance, MPVStatus
+from services.mpv_manager import mpv_manager
+from services.state_hub import state_hub
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "ops_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99_ms": round(
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3
+        ),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+
+def attach_fake_instance(pipe_name: str) -> str:
+    """Register a RUNNING instance whose IPC socket is the fake server"""
+    instance_id = pipe_name.removeprefix("mpvsocket_")
+    mpv_manager.instances[instance_id] = MPVInstance(
+        id=instance_id,
+        pipeName=pipe_name,
+        status=MPVStatus.RUNNING,
+        lastSeen=datetime.now(),
+    )
+    return instance_id
+
+
+async def detach_instance(instance_id: str):
+    instance = mpv_manager.instances.pop(instance_id, None)
+    if instance:
+        await mpv_manager._close_connection(instance)
+
+
+async def bench_connect_per_command(path: str, clients: int, requests: int):
+    """The pre-multiplexing engine: a fresh socket per command, for comparison"""
+    latencies: List[float] = []
+    per_client = max(1, requests // clients)
+    request_ids = iter(range(10**9))
+
+    async def one_command():
+        request_id = next(request_ids)
+        reader, writer = await asyncio.open_unix_connection(path)
+        try:
+            payload = {
+                "command": ["get_property", "time-pos"],
+                "request_id": request_id,
+            }
+            writer.write((json.dumps(payload) + "\n").encode())
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if json.loads(line).get("request_id") == request_id:
+                    return
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def worker():
+        for _ in range(per_client):
+            started = time.perf_counter()
+            await one_command()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(clients)])
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def bench_send_command(instance_id: str, clients: int, requests: int):
+    latencies: List[float] = []
+    per_client = max(1, requests // clients)
+    cmd = MPVCommand(command=["get_property", "time-pos"], **{})
+
+    async def worker():
+        for _ in range(per_client):
+            started = time.perf_counter()
+            await mpv_manager.send_command(instance_id, cmd)
+            latencies.append(time.perf_counter() - started)
+
+    # Warm up the persistent connection so setup is not measured
+    await mpv_manager.send_command(instance_id, cmd)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(clients)])
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def bench_fanout(
+    server: FakeMPVServer, instance_id: str, clients: int, updates: int, rate: float
+):
+    """Drive time-pos changes on the fake server and time their delivery to
+    every state hub subscriber."""
+    changed_at: Dict[float, float] = {}
+    latencies: List[float] = []
+    received = 0
+
+    subscribers = [state_hub.subscribe(instance_id) for _ in range(clients)]
+
+    async def consume(subscriber):
+        nonlocal received
+        while True:
+            message = await subscriber.queue.get()
+            if message is None:
+                return
+            arrived = time.perf_counter()
+            for entry in json.loads(message):
+                if entry["command"][1] == "time-pos":
+                    position = entry["data"]["data"]
+                    if position in changed_at:
+                        received += 1
+                        latencies.append(arrived - changed_at[position])
+
+    consumers = [asyncio.create_task(consume(s)) for s in subscribers]
+    await asyncio.sleep(0.2)
+
+    started = time.perf_counter()
+    for i in range(1, updates + 1):
+        position = float(i)
+        changed_at[position] = time.perf_counter()
+        server.set_property("time-pos", position)
+        await asyncio.sleep(1 / rate)
+    await asyncio.sleep(settings.state_push_interval * 2)
+    elapsed = time.perf_counter() - started
+
+    for subscriber in subscribers:
+        state_hub.unsubscribe(instance_id, subscriber)
+    for consumer in consumers:
+        consumer.cancel()
+
+    result = summarize(latencies or [0.0], elapsed)
+    result["delivered"] = received
+    result["dropped"] = sum(s.dropped for s in subscribers)
+    return result
+
+
+def print_row(scenario: str, clients: int, result: Dict[str, float]):
+    extra = ""
+    if "delivered" in result:
+        extra = f"  delivered={result['delivered']}  dropped={result['dropped']}"
+    print(
+        f"{scenario:<24} clients={clients:<4} ops/s={result['ops_per_sec']:<10} "
+        f"p50={result['p50_ms']:<8}ms p99={result['p99_ms']:<8}ms{extra}"
+    )
+
+
+async def main(args):
+    pipe_name = f"mpvsocket_bench-{uuid.uuid4().hex[:8]}"
+    path = f"/tmp/{pipe_name}"
+    clients_levels = [int(c) for c in args.clients.split(",")]
+    settings.state_push_interval = args.push_interval
+    results = []
+
+    async with FakeMPVServer(path, response_delay=args.delay) as server:
+        instance_id = attach_fake_instance(pipe_name)
+        try:
+            for clients in clients_levels:
+                if not args.skip_baseline:
+                    result = await bench_connect_per_command(
+                        path, clients, args.requests
+                    )
+                    print_row("connect-per-command", clients, result)
+                    results.append(("connect-per-command", clients, result))
+
+                result = await bench_send_command(instance_id, clients, args.requests)
+                print_row("send_command", clients, result)
+                results.append(("send_command", clients, result))
+
+                result = await bench_fanout(
+                    server, instance_id, clients, args.updates, args.update_rate
+                )
+                print_row("state fan-out", clients, result)
+                results.append(("state fan-out", clients, result))
+        finally:
+            await detach_instance(instance_id)
+            await state_hub.shutdown()
+
+    if args.json:
+        print(
+            json.dumps(
+                [
+                    {"scenario": scenario, "clients": clients, **result}
+                    for scenario, clients, result in results
+                ],
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", default="1,10,100")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--updates", type=int, default=40)
+    parser.add_argument("--update-rate", type=float, default=20.0)
+    parser.add_argument(
+        "--push-interval", type=float, default=settings.state_push_interval
+    )
+    parser.add_argument("--skip-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true")
+
+    asyncio.run(main(parser.parse_args()))
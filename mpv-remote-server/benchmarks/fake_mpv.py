@@ -0,0 +1,255 @@
+"""Stand-in for mpv's JSON IPC server.
+
+Speaks the request_id / event protocol over a Unix socket so MPVManager can
+be exercised and benchmarked without a real player or a display:
+
+    python -m benchmarks.fake_mpv /tmp/mpvsocket_fake --delay 0.001
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+DEFAULT_PROPERTIES: Dict[str, Any] = {
+    "mpv-version": "mpv 0.38.0 (fake)",
+    "time-pos": 0.0,
+    "duration": 1440.0,
+    "pause": False,
+    "volume": 100.0,
+    "title": "fake.mkv",
+    "path": None,
+    "aid": 1,
+    "sid": False,
+    "track-list": [
+        {"id": 1, "type": "audio", "lang": "jpn", "codec": "aac", "selected": True},
+        {"id": 1, "type": "sub", "lang": "eng", "codec": "ass", "selected": False},
+    ],
+}
+
+
+class FakeMPVClient:
+    def __init__(self, name: str, writer: asyncio.StreamWriter):
+        self.name = name
+        self.writer = writer
+        # property name -> observe ids registered by this client
+        self.observers: Dict[str, Set[int]] = {}
+
+    def send(self, message: Dict[str, Any]):
+        if not self.writer.is_closing():
+            self.writer.write((json.dumps(message) + "\n").encode())
+
+
+class FakeMPVServer:
+    """Minimal mpv JSON IPC server.
+
+    ``response_delay`` is applied to every command, and commands from one
+    client are processed in order, the same as mpv does.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        response_delay: float = 0.0,
+        properties: Optional[Dict[str, Any]] = None,
+    ):
+        self.path = path
+        self.response_delay = response_delay
+        self.properties: Dict[str, Any] = dict(DEFAULT_PROPERTIES)
+        if properties:
+            self.properties.update(properties)
+        self.clients: Set[FakeMPVClient] = set()
+        self.commands_handled = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._client_count = 0
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=self.path, limit=4 * 1024 * 1024
+        )
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for client in list(self.clients):
+            client.writer.close()
+        self.clients.clear()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def __aenter__(self) -> "FakeMPVServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def set_property(self, name: str, value: Any):
+        """Change a property and notify observers, like playback would"""
+        if self.properties.get(name) == value and name in self.properties:
+            return
+        self.properties[name] = value
+        for client in list(self.clients):
+            for observe_id in client.observers.get(name, ()):
+                client.send(
+                    {
+                        "event": "property-change",
+                        "id": observe_id,
+                        "name": name,
+                        "data": value,
+                    }
+                )
+
+    def emit_event(self, event: str, **fields: Any):
+        for client in list(self.clients):
+            client.send({"event": event, **fields})
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        client = FakeMPVClient(f"ipc_{self._client_count}", writer)
+        self._client_count += 1
+        self.clients.add(client)
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    client.send({"error": "invalid parameter"})
+                    continue
+
+                if self.response_delay:
+                    await asyncio.sleep(self.response_delay)
+
+                error, data, deferred = self._execute(client, request.get("command"))
+                self.commands_handled += 1
+
+                response: Dict[str, Any] = {"error": error}
+                if data is not None:
+                    response["data"] = data
+                if "request_id" in request:
+                    response["request_id"] = request["request_id"]
+                client.send(response)
+
+                for message in deferred:
+                    client.send(message)
+                await writer.drain()
+
+                if request.get("command") == ["quit"]:
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+
+    def _execute(
+        self, client: FakeMPVClient, command: Any
+    ) -> Tuple[str, Any, List[Dict[str, Any]]]:
+        """Returns (error, data, messages to send after the reply)"""
+        if not isinstance(command, list) or not command:
+            return "invalid parameter", None, []
+
+        name, args = command[0], command[1:]
+
+        if name == "get_property" and len(args) == 1:
+            if args[0] not in self.properties:
+                return "property unavailable", None, []
+            return "success", self.properties[args[0]], []
+
+        if name == "set_property" and len(args) == 2:
+            self.set_property(args[0], self._coerce(args[0], args[1]))
+            return "success", None, []
+
+        if name == "observe_property" and len(args) == 2:
+            observe_id, prop = int(args[0]), args[1]
+            client.observers.setdefault(prop, set()).add(observe_id)
+            # mpv always reports the current value right after observing
+            change: Dict[str, Any] = {
+                "event": "property-change",
+                "id": observe_id,
+                "name": prop,
+            }
+            if self.properties.get(prop) is not None:
+                change["data"] = self.properties[prop]
+            return "success", None, [change]
+
+        if name == "unobserve_property" and len(args) == 1:
+            for ids in client.observers.values():
+                ids.discard(int(args[0]))
+            return "success", None, []
+
+        if name == "client_name":
+            return "success", client.name, []
+
+        if name == "cycle" and args == ["pause"]:
+            self.set_property("pause", not self.properties.get("pause"))
+            return "success", None, []
+
+        if name == "seek" and args:
+            offset = float(args[0])
+            mode = args[1] if len(args) > 1 else "relative"
+            position = self.properties.get("time-pos") or 0.0
+            target = offset if mode.startswith("absolute") else position + offset
+            self.set_property("time-pos", max(0.0, target))
+            return "success", None, [{"event": "seek"}, {"event": "playback-restart"}]
+
+        if name == "loadfile" and args:
+            self.set_property("path", args[0])
+            self.set_property("title", os.path.basename(args[0]))
+            self.set_property("time-pos", 0.0)
+            return (
+                "success",
+                None,
+                [{"event": "start-file"}, {"event": "file-loaded"}],
+            )
+
+        if name in ("stop", "quit", "ao-reload", "request_log_messages"):
+            return "success", None, []
+
+        return "invalid parameter", None, []
+
+    def _coerce(self, name: str, value: Any) -> Any:
+        # mpv parses string arguments with the property's own type
+        current = self.properties.get(name)
+        if isinstance(value, str):
+            if isinstance(current, bool):
+                return value in ("yes", "true")
+            if isinstance(current, (int, float)):
+                try:
+                    return type(current)(float(value))
+                except ValueError:
+                    return value
+        return value
+
+
+async def _serve(path: str, delay: float):
+    async with FakeMPVServer(path, response_delay=delay) as server:
+        print(f"Fake mpv IPC server listening on {server.path}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", help="Unix socket path to listen on")
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="seconds of latency per command"
+    )
+    cli_args = parser.parse_args()
+
+    try:
+        asyncio.run(_serve(cli_args.path, cli_args.delay))
+    except KeyboardInterrupt:
+        pass
@@ -10,6 +10,85 @@ class Settings(BaseSettings):
     thumbnails_dir: Path = Path.cwd() / "thumbnails"
     hls_dir: Path = Path.cwd() / "hls"
     hls_min_segment_for_ready: int = 3
+    # ffprobe results kept in memory, keyed by path and mtime
+    hls_probe_cache_size: int = 256
+    # Newest segments of each HLS stream kept in memory for live listeners,
+    # within a byte budget per stream; 0 disables the cache
+    hls_cache_segments: int = 8
+    hls_cache_max_bytes: int = 8 * 1024 * 1024
+    # Sliding window HLS: serve hls_list_size segments from mpv's position on
+    # instead of the whole file (0 serves ffmpeg's complete playlist), and
+    # every hls_gc_interval seconds delete segments more than
+    # hls_retain_segments behind it
+    hls_list_size: int = 10
+    hls_retain_segments: int = 10
+    hls_gc_interval: float = 5.0
+    # Restart the encoder at mpv's position when it seeks before what has
+    # been encoded, or more than hls_seek_restart_margin seconds past it
+    hls_seek_restart: bool = True
+    hls_seek_restart_margin: float = 30.0
+    # "live": one ffmpeg per stream encodes the file from the start.
+    # "vod": the complete playlist is served right away and each segment is
+    # encoded when requested, hls_vod_workers at a time across streams,
+    # with the next hls_vod_lookahead segments queued behind it
+    hls_mode: str = "live"
+    hls_vod_workers: int = 2
+    hls_vod_lookahead: int = 3
+    # Encoders prepared for the file an instance plays next run at the lowest
+    # CPU and I/O priority and are suspended after this many segments until
+    # playback gets there (0 lets them encode the whole file)
+    hls_prepare_segments: int = 3
+    # "subprocess" (mpv binary over JSON IPC) or "libmpv" (in-process, python-mpv)
+    mpv_backend: str = "subprocess"
+    # Extra options for libmpv players, e.g. {"vo": "null", "ao": "null"}
+    libmpv_options: dict[str, str] = {}
+    mpv_ready_timeout: float = 15.0
+    mpv_ready_initial_backoff: float = 0.02
+    mpv_ready_max_backoff: float = 0.5
+    mpv_pool_size: int = 1
+    mpv_max_instances: int = 4
+    # Refuse new instances above this system CPU load or below this free memory
+    admission_max_cpu_percent: float = 90.0
+    admission_min_memory_mb: int = 512
+    resource_sample_interval: float = 2.0
+    # Playback health sampling: seconds between samples, samples kept per instance
+    telemetry_interval: float = 1.0
+    telemetry_history: int = 300
+    # Restart players that crash (non-zero exit), resuming file and position
+    mpv_auto_restart: bool = False
+    mpv_restart_max_attempts: int = 3
+    mpv_restart_initial_backoff: float = 1.0
+    mpv_restart_max_backoff: float = 30.0
+    # A player that ran this long before crashing gets a fresh set of attempts
+    mpv_restart_reset_after: float = 60.0
+    # How long stopped and failed instances stay listed before removal
+    mpv_reap_delay: float = 30.0
+    # Players this server started, so a restarted server can adopt them
+    mpv_registry_file: Path = Path.cwd() / "mpv-instances.json"
+    mpv_adopt_timeout: float = 1.0
+    # mpv's terminal log level (--msg-level) and how many of its most
+    # recent output lines are kept per instance
+    mpv_log_level: str = "info"
+    mpv_log_buffer_lines: int = 1000
+    mpv_prefetch_playlist: bool = True
+    # Start encoding the next queued file's HLS audio before it plays
+    queue_prepare_hls: bool = True
+    # Preparing the next file of a directory once playback starts: wait this
+    # long first, skip above this system CPU load, read ahead this much of
+    # it, and optionally start its HLS audio encoder early
+    preload_delay: float = 5.0
+    preload_max_cpu_percent: float = 70.0
+    preload_readahead_bytes: int = 32 * 1024 * 1024
+    preload_hls: bool = False
+    mpv_pool_health_interval: float = 30.0
+    command_coalesce_window: float = 0.03
+    command_interactive_timeout: float = 5.0
+    command_interactive_concurrency: int = 1
+    command_background_timeout: float = 10.0
+    command_background_concurrency: int = 4
+    state_push_interval: float = 0.25
+    state_poll_interval: float = 3.0
+    state_subscriber_queue_size: int = 8
     cache_file: Path = Path.cwd() / "media-cache.json"
     media_shares: dict[str, str] = {
         "media": "E:/dls/cdrama",
@@ -1,23 +1,25 @@
-import json
 from config import settings
-from services.mpv_manager import mpv_manager
+from services.codec import dumps_text, loads
+from services.mpv_manager import AdmissionError, mpv_manager
+from services.mpv_logs import LOG_LEVELS
+from services.preload import PreloadEngine
 from services.shares import MediaShare
 from models.model import (
     HLSSegmentInfo,
     MPVCommand,
-    MPVResponse,
     RemoteCommand,
 )
-from services.hls_stream import hls_stream_service
+from services.hls_stream import hls_stream_service, segment_etag
+from services.state_hub import DELTA_PROPERTIES, DeltaStateSubscriber, state_hub
 
 from datetime import datetime
 import time
-from fastapi import FastAPI, HTTPException, Response, WebSocket
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
 from fastapi.responses import FileResponse
 from pathlib import Path
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict
+from typing import Dict, List, Optional
 import asyncio
 
 import logging
@@ -34,12 +36,20 @@ if not logger.handlers:
     logger.propagate = False
 
 share_service = MediaShare()
+preload_engine = PreloadEngine(share_service, mpv_manager)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await share_service.init()
+    await mpv_manager.start()
+    preload_engine.start()
     yield
+    await preload_engine.shutdown()
+    await state_hub.shutdown()
+    await mpv_manager.shutdown()
+    # Active, prepared and VOD encoders are not tied to a player process
+    await hls_stream_service.shutdown()
     await share_service.shutdown()
 
 
@@ -64,6 +74,14 @@ async def get_status():
         "status": "OK",
         "timestamp": datetime.now().isoformat(),
         "stats": share_service.get_stats(),
+        "mpvPool": mpv_manager.pool.get_stats(),
+        "admission": mpv_manager.get_admission_stats(),
+        "supervisor": mpv_manager.supervisor.get_stats(),
+        "registry": mpv_manager.registry.get_stats(),
+        "preload": preload_engine.get_stats(),
+        "hlsCache": hls_stream_service.segment_cache.get_stats(),
+        "hlsSeek": hls_stream_service.get_seek_stats(),
+        "hlsVod": hls_stream_service.get_vod_stats(),
     }
 
 
@@ -76,6 +94,12 @@ async def get_instances():
             "status": i.status,
             "lastSeen": i.last_seen,
             "clientName": i.client_name,
+            "mpvVersion": (mpv_manager.get_instance_metadata(i.id) or {}).get(
+                "mpvVersion"
+            ),
+            "startupMs": i.startup_ms,
+            "restarts": i.restarts,
+            "resources": mpv_manager.get_resource_usage(i.id),
         }
         for i in instances
     ]
@@ -85,6 +109,9 @@ async def get_instances():
 async def create_instance(body: Dict = {}):
     media_file = body.get("mediaFile")
     stream_audio = body.get("streamAudio", False)
+    # Clients driving a single output get the running instance back; pass
+    # "reuse": false to start another one alongside it
+    reuse = body.get("reuse", True)
 
     if media_file:
         if not Path(media_file).exists():
@@ -93,18 +120,9 @@ async def create_instance(body: Dict = {}):
     all_instances = await mpv_manager.get_all_instances()
     running_instances = [i for i in all_instances if i.status == "running"]
 
-    # Explicitly deny multiple instances - always return the first running instance
-    if running_instances:
+    if reuse and running_instances:
         running_instance_id = running_instances[0].id
-        logger.info(
-            f"Instance creation denied - reusing existing instance {running_instance_id}"
-        )
-
-        # If there are multiple running instances, log warning but still return the first one
-        if len(running_instances) > 1:
-            logger.warning(
-                f"Found {len(running_instances)} running instances, should clean up extras"
-            )
+        logger.info(f"Reusing existing instance {running_instance_id}")
 
         # Optionally load new media file if provided
         if media_file is not None:
@@ -121,10 +139,9 @@ async def create_instance(body: Dict = {}):
 
         return {
             "instanceId": running_instance_id,
-            "message": "Instance creation denied - reusing existing instance",
+            "message": "Reusing existing instance",
         }
 
-    # Only create new instance if no running instances exist
     try:
         instance_id = await mpv_manager.create_instance(
             media_file, stream_audio=stream_audio
@@ -135,21 +152,10 @@ async def create_instance(body: Dict = {}):
             "message": "MPV instance created successfully, streamAudio: "
             + str(stream_audio),
         }
+    except AdmissionError as error:
+        logger.warning(f"Instance creation rejected: {error}")
+        raise HTTPException(status_code=503, detail=str(error))
     except Exception as error:
-        error_msg = str(error)
-        if "another instance is already running" in error_msg:
-            logger.warning(
-                f"Instance creation rejected due to existing instance: {error}"
-            )
-            # This should not happen due to our checks above, but just in case
-            all_instances = await mpv_manager.get_all_instances()
-            running_instances = [i for i in all_instances if i.status == "running"]
-            if running_instances:
-                return {
-                    "instanceId": running_instances[0].id,
-                    "message": "Instance creation rejected - reusing existing instance",
-                }
-
         raise HTTPException(
             status_code=500, detail=f"Failed to create instance: {error}"
         )
@@ -183,12 +189,98 @@ async def send_command(instance_id: str, command: RemoteCommand):
         )
 
 
+@app.post("/api/instances/{instance_id}/commands")
+async def send_commands(instance_id: str, commands: List[RemoteCommand]):
+    try:
+        return await mpv_manager.execute_remote_commands(instance_id, commands)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=f"Invalid command: {error}")
+    except Exception as error:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to execute commands: {error}"
+        )
+
+
+@app.get("/api/instances/{instance_id}/scheduler")
+async def get_scheduler_stats(instance_id: str):
+    if instance_id not in mpv_manager.instances:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    return mpv_manager.get_scheduler_stats(instance_id)
+
+
+@app.get("/api/instances/{instance_id}/logs")
+async def get_instance_logs(
+    instance_id: str, level: str = "info", limit: int = 200, since: int = 0
+):
+    if level not in LOG_LEVELS:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid level, expected one of {LOG_LEVELS}"
+        )
+    logs = mpv_manager.logs.get_logs(instance_id, level, limit, since)
+    if logs is None:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    return logs
+
+
+@app.get("/api/instances/{instance_id}/health")
+async def get_instance_health(instance_id: str, last: Optional[int] = None):
+    if instance_id not in mpv_manager.instances:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    return mpv_manager.telemetry.get_health(instance_id, last)
+
+
+@app.get("/api/instances/{instance_id}/queue")
+async def get_queue(instance_id: str):
+    if instance_id not in mpv_manager.instances:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    return mpv_manager.queue.get_queue(instance_id)
+
+
+@app.post("/api/instances/{instance_id}/queue")
+async def enqueue(instance_id: str, body: Dict):
+    """Queue "files", or every file of a share directory ("share", "path"),
+    after what is queued already, or instead of it with "replace": true"""
+    if instance_id not in mpv_manager.instances:
+        raise HTTPException(status_code=404, detail="Instance not found")
+
+    files = list(body.get("files") or [])
+    if body.get("share"):
+        try:
+            result = await share_service.get_share_files(
+                body["share"], body.get("path", "")
+            )
+        except ValueError as error:
+            raise HTTPException(status_code=404, detail=str(error))
+        files.extend(track.src for track in result.files)
+
+    missing = [f for f in files if not Path(f).exists()]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Media file not found: {missing}")
+    if not files:
+        raise HTTPException(status_code=400, detail="No files to enqueue")
+
+    try:
+        return await mpv_manager.queue.enqueue(
+            instance_id, files, replace=body.get("replace", False)
+        )
+    except Exception as error:
+        raise HTTPException(status_code=500, detail=f"Failed to enqueue: {error}")
+
+
+@app.delete("/api/instances/{instance_id}/queue")
+async def clear_queue(instance_id: str):
+    if instance_id not in mpv_manager.instances:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    try:
+        return await mpv_manager.queue.clear(instance_id)
+    except Exception as error:
+        raise HTTPException(status_code=500, detail=f"Failed to clear queue: {error}")
+
+
 @app.get("/api/instances/{instance_id}/tracks")
 async def get_tracks(instance_id: str):
     try:
-        tracks = await mpv_manager.get_available_tracks(instance_id)
-        current = await mpv_manager.get_current_tracks(instance_id)
-        return {**tracks, **current}
+        return await mpv_manager.get_tracks(instance_id)
     except Exception as error:
         raise HTTPException(status_code=500, detail=f"Failed to get tracks: {error}")
 
@@ -258,22 +350,73 @@ async def get_hls_playlist(instance_id: str):
     if not playlist_path:
         raise HTTPException(status_code=404, detail="HLS playlist not found")
 
-    with open(playlist_path, "r") as f:
-        content = f.read()
+    window = await hls_stream_service.render_playlist(instance_id)
+    if window is not None:
+        return Response(
+            window,
+            media_type="application/vnd.apple.mpegurl",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    # Small, and rewritten by ffmpeg as segments are added, so it is read
+    # whole (off the event loop) rather than streamed from a file that may
+    # be replaced halfway through
+    try:
+        content = await asyncio.to_thread(playlist_path.read_bytes)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="HLS playlist not found")
+
+    return Response(
+        content,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def _segment_headers(etag: str) -> Dict[str, str]:
+    # Finished segments never change, so clients may keep them for good
+    return {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
 
-    return Response(content, media_type="application/vnd.apple.mpegurl")
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [
+        tag.strip() for tag in if_none_match.split(",")
+    ]
 
 
 @app.get("/api/instances/{instance_id}/hls/segment{segment_num}.aac")
-async def get_hls_segment(instance_id: str, segment_num: int):
+async def get_hls_segment(request: Request, instance_id: str, segment_num: int):
+    # Segments being played are in memory; byte ranges use the file path
+    if "range" not in request.headers:
+        cached = hls_stream_service.get_cached_segment(instance_id, segment_num)
+        if cached is None:
+            cached = await hls_stream_service.load_segment(instance_id, segment_num)
+        if cached is not None:
+            headers = _segment_headers(cached.etag)
+            if _not_modified(request, cached.etag):
+                return Response(status_code=304, headers=headers)
+            return Response(cached.data, media_type="audio/aac", headers=headers)
+
     segment_path = await hls_stream_service.get_segment_path(instance_id, segment_num)
     if not segment_path:
         raise HTTPException(status_code=404, detail="HLS segment not found")
+    try:
+        stat_result = await asyncio.to_thread(segment_path.stat)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="HLS segment not found")
 
-    with open(segment_path, "rb") as f:
-        content = f.read()
+    headers = _segment_headers(segment_etag(stat_result))
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
 
-    return Response(content, media_type="audio/aac")
+    # Streamed from the file (Range requests included) instead of being
+    # read into memory; servers that support pathsend do it with sendfile
+    return FileResponse(
+        segment_path, media_type="audio/aac", headers=headers, stat_result=stat_result
+    )
 
 
 @app.websocket("/api/instances/{instance_id}/state")
@@ -281,49 +424,66 @@ async def get_player_state(websocket: WebSocket, instance_id: str):
     await websocket.accept()
     # logger.debug(f"WebSocket connected for instance {instance_id}")
 
-    while True:
-        try:
-            instance = await mpv_manager.get_instance(instance_id)
-            if not instance:
-                logger.warning(f"Instance {instance_id} not found")
-                await websocket.send_json({"error": "Instance not found"})
-                await asyncio.sleep(1)
-                continue
-
-            cmds = [
-                MPVCommand(command=["get_property", "time-pos"], **{}),
-                MPVCommand(command=["get_property", "duration"], **{}),
-                MPVCommand(command=["get_property", "pause"], **{}),
-                MPVCommand(command=["get_property", "volume"], **{}),
-                MPVCommand(command=["get_property", "title"], **{}),
-            ]
-
-            # Send commands and collect results
-            tasks = [mpv_manager.send_command(instance_id, cmd) for cmd in cmds]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # logger.debug(f"Results: {results}")
-
-            processed_results = [
-                {
-                    "command": cmd.command,
-                    "data": result.model_dump()
-                    if isinstance(result, MPVResponse)
-                    else None,
-                }
-                for cmd, result in zip(cmds, results)
-            ]
-
-            await websocket.send_json(processed_results)
-            await asyncio.sleep(3)
-
-        except Exception as error:
-            logger.error(f"WebSocket error for instance {instance_id}: {error}")
-            try:
+    # Protocol 1 (default) pushes every polled property each time; protocol
+    # 2 sends a snapshot, then numbered deltas of the chosen properties,
+    # e.g. ?protocol=2&props=time-pos,pause&maxRate=4
+    params = websocket.query_params
+    try:
+        protocol = int(params.get("protocol", "1"))
+        props = [p for p in params.get("props", "").split(",") if p] or None
+        max_rate = float(params.get("maxRate", "0"))
+        if protocol not in (1, 2):
+            raise ValueError(f"unsupported protocol {protocol}")
+        unknown = set(props or []) - set(DELTA_PROPERTIES)
+        if unknown:
+            raise ValueError(f"unknown properties {sorted(unknown)}")
+    except ValueError as error:
+        await websocket.close(code=1008, reason=f"Invalid subscription: {error}")
+        return
+
+    subscriber = state_hub.subscribe(instance_id, protocol, props, max_rate)
+
+    async def send_updates():
+        while True:
+            message = await subscriber.next_message()
+            if message is None:
                 await websocket.close(code=1011, reason="Internal server error")
-            except:
-                pass
-            break
+                return
+            await websocket.send_text(message)
+
+    async def wait_for_disconnect():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if isinstance(subscriber, DeltaStateSubscriber) and message.get("text"):
+                try:
+                    if loads(message["text"]).get("type") == "resync":
+                        subscriber.resync()
+                except (ValueError, AttributeError):
+                    pass
+
+    tasks = [
+        asyncio.create_task(send_updates()),
+        asyncio.create_task(wait_for_disconnect()),
+    ]
+
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception():
+                logger.error(
+                    f"WebSocket error for instance {instance_id}: {task.exception()}"
+                )
+    finally:
+        for task in tasks:
+            task.cancel()
+        state_hub.unsubscribe(instance_id, subscriber)
+
+
+@app.get("/api/hls/usage")
+async def get_hls_usage():
+    return await hls_stream_service.get_disk_usage()
 
 
 @app.get("/api/instances/{instance_id}/hls/status")
@@ -344,11 +504,8 @@ async def hls_events_socket(ws: WebSocket, instance_id: str):
 
     async def on_segment(seg_info: HLSSegmentInfo):
         try:
-            await ws.send_json(
-                {
-                    "type": "segment",
-                    "data": seg_info.model_dump_json(),
-                }
+            await ws.send_text(
+                dumps_text({"type": "segment", "data": seg_info.model_dump_json()})
             )
         except Exception as e:
             logger.error(f"Error sending segment event to client: {e}")
@@ -356,11 +513,8 @@ async def hls_events_socket(ws: WebSocket, instance_id: str):
     async def on_ready(instance_id: str):
         try:
             status = await hls_stream_service.get_stream_status(instance_id)
-            await ws.send_json(
-                {
-                    "type": "ready",
-                    "data": status.model_dump_json(),
-                }
+            await ws.send_text(
+                dumps_text({"type": "ready", "data": status.model_dump_json()})
             )
         except Exception as e:
             logger.error(f"Error sending ready event to client: {e}")
@@ -369,12 +523,7 @@ async def hls_events_socket(ws: WebSocket, instance_id: str):
     hls_stream_service.add_on_ready_callback(instance_id, on_ready)
 
     status = await hls_stream_service.get_stream_status(instance_id)
-    await ws.send_json(
-        {
-            "type": "ready",
-            "data": status.model_dump_json(),
-        }
-    )
+    await ws.send_text(dumps_text({"type": "ready", "data": status.model_dump_json()}))
 
     try:
         while True:
@@ -17,8 +17,12 @@ class MPVInstance(BaseModel):
     pipe_name: str = Field(alias="pipeName")
     status: MPVStatus
     process: Optional[Any] = None
+    connection: Optional[Any] = Field(None, exclude=True)
     last_seen: datetime = Field(alias="lastSeen")
     client_name: Optional[str] = Field(None, alias="clientName")
+    startup_ms: Optional[float] = Field(None, alias="startupMs")
+    stream_audio: bool = Field(False, alias="streamAudio")
+    restarts: int = 0
 
     class Config:
         populate_by_name = True
@@ -36,6 +40,11 @@ class MPVResponse(BaseModel):
     request_id: Optional[int] = Field(None, alias="request_id")
 
 
+class CommandPriority(str, Enum):
+    INTERACTIVE = "interactive"
+    BACKGROUND = "background"
+
+
 class RemoteCommandAction(str, Enum):
     PLAY = "play"
     PAUSE = "pause"
@@ -180,3 +189,6 @@ class HLSStreamStatus(BaseModel):
     segment_count: int = Field(alias="segmentCount", default=0)
     playlist_url: str = Field(alias="playlistUrl")
     media_file: str = Field(alias="mediaFile")
+    encoder_restarts: int = Field(alias="encoderRestarts", default=0)
+    # Time from the latest seek that restarted the encoder to its first segment
+    seek_to_audio_ms: Optional[float] = Field(alias="seekToAudioMs", default=None)
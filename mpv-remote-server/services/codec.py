@@ -0,0 +1,119 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from models.model import MPVCommand
+
+# orjson is optional: it serializes straight to bytes and parses several
+# times faster than the standard library, which matters on the IPC reader
+# and the state fan-out where every message goes through here
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+# Both backends raise a ValueError subclass on malformed input
+if orjson is not None:
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def dumps_text(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(data: Any) -> Any:
+        return orjson.loads(data)
+
+else:
+    _encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    _decoder = json.JSONDecoder()
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode()
+
+    def dumps_text(obj: Any) -> str:
+        return _encoder.encode(obj)
+
+    def loads(data: Any) -> Any:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = str(data, "utf-8")
+        return _decoder.decode(data)
+
+
+def encode_line(payload: Dict[str, Any]) -> bytes:
+    """One mpv IPC message: compact JSON terminated by a newline"""
+    return dumps(payload) + b"\n"
+
+
+def encode_lines(payloads: Iterable[Dict[str, Any]]) -> bytes:
+    return b"".join(dumps(payload) + b"\n" for payload in payloads)
+
+
+def command_payload(cmd: MPVCommand, request_id: int) -> Dict[str, Any]:
+    """The wire form of a command, built without a pydantic dump"""
+    payload: Dict[str, Any] = {"command": cmd.command, "request_id": request_id}
+    if cmd.async_ is not None:
+        payload["async"] = cmd.async_
+    return payload
+
+
+@dataclass(slots=True)
+class MPVReply:
+    """A reply from mpv, with the fields of MPVResponse.
+
+    MPVResponse remains the API schema; replies read off the socket come
+    from mpv itself, so they are wrapped in this plain object instead of
+    being validated into a model (even model_construct costs about twice as
+    much as a slotted dataclass). FastAPI serializes both the same way.
+    """
+
+    error: str
+    data: Any = None
+    request_id: Optional[int] = None
+
+
+def to_response(message: Dict[str, Any]) -> MPVReply:
+    return MPVReply(
+        message.get("error", "success"),
+        message.get("data"),
+        message.get("request_id"),
+    )
+
+
+def response_dict(error: str, data: Any = None, request_id: Any = None) -> Dict:
+    """What MPVResponse(...).model_dump() returns, without the model"""
+    return {"error": error, "data": data, "request_id": request_id}
+
+
+class LineFramer:
+    """Splits a byte stream into newline delimited messages.
+
+    Works on the raw chunks read off the socket: complete lines are sliced
+    out of each chunk as bytes and handed to the JSON parser as-is, without
+    decoding to str first. Only an incomplete trailing line is carried over
+    to the next chunk.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._partial = b""
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        data = self._partial + chunk if self._partial else chunk
+        if b"\n" not in chunk:
+            self._partial = data
+            self._check_limit()
+            return []
+
+        *lines, self._partial = data.split(b"\n")
+        self._check_limit()
+        return [line for line in lines if line and not line.isspace()]
+
+    def _check_limit(self):
+        if len(self._partial) > self.limit:
+            size = len(self._partial)
+            self._partial = b""
+            raise ValueError(f"IPC message exceeds {self.limit} bytes ({size})")
@@ -0,0 +1,134 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+class CachedSegment(NamedTuple):
+    data: bytes
+    etag: str
+
+
+class SegmentRing:
+    """The most recent segments of one stream, least recently used first"""
+
+    def __init__(self, max_segments: int, max_bytes: int):
+        self.max_segments = max_segments
+        self.max_bytes = max_bytes
+        self.segments: "OrderedDict[int, CachedSegment]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, number: int, segment: CachedSegment):
+        if len(segment.data) > self.max_bytes:
+            return
+        old = self.segments.pop(number, None)
+        if old is not None:
+            self.bytes -= len(old.data)
+        self.segments[number] = segment
+        self.bytes += len(segment.data)
+
+        while len(self.segments) > self.max_segments or self.bytes > self.max_bytes:
+            _, evicted = self.segments.popitem(last=False)
+            self.bytes -= len(evicted.data)
+            self.evictions += 1
+
+    def get(self, number: int) -> Optional[CachedSegment]:
+        segment = self.segments.get(number)
+        if segment is None:
+            self.misses += 1
+            return None
+        self.segments.move_to_end(number)
+        self.hits += 1
+        return segment
+
+
+class HLSSegmentCache:
+    """In-memory copies of the segments listeners are playing right now.
+
+    The encoder runs far ahead of playback, so the segments it just wrote
+    are rarely the ones being asked for. Instead the cache is read-through:
+    the first request for a segment reads it from disk and caches it, and
+    every other listener at about the same position is served from memory.
+    Each stream keeps at most hls_cache_segments segments within
+    hls_cache_max_bytes; the least recently requested go first.
+    """
+
+    def __init__(self, max_segments: int, max_bytes: int):
+        self.max_segments = max_segments
+        self.max_bytes = max_bytes
+        self.rings: Dict[str, SegmentRing] = {}
+        # Counters of rings that have been dropped, so totals survive streams
+        self._retired = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_segments > 0 and self.max_bytes > 0
+
+    def put(self, instance_id: str, number: int, data: bytes, etag: str):
+        if not self.enabled:
+            return
+        ring = self.rings.get(instance_id)
+        if ring is None:
+            ring = self.rings[instance_id] = SegmentRing(
+                self.max_segments, self.max_bytes
+            )
+        ring.put(number, CachedSegment(data, etag))
+
+    def get(self, instance_id: str, number: int) -> Optional[CachedSegment]:
+        ring = self.rings.get(instance_id)
+        if ring is None:
+            if self.enabled:
+                self._retired["misses"] += 1
+            return None
+        return ring.get(number)
+
+    def drop(self, instance_id: str):
+        ring = self.rings.pop(instance_id, None)
+        if ring is None:
+            return
+        self._retired["hits"] += ring.hits
+        self._retired["misses"] += ring.misses
+        self._retired["evictions"] += ring.evictions
+        logger.debug(
+            f"Dropped {len(ring.segments)} cached segments ({ring.bytes} bytes) "
+            f"of {instance_id}"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self._retired["hits"] + sum(r.hits for r in self.rings.values())
+        misses = self._retired["misses"] + sum(r.misses for r in self.rings.values())
+        requests = hits + misses
+        return {
+            "enabled": self.enabled,
+            "maxSegments": self.max_segments,
+            "maxBytesPerStream": self.max_bytes,
+            "bytes": sum(r.bytes for r in self.rings.values()),
+            "segments": sum(len(r.segments) for r in self.rings.values()),
+            "hits": hits,
+            "misses": misses,
+            "hitRate": round(hits / requests, 4) if requests else None,
+            "evictions": self._retired["evictions"]
+            + sum(r.evictions for r in self.rings.values()),
+            "streams": {
+                instance_id: {
+                    "segments": sorted(ring.segments),
+                    "bytes": ring.bytes,
+                    "hits": ring.hits,
+                    "misses": ring.misses,
+                }
+                for instance_id, ring in self.rings.items()
+            },
+        }
@@ -0,0 +1,273 @@
+import bisect
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+
+class SegmentEntry(NamedTuple):
+    number: int
+    duration: float
+    uri: str
+    # Seconds into the media file where the segment starts
+    start: float
+    # Index of the encoder run that wrote the segment
+    run: int
+
+
+class SegmentRun:
+    """The output of one ffmpeg process, from ``start_time`` on.
+
+    A stream gets a new run each time the encoder restarts at a seek
+    target. Runs write to the same directory with their own playlist file,
+    and their segment numbers continue where the previous run stopped.
+    A run that ``continues`` the previous one starts where it stopped
+    instead, so both play in order.
+    """
+
+    def __init__(
+        self,
+        start_time: float,
+        first_number: int,
+        playlist_path: Path,
+        continues: bool = False,
+    ):
+        self.start_time = start_time
+        self.first_number = first_number
+        self.playlist_path = playlist_path
+        self.continues = continues
+        self.entries: List[SegmentEntry] = []
+        # Each entry's start, kept alongside for bisecting
+        self.starts: List[float] = []
+        self.target_duration = 0
+        self.ended = False
+        # (mtime, size) of the playlist file last parsed
+        self.version: Optional[Tuple[int, int]] = None
+        # Bytes of the playlist file parsed up to the end of the last entry,
+        # and that entry's lines, to find where ffmpeg appended since
+        self.parsed_bytes = 0
+        self.anchor = b""
+
+    @property
+    def end_time(self) -> float:
+        if not self.entries:
+            return self.start_time
+        last = self.entries[-1]
+        return last.start + last.duration
+
+
+class SegmentTable:
+    """Every segment ffmpeg has written for a stream, parsed from its playlists.
+
+    ffmpeg keeps the complete list (-hls_list_size 0). The playlist served
+    to clients is rendered from this table, either as a window of it so its
+    size stays fixed however long the file is, or whole when the encoder
+    has been restarted and the runs need stitching together.
+    """
+
+    def __init__(self, playlist_path: Path):
+        self.runs: List[SegmentRun] = [SegmentRun(0.0, 0, playlist_path)]
+        # All runs' entries, in segment number order
+        self.entries: List[SegmentEntry] = []
+        # Segments numbered below this have been deleted from disk
+        self.removed_below = 0
+        self._run_offsets: List[int] = [0]
+        # First run of those playing in order up to the latest one
+        self._span_start = 0
+
+    @property
+    def latest(self) -> SegmentRun:
+        return self.runs[-1]
+
+    @property
+    def ended(self) -> bool:
+        return self.latest.ended
+
+    @property
+    def target_duration(self) -> int:
+        return max(run.target_duration for run in self.runs)
+
+    def add_run(
+        self,
+        start_time: float,
+        first_number: int,
+        playlist_path: Path,
+        continues: bool = False,
+    ):
+        self.runs.append(SegmentRun(start_time, first_number, playlist_path, continues))
+        self._rebuild()
+
+    def parse(self, data: Union[str, bytes]):
+        """Read the whole playlist of the latest run; earlier runs are final"""
+        if isinstance(data, str):
+            data = data.encode()
+        run = self.latest
+        run.entries = []
+        run.starts = []
+        run.target_duration = 0
+        run.ended = False
+        run.parsed_bytes = 0
+        run.anchor = b""
+        self._scan(run, data, 0, run.first_number, run.start_time)
+        self._rebuild()
+
+    def tail_offset(self) -> int:
+        """Where parse_tail needs the latest run's playlist read from"""
+        run = self.latest
+        return run.parsed_bytes - len(run.anchor)
+
+    def parse_tail(self, data: bytes) -> bool:
+        """Read the entries ffmpeg appended to the latest run's playlist,
+        given the file from tail_offset() on.
+
+        ffmpeg rewrites the playlist with the same lines plus the new ones,
+        so only those are parsed, however long the file has grown. False,
+        with nothing read, when the file no longer has the last parsed entry
+        there (the header changed length) and must be parsed whole.
+        """
+        run = self.latest
+        if not run.anchor or not data.startswith(run.anchor):
+            return False
+        last = run.entries[-1]
+        known = len(run.entries)
+        self._scan(
+            run,
+            data[len(run.anchor) :],
+            run.parsed_bytes,
+            last.number + 1,
+            last.start + last.duration,
+        )
+        # The latest run's entries are the last ones
+        self.entries.extend(run.entries[known:])
+        return True
+
+    def _scan(self, run: SegmentRun, data: bytes, base: int, number: int, start: float):
+        """Add the entries in ``data``, found ``base`` bytes into the file"""
+        run_index = len(self.runs) - 1
+        duration: Optional[float] = None
+        entry_at = 0
+        pos = 0
+        while pos < len(data):
+            line_at = pos
+            end = data.find(b"\n", pos)
+            if end < 0:
+                end = len(data)
+            pos = end + 1
+            line = data[line_at:end].decode().strip()
+            if not line:
+                continue
+            if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+                number = int(line.split(":", 1)[1])
+            elif line.startswith("#EXT-X-TARGETDURATION:"):
+                run.target_duration = int(line.split(":", 1)[1])
+            elif line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:") :].split(",", 1)[0])
+                entry_at = line_at
+            elif line == "#EXT-X-ENDLIST":
+                run.ended = True
+            elif not line.startswith("#") and duration is not None:
+                run.entries.append(
+                    SegmentEntry(number, duration, line, start, run_index)
+                )
+                run.starts.append(start)
+                # A tail parse does not see the header, which ffmpeg keeps at
+                # the longest segment so far
+                run.target_duration = max(run.target_duration, round(duration))
+                run.parsed_bytes = base + min(pos, len(data))
+                run.anchor = data[entry_at : min(pos, len(data))]
+                number += 1
+                start += duration
+                duration = None
+
+    def _rebuild(self):
+        self.entries = [entry for run in self.runs for entry in run.entries]
+        self._run_offsets = []
+        offset = 0
+        for run in self.runs:
+            self._run_offsets.append(offset)
+            offset += len(run.entries)
+        self._span_start = len(self.runs) - 1
+        while self.runs[self._span_start].continues and self._span_start > 0:
+            self._span_start -= 1
+
+    @property
+    def next_number(self) -> int:
+        """The number the next run's first segment gets"""
+        if self.entries:
+            return self.entries[-1].number + 1
+        return self.latest.first_number
+
+    def latest_first_index(self) -> int:
+        """Index of the first entry of the runs playing in order up to the
+        latest one"""
+        return self._run_offsets[self._span_start]
+
+    @property
+    def latest_start_time(self) -> float:
+        return self.runs[self._span_start].start_time
+
+    def covers(self, position: float, margin: float = 0.0) -> bool:
+        """Whether the latest run, or a run it continues, has or is about to
+        have audio for ``position``, in segments that still exist"""
+        run = self.latest
+        if position < self.latest_start_time:
+            return False
+        index = self.index_at(position)
+        if index is not None:
+            return self.entries[index].number >= self.removed_below
+        # Past the encoded range: fine if the encoder will get there soon
+        return not run.ended and position < run.end_time + margin
+
+    def index_at(self, position: float) -> Optional[int]:
+        """Index of the entry that plays at ``position`` seconds, in the
+        latest run or a run it continues"""
+        for run_index in range(len(self.runs) - 1, self._span_start - 1, -1):
+            run = self.runs[run_index]
+            if run.entries and run.start_time <= position < run.end_time:
+                offset = self._run_offsets[run_index]
+                return offset + bisect.bisect_right(run.starts, position) - 1
+        return None
+
+    def first_available(self) -> int:
+        """Index of the oldest entry whose file has not been deleted"""
+        return bisect.bisect_left(
+            self.entries, self.removed_below, key=lambda entry: entry.number
+        )
+
+    def render(self, first: int, count: Optional[int] = None) -> str:
+        """A playlist of ``count`` entries (all by default) from index ``first``.
+
+        Entries of a later run than the one before them are preceded by a
+        discontinuity tag, and EXT-X-DISCONTINUITY-SEQUENCE counts the
+        discontinuities that have slid out of the window.
+        """
+        first = max(0, first)
+        end = len(self.entries) if count is None else first + count
+        window = self.entries[first:end]
+        complete = self.ended and end >= len(self.entries)
+
+        if window:
+            media_sequence = window[0].number
+            discontinuity_sequence = window[0].run
+            if window[0].run > 0 and first == self._run_offsets[window[0].run]:
+                # The window opens on a run's first segment, whose tag is in it
+                discontinuity_sequence -= 1
+        else:
+            # A restarted encoder that has not written anything yet
+            media_sequence = self.next_number
+            discontinuity_sequence = max(0, len(self.runs) - 2)
+
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            f"#EXT-X-MEDIA-SEQUENCE:{media_sequence}",
+            f"#EXT-X-DISCONTINUITY-SEQUENCE:{discontinuity_sequence}",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+        ]
+        for index, entry in enumerate(window, start=first):
+            if entry.run > 0 and index == self._run_offsets[entry.run]:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f"#EXTINF:{entry.duration:.6f},")
+            lines.append(entry.uri)
+        if complete:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
@@ -1,10 +1,15 @@
 import asyncio
 import json
 import logging
+import os
 import shutil
+import signal
 import subprocess
 import threading
-from typing import Callable, Dict, Optional, Set, TypedDict
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, TypedDict
 from concurrent.futures import ThreadPoolExecutor
 
 from fastapi import WebSocket
@@ -15,6 +20,9 @@ from pathlib import Path
 
 from models.model import HLSConfig, HLSSegmentInfo, HLSStreamStatus
 from config import settings
+from services.hls_cache import CachedSegment, HLSSegmentCache
+from services.hls_playlist import SegmentTable
+from services.hls_vod import VODEncoderPool, VODStream
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -28,17 +36,103 @@ if not logger.handlers:
     logger.propagate = False
 
 
+def segment_etag(stat_result: os.stat_result) -> str:
+    """Strong validator for a finished segment.
+
+    Segments are renamed into place once complete and never written again,
+    so inode, size and mtime identify their content; a stream restarted in
+    the same directory produces new files and so new tags.
+    """
+    return (
+        f'"{stat_result.st_ino:x}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    )
+
+
+def lower_priority():
+    """preexec_fn of background ffmpeg and ffprobe runs"""
+    os.nice(19)
+
+
+def background_process(cmd: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+    """``cmd`` and the Popen arguments that run it at the lowest CPU and
+    best-effort I/O priority, for work nobody is waiting on yet"""
+    if os.name == "nt":
+        return cmd, {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+    ionice = shutil.which("ionice")
+    if ionice:
+        cmd = [ionice, "-c", "2", "-n", "7", *cmd]
+    return cmd, {"preexec_fn": lower_priority}
+
+
+async def wait_process(process: subprocess.Popen, interval: float = 0.5) -> int:
+    """Wait for ``process`` to exit without holding a thread for it.
+
+    A pidfd registered with the event loop reports the exit where the
+    platform has one; elsewhere the process is polled every ``interval``
+    seconds. Either way a suspended encoder costs nothing while it waits.
+    """
+    if process.poll() is not None:
+        return process.returncode
+
+    fd = None
+    if hasattr(os, "pidfd_open"):
+        try:
+            fd = os.pidfd_open(process.pid)
+        except OSError as e:
+            logger.debug(f"pidfd unavailable for pid {process.pid}: {e}")
+    if fd is not None:
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+
+        def on_exit():
+            if not exited.done():
+                exited.set_result(None)
+
+        try:
+            loop.add_reader(fd, on_exit)
+            try:
+                await exited
+            finally:
+                loop.remove_reader(fd)
+        except (NotImplementedError, OSError):
+            pass
+        finally:
+            os.close(fd)
+
+    # Reaps the process, at once after a pidfd reported its exit
+    while process.poll() is None:
+        await asyncio.sleep(interval)
+    return process.returncode
+
+
 class HLSSegmentHandler(FileSystemEventHandler):
+    """Reports segments as ffmpeg finishes them.
+
+    ffmpeg runs with the temp_file flag, so a segment is written as
+    segmentN.aac.tmp and renamed once complete: the rename (on_moved) is the
+    signal. on_created still covers encoders that write in place. Watchdog
+    calls these from its own thread, so the callback is handed to the
+    event loop the handler was created on.
+    """
+
     def __init__(self, instance_id: str, callback: Callable):
         self.instance_id = instance_id
         self.callback = callback
         self.last_segment_num = -1
+        self.loop = asyncio.get_running_loop()
 
     def on_created(self, event):
         if event.is_directory:
             return
+        self._segment_completed(Path(str(event.src_path)))
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        self._segment_completed(Path(str(event.dest_path)))
 
-        file_name = Path(str(event.src_path)).name
+    def _segment_completed(self, path: Path):
+        file_name = path.name
         if file_name.startswith("segment") and file_name.endswith(".aac"):
             try:
                 segment_num = int(file_name.replace("segment", "").replace(".aac", ""))
@@ -48,20 +142,27 @@ class HLSSegmentHandler(FileSystemEventHandler):
                         name=file_name,
                         url=f"/api/instances/{self.instance_id}/hls/{file_name}",
                         number=segment_num,
-                        size=Path(str(event.src_path)).stat().st_size,
+                        size=path.stat().st_size,
                         instanceId=self.instance_id,
                     )
-                    asyncio.create_task(self.callback(segment_info))
+                    asyncio.run_coroutine_threadsafe(
+                        self.callback(segment_info), self.loop
+                    )
             except (ValueError, OSError) as e:
                 logger.error(f"Error processing segment file {file_name}: {e}")
 
 
 class StreamInfo(TypedDict):
-    process: subprocess.Popen
+    # None for VOD streams, whose segments are encoded on request
+    process: Optional[subprocess.Popen]
     playlist_path: Path
     output_dir: Path
     config: HLSConfig
     media_file: str
+    table: SegmentTable
+    vod: Optional[VODStream]
+    # A prepared encoder stopped with SIGSTOP until it is taken over
+    suspended: bool
 
 
 class HLSStreamService:
@@ -75,6 +176,26 @@ class HLSStreamService:
         self.stream_readiness: Dict[str, bool] = {}
         self.segment_counts: Dict[str, int] = {}
         self.on_ready_cbs: Dict[str, Set[Callable]] = {}
+        # Encoders started ahead of time for the file an instance plays next
+        self.prepared_streams: Dict[str, StreamInfo] = {}
+        # (path, mtime) -> probe result, most recently used last
+        self.probe_cache: "OrderedDict[Tuple[str, float], Dict]" = OrderedDict()
+        self.segment_cache = HLSSegmentCache(
+            settings.hls_cache_segments, settings.hls_cache_max_bytes
+        )
+        # instance id -> segments deleted behind playback, and their bytes
+        self.gc_stats: Dict[str, Dict[str, int]] = {}
+        # Encoder restarts following a seek, one at a time per instance
+        self.seek_tasks: Dict[str, asyncio.Task] = {}
+        # instance id -> (when the seek was noticed, first segment number of
+        # the restarted encoder), until that segment is written
+        self.pending_seeks: Dict[str, Tuple[float, int]] = {}
+        # instance id -> restarts and the latest seek to first segment time
+        self.seek_stats: Dict[str, Dict[str, Any]] = {}
+        # Seek to first segment times of all streams, in seconds
+        self.seek_latencies: Deque[float] = deque(maxlen=100)
+        # Segment jobs of every VOD stream (hls_mode "vod")
+        self.vod_pool = VODEncoderPool(settings.hls_vod_workers)
 
     async def is_stream_ready(self, instance_id: str) -> bool:
         return self.stream_readiness.get(instance_id, False)
@@ -101,10 +222,157 @@ class HLSStreamService:
             logger.error(f"Stream already active for instance {instance_id}")
             return False
 
+        prepared = self.prepared_streams.pop(instance_id, None)
+        if prepared is not None and prepared["media_file"] != media_file:
+            await self._discard_stream(prepared)
+            prepared = None
+
+        if prepared is not None:
+            # Warmed up while the previous file played; its segments are
+            # picked up by the periodic check
+            logger.info(f"Using prepared HLS stream for {media_file}")
+            stream: Optional[StreamInfo] = prepared
+            await self._take_over_encoder(instance_id, prepared)
+        else:
+            stream = await self._launch_encoder(
+                instance_id, media_file, Path(settings.hls_dir) / instance_id, config
+            )
+        if stream is None:
+            return False
+
+        self.active_streams[instance_id] = stream
+
+        if stream["vod"] is not None:
+            # The whole playlist is there already; segments follow requests
+            self.stream_readiness[instance_id] = True
+            for callback in self.on_ready_cbs.get(instance_id, set()):
+                try:
+                    await callback(instance_id)
+                except Exception as e:
+                    logger.error(f"Error in hls on_ready callback: {e}")
+            logger.info(f"VOD HLS stream for {media_file} started")
+            return True
+
+        handler = HLSSegmentHandler(instance_id, self._handle_new_segment)
+        observer = Observer()
+        observer.schedule(handler, str(stream["output_dir"]), recursive=True)
+        observer.start()
+        self.segment_watchers[instance_id] = observer
+
+        asyncio.create_task(self._periodic_segment_check(instance_id))
+        if settings.hls_list_size > 0:
+            asyncio.create_task(self._collect_segments(instance_id, stream))
+        if settings.hls_seek_restart:
+            from services.mpv_manager import mpv_manager
+
+            mpv_manager.add_state_listener(instance_id, self._on_player_state)
+
+        logger.info(f"HLS stream for {media_file} started in {stream['output_dir']}")
+        return True
+
+    async def prepare_stream(
+        self, instance_id: str, media_file: str, config: Optional[HLSConfig] = None
+    ) -> bool:
+        """Start encoding the file an instance will play next.
+
+        The encoder writes to a directory of its own with playlist URLs that
+        already point at the instance, so start_stream can take it over as
+        is when playback gets there. The file may never be played, so the
+        encoder runs at low priority and is suspended once it has written
+        hls_prepare_segments segments; start_stream keeps those and has an
+        encoder at normal priority carry on after them.
+        """
+        prepared = self.prepared_streams.get(instance_id)
+        if prepared is not None and prepared["media_file"] == media_file:
+            return True
+        await self.discard_prepared_stream(instance_id)
+
+        out_dir = Path(settings.hls_dir) / f"{instance_id}-{uuid.uuid4().hex[:8]}"
+        stream = await self._launch_encoder(
+            instance_id, media_file, out_dir, config, background=True
+        )
+        if stream is None:
+            return False
+        self.prepared_streams[instance_id] = stream
+        if (
+            stream["process"] is not None
+            and settings.hls_prepare_segments > 0
+            and hasattr(signal, "SIGSTOP")
+        ):
+            asyncio.create_task(self._suspend_when_prepared(instance_id, stream))
+        logger.info(f"Prepared HLS stream for {media_file} in {out_dir}")
+        return True
+
+    async def _suspend_when_prepared(self, instance_id: str, stream: StreamInfo):
+        """Stop a prepared encoder once it has its first segments"""
+        out_dir = stream["output_dir"]
+        process = stream["process"]
+
+        def count_segments() -> int:
+            return sum(1 for _ in out_dir.glob("segment*.aac"))
+
+        while self.prepared_streams.get(instance_id) is stream:
+            if process.poll() is not None:
+                return
+            if await asyncio.to_thread(count_segments) >= settings.hls_prepare_segments:
+                # Checked again: it may have been taken over meanwhile
+                if self.prepared_streams.get(instance_id) is stream:
+                    process.send_signal(signal.SIGSTOP)
+                    stream["suspended"] = True
+                    logger.info(
+                        f"Suspended prepared HLS encoder for {stream['media_file']}"
+                    )
+                return
+            await asyncio.sleep(0.5)
+
+    async def _take_over_encoder(self, instance_id: str, stream: StreamInfo):
+        """Carry on a prepared stream's encoding at normal priority.
+
+        Its encoder runs at background priority, which an unprivileged
+        process cannot raise again, so it is stopped and a new encoder
+        continues after the last segment it wrote.
+        """
+        process = stream["process"]
+        stream["suspended"] = False
+        # VOD streams have no encoder; one that finished has nothing left
+        if process is None or process.poll() == 0:
+            return
+        await self._restart_encoder(instance_id, stream)
+
+    async def discard_prepared_stream(self, instance_id: str):
+        stream = self.prepared_streams.pop(instance_id, None)
+        if stream is not None:
+            await self._discard_stream(stream)
+
+    async def switch_stream(self, instance_id: str, media_file: str) -> bool:
+        """Replace the instance's stream with one for another file, keeping
+        the clients listening for its segments"""
+        segment_callbacks = self.segment_callbacks.get(instance_id)
+        ws_clients = self.ws_clients.get(instance_id)
+        on_ready_cbs = self.on_ready_cbs.get(instance_id)
+
+        await self.stop_stream(instance_id)
+
+        if segment_callbacks:
+            self.segment_callbacks[instance_id] = segment_callbacks
+        if ws_clients:
+            self.ws_clients[instance_id] = ws_clients
+        if on_ready_cbs:
+            self.on_ready_cbs[instance_id] = on_ready_cbs
+
+        return await self.start_stream(instance_id, media_file)
+
+    async def _launch_encoder(
+        self,
+        instance_id: str,
+        media_file: str,
+        out_dir: Path,
+        config: Optional[HLSConfig] = None,
+        background: bool = False,
+    ) -> Optional[StreamInfo]:
         if config is None:
             config = HLSConfig()
 
-        out_dir = Path(settings.hls_dir) / instance_id
         playlist_path = out_dir / "playlist.m3u8"
 
         if not out_dir.exists():
@@ -113,85 +381,33 @@ class HLSStreamService:
         logger.info(f"Starting HLS stream for {media_file} in {out_dir}")
 
         try:
-            probe_info = await self._probe_media_file(media_file)
-            audio_info = probe_info.get("audio", {})
-
-            cmd = [
-                "ffmpeg",
-                "-i",
-                media_file,
-                "-map",
-                "0:a:0",
-                "-c:a",
-                "aac",
-                "-b:a",
-                config.bitrate,
-                "-profile:a",
-                "aac_low",
-                "-ar",
-                str(audio_info.get("sample_rate", 48000)),
-                "-ac",
-                str(audio_info.get("channels", 2)),
-                "-avoid_negative_ts",
-                "make_zero",
-                "-f",
-                "hls",
-                "-hls_time",
-                str(config.segment_duration),
-                "-hls_list_size",
-                "0",
-                "-hls_flags",
-                "independent_segments",
-                "-hls_segment_filename",
-                str(out_dir / "segment%d.aac"),
-                "-hls_base_url",
-                f"/api/instances/{instance_id}/hls/",
-                "-y",
-                str(playlist_path),
-            ]
-
-            logger.debug(f"Running FFmpeg command: {' '.join(cmd)}")
-
-            def start_ffmpeg():
-                try:
-                    process = subprocess.Popen(
-                        cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        bufsize=0,
-                    )
-                    return process
-                except Exception as e:
-                    logger.error(f"Failed to start FFmpeg process: {e}")
-                    return None
-
-            loop = asyncio.get_event_loop()
-            process = await loop.run_in_executor(self.executor, start_ffmpeg)
-
-            if process is None:
-                raise Exception("Failed to start FFmpeg process")
+            process = None
+            vod = None
+            if settings.hls_mode == "vod":
+                vod = await self._create_vod_stream(
+                    instance_id, media_file, out_dir, config, playlist_path
+                )
+            if vod is None:
+                process = await self._start_encoder(
+                    instance_id,
+                    media_file,
+                    out_dir,
+                    config,
+                    playlist_path,
+                    background=background,
+                )
 
-            self.active_streams[instance_id] = StreamInfo(
+            return StreamInfo(
                 process=process,
                 playlist_path=playlist_path,
                 output_dir=out_dir,
                 config=config,
                 media_file=media_file,
+                table=SegmentTable(playlist_path),
+                vod=vod,
+                suspended=False,
             )
 
-            handler = HLSSegmentHandler(instance_id, self._handle_new_segment)
-            observer = Observer()
-            observer.schedule(handler, str(out_dir), recursive=True)
-            observer.start()
-            self.segment_watchers[instance_id] = observer
-
-            asyncio.create_task(self._monitor_process(instance_id, process))
-            asyncio.create_task(self._periodic_segment_check(instance_id))
-            self._log_ffmpeg_stderr(instance_id, process)
-
-            logger.info(f"HLS stream for {media_file} started in {out_dir}")
-            return True
-
         except Exception as e:
             logger.error(
                 f"Failed to start HLS stream for {instance_id}: {type(e).__name__}: {e}"
@@ -204,7 +420,139 @@ class HLSStreamService:
                     logger.debug(f"Cleaned up output directory: {out_dir}")
                 except Exception as cleanup_error:
                     logger.error(f"Failed to cleanup output directory: {cleanup_error}")
-            return False
+            return None
+
+    async def _create_vod_stream(
+        self,
+        instance_id: str,
+        media_file: str,
+        out_dir: Path,
+        config: HLSConfig,
+        playlist_path: Path,
+    ) -> Optional[VODStream]:
+        """Write the complete playlist of a file whose segments are encoded
+        on request. None if its duration is unknown, and so its segments"""
+        probe_info = await self.probe_media_file(media_file)
+        duration = probe_info.get("duration")
+        if not duration:
+            logger.warning(
+                f"No duration for {media_file}, encoding it from the start instead"
+            )
+            return None
+
+        vod = VODStream(
+            instance_id,
+            media_file,
+            out_dir,
+            config,
+            duration,
+            probe_info.get("audio", {}),
+            self.vod_pool,
+            settings.hls_vod_lookahead,
+            self._handle_new_segment,
+        )
+        playlist = vod.render_playlist()
+
+        def write_playlist():
+            tmp_path = playlist_path.with_name(playlist_path.name + ".tmp")
+            tmp_path.write_text(playlist)
+            os.replace(tmp_path, playlist_path)
+
+        await asyncio.to_thread(write_playlist)
+        logger.info(
+            f"VOD playlist for {media_file}: {vod.segment_count} segments "
+            f"of {config.segment_duration}s"
+        )
+        return vod
+
+    async def _start_encoder(
+        self,
+        instance_id: str,
+        media_file: str,
+        out_dir: Path,
+        config: HLSConfig,
+        playlist_path: Path,
+        start_time: float = 0.0,
+        start_number: int = 0,
+        background: bool = False,
+    ) -> subprocess.Popen:
+        """Run ffmpeg from ``start_time`` seconds into the file, numbering its
+        segments from ``start_number``"""
+        probe_info = await self.probe_media_file(media_file, background=background)
+        audio_info = probe_info.get("audio", {})
+
+        # -ss before -i seeks the input instead of decoding up to the position
+        seek_args = ["-ss", f"{start_time:.3f}"] if start_time > 0 else []
+        cmd = [
+            "ffmpeg",
+            *seek_args,
+            "-i",
+            media_file,
+            "-map",
+            "0:a:0",
+            "-c:a",
+            "aac",
+            "-b:a",
+            config.bitrate,
+            "-profile:a",
+            "aac_low",
+            "-ar",
+            str(audio_info.get("sample_rate", 48000)),
+            "-ac",
+            str(audio_info.get("channels", 2)),
+            "-avoid_negative_ts",
+            "make_zero",
+            "-f",
+            "hls",
+            "-hls_time",
+            str(config.segment_duration),
+            # The complete list: the served playlist is rendered from it, and
+            # _refresh_table only parses what was appended since last time
+            "-hls_list_size",
+            "0",
+            "-hls_flags",
+            # temp_file: segments appear under their final name only
+            # once complete, so they can be served as immutable files
+            "independent_segments+temp_file",
+            "-start_number",
+            str(start_number),
+            "-hls_segment_filename",
+            str(out_dir / "segment%d.aac"),
+            "-hls_base_url",
+            f"/api/instances/{instance_id}/hls/",
+            "-y",
+            str(playlist_path),
+        ]
+
+        popen_args: Dict[str, Any] = {}
+        if background:
+            cmd, popen_args = background_process(cmd)
+
+        logger.debug(f"Running FFmpeg command: {' '.join(cmd)}")
+
+        def start_ffmpeg():
+            try:
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    bufsize=0,
+                    **popen_args,
+                )
+                return process
+            except Exception as e:
+                logger.error(f"Failed to start FFmpeg process: {e}")
+                return None
+
+        loop = asyncio.get_event_loop()
+        process = await loop.run_in_executor(self.executor, start_ffmpeg)
+
+        if process is None:
+            raise Exception("Failed to start FFmpeg process")
+
+        asyncio.create_task(self._monitor_process(instance_id, process))
+        self._log_ffmpeg_stderr(instance_id, process)
+        return process
 
     async def stop_stream(self, instance_id: str):
         if instance_id not in self.active_streams:
@@ -215,35 +563,41 @@ class HLSStreamService:
         self.stream_readiness.pop(instance_id, None)
         self.segment_counts.pop(instance_id, None)
         self.on_ready_cbs.pop(instance_id, None)
+        self.segment_cache.drop(instance_id)
+        self.gc_stats.pop(instance_id, None)
+
+        from services.mpv_manager import mpv_manager
+
+        mpv_manager.remove_state_listener(instance_id, self._on_player_state)
+        # Let a restart in progress finish, so its encoder is the one stopped
+        seek_task = self.seek_tasks.get(instance_id)
+        if seek_task is not None:
+            await asyncio.gather(seek_task, return_exceptions=True)
+        self.pending_seeks.pop(instance_id, None)
+        self.seek_stats.pop(instance_id, None)
 
         stream = self.active_streams[instance_id]
-        process = stream["process"]
-        out_dir = stream["output_dir"]
 
         if instance_id in self.segment_watchers:
             self.segment_watchers[instance_id].stop()
             self.segment_watchers[instance_id].join()
             del self.segment_watchers[instance_id]
 
-        if process and process.returncode is None:
-            process.terminate()
-            try:
+        await self._discard_stream(stream)
 
-                def wait_for_termination():
-                    return process.wait()
+        del self.active_streams[instance_id]
+        self.segment_callbacks.pop(instance_id, None)
+        self.ws_clients.pop(instance_id, None)
+        logger.info(f"HLS stream for {instance_id} stopped")
 
-                loop = asyncio.get_event_loop()
-                await asyncio.wait_for(
-                    loop.run_in_executor(self.executor, wait_for_termination),
-                    timeout=10,
-                )
-            except asyncio.TimeoutError:
-                process.kill()
+    async def _discard_stream(self, stream: StreamInfo):
+        """Stop a stream's encoder and remove its output"""
+        out_dir = stream["output_dir"]
 
-                def wait_for_kill():
-                    return process.wait()
+        if stream["vod"] is not None:
+            stream["vod"].close()
 
-                await loop.run_in_executor(self.executor, wait_for_kill)
+        await self._stop_encoder(stream["process"])
 
         if out_dir.exists():
             try:
@@ -252,12 +606,44 @@ class HLSStreamService:
             except Exception as e:
                 logger.error(f"Error removing HLS output directory {out_dir}: {e}")
 
-        del self.active_streams[instance_id]
-        self.segment_callbacks.pop(instance_id, None)
-        self.ws_clients.pop(instance_id, None)
-        logger.info(f"HLS stream for {instance_id} stopped")
+    async def _stop_encoder(self, process: subprocess.Popen):
+        if process and process.returncode is None:
+            process.terminate()
+            if hasattr(signal, "SIGCONT"):
+                # A suspended encoder only acts on SIGTERM once resumed
+                process.send_signal(signal.SIGCONT)
+            try:
+                await asyncio.wait_for(wait_process(process), timeout=10)
+            except asyncio.TimeoutError:
+                process.kill()
+                try:
+                    await asyncio.wait_for(wait_process(process), timeout=5)
+                except asyncio.TimeoutError:
+                    logger.error(
+                        f"FFmpeg process {process.pid} did not exit after kill"
+                    )
 
-    async def _probe_media_file(self, media_file: str) -> Dict:
+    async def probe_media_file(self, media_file: str, background: bool = False) -> Dict:
+        """_probe_media_file, remembered per file version"""
+        try:
+            key = (media_file, Path(media_file).stat().st_mtime)
+        except OSError:
+            return await self._probe_media_file(media_file, background)
+
+        info = self.probe_cache.get(key)
+        if info is not None:
+            self.probe_cache.move_to_end(key)
+            return info
+
+        info = await self._probe_media_file(media_file, background)
+        self.probe_cache[key] = info
+        while len(self.probe_cache) > settings.hls_probe_cache_size:
+            self.probe_cache.popitem(last=False)
+        return info
+
+    async def _probe_media_file(
+        self, media_file: str, background: bool = False
+    ) -> Dict:
         cmd = [
             "ffprobe",
             "-v",
@@ -265,16 +651,21 @@ class HLSStreamService:
             "-print_format",
             "json",
             "-show_streams",
+            "-show_format",
             media_file,
         ]
 
         try:
             logger.debug(f"Running ffprobe command: {' '.join(cmd)}")
 
+            popen_args: Dict[str, Any] = {}
+            if background:
+                cmd, popen_args = background_process(cmd)
+
             def run_ffprobe():
                 try:
                     result = subprocess.run(
-                        cmd, capture_output=True, text=True, timeout=30
+                        cmd, capture_output=True, text=True, timeout=30, **popen_args
                     )
                     return result.returncode, result.stdout, result.stderr
                 except FileNotFoundError:
@@ -344,7 +735,11 @@ class HLSStreamService:
                     break
 
             logger.debug(f"Extracted audio info: {audio_info}")
-            return {"audio": audio_info}
+            try:
+                duration = float(data.get("format", {}).get("duration"))
+            except (TypeError, ValueError):
+                duration = None
+            return {"audio": audio_info, "duration": duration}
 
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse ffprobe JSON output for {media_file}: {e}")
@@ -372,12 +767,7 @@ class HLSStreamService:
 
     async def _monitor_process(self, instance_id: str, process):
         try:
-
-            def wait_for_process():
-                return process.wait()
-
-            loop = asyncio.get_event_loop()
-            ret_code = await loop.run_in_executor(self.executor, wait_for_process)
+            ret_code = await wait_process(process)
 
             if ret_code == 0:
                 logger.info(f"HLS encoding completed for instance {instance_id}")
@@ -417,12 +807,44 @@ class HLSStreamService:
         self, instance_id: str, segment_num: int
     ) -> Optional[Path]:
         stream = self.active_streams.get(instance_id)
+        if stream and stream["vod"] is not None:
+            return await stream["vod"].get_segment(segment_num)
         if stream:
             segment_path = stream["output_dir"] / f"segment{segment_num}.aac"
             if segment_path.exists():
                 return segment_path
         return None
 
+    def get_cached_segment(
+        self, instance_id: str, segment_num: int
+    ) -> Optional[CachedSegment]:
+        return self.segment_cache.get(instance_id, segment_num)
+
+    async def load_segment(
+        self, instance_id: str, segment_num: int
+    ) -> Optional[CachedSegment]:
+        """Read a segment that is not cached yet and cache it for the next
+        listener. None if there is no such segment or caching is off"""
+        stream = self.active_streams.get(instance_id)
+        if stream is None or not self.segment_cache.enabled:
+            return None
+        segment_path = await self.get_segment_path(instance_id, segment_num)
+        if segment_path is None:
+            return None
+
+        def read_segment():
+            with open(segment_path, "rb") as f:
+                return f.read(), segment_etag(os.fstat(f.fileno()))
+
+        try:
+            data, etag = await asyncio.to_thread(read_segment)
+        except FileNotFoundError:
+            return None
+        # The stream may have been stopped or switched while reading
+        if self.active_streams.get(instance_id) is stream:
+            self.segment_cache.put(instance_id, segment_num, data, etag)
+        return CachedSegment(data, etag)
+
     def add_segment_callback(self, instance_id: str, callback: Callable):
         if instance_id not in self.segment_callbacks:
             self.segment_callbacks[instance_id] = set()
@@ -437,6 +859,19 @@ class HLSStreamService:
 
         self.segment_counts[instance_id] = self.segment_counts.get(instance_id, 0) + 1
 
+        pending = self.pending_seeks.get(instance_id)
+        if pending is not None and segment_info.number >= pending[1]:
+            del self.pending_seeks[instance_id]
+            latency = time.monotonic() - pending[0]
+            self.seek_latencies.append(latency)
+            self.seek_stats.setdefault(instance_id, {"restarts": 0})["lastMs"] = round(
+                latency * 1000, 1
+            )
+            logger.info(
+                f"First segment after seek of {instance_id} ready in "
+                f"{latency * 1000:.0f} ms"
+            )
+
         if not self.stream_readiness.get(instance_id, False):
             if self.segment_counts[instance_id] > self.min_segment_for_ready:
                 self.stream_readiness[instance_id] = True
@@ -468,7 +903,9 @@ class HLSStreamService:
 
                 if out_dir.exists():
                     segment_files = list(out_dir.glob("segment*.aac"))
-                    current_count = len(segment_files)
+                    current_count = len(segment_files) + self.gc_stats.get(
+                        instance_id, {}
+                    ).get("removedSegments", 0)
 
                     old_count = self.segment_counts.get(instance_id, 0)
 
@@ -503,6 +940,315 @@ class HLSStreamService:
 
         logger.debug(f"Stopped periodic segment check for {instance_id}")
 
+    def _playback_position(
+        self, instance_id: str, stream: StreamInfo
+    ) -> Optional[float]:
+        """Where mpv is in the stream's file, None while it plays another"""
+        from services.mpv_manager import mpv_manager
+
+        state = mpv_manager.get_player_state(instance_id) or {}
+        if state.get("path") != stream["media_file"]:
+            return None
+        position = state.get("time-pos")
+        if isinstance(position, bool) or not isinstance(position, (int, float)):
+            return None
+        return float(position)
+
+    async def _refresh_table(self, stream: StreamInfo) -> SegmentTable:
+        """Read what the running encoder added to its playlist since the
+        last look"""
+        table = stream["table"]
+        run = table.latest
+        playlist_path = run.playlist_path
+        offset = table.tail_offset()
+        anchor = run.anchor
+
+        def read_if_changed():
+            try:
+                stat_result = playlist_path.stat()
+                version = (stat_result.st_mtime_ns, stat_result.st_size)
+                if version == run.version:
+                    return None
+                with open(playlist_path, "rb") as f:
+                    if anchor:
+                        f.seek(offset)
+                        tail = f.read()
+                        if tail.startswith(anchor):
+                            return version, tail, True
+                        f.seek(0)
+                    return version, f.read(), False
+            except FileNotFoundError:
+                return None
+
+        changed = await asyncio.to_thread(read_if_changed)
+        # An encoder restart may have started a new run meanwhile
+        if changed is not None and table.latest is run:
+            version, data, is_tail = changed
+            if is_tail:
+                # Read already if another refresh got there first
+                if table.parse_tail(data):
+                    run.version = version
+            else:
+                table.parse(data)
+                run.version = version
+        return table
+
+    async def render_playlist(self, instance_id: str) -> Optional[str]:
+        """The playlist of a stream: the sliding window, or after encoder
+        restarts the segments of the latest one. None when ffmpeg's own
+        playlist is served"""
+        stream = self.active_streams.get(instance_id)
+        # A VOD stream's playlist file is complete as written
+        if stream is None or stream["vod"] is not None:
+            return None
+        restarted = len(stream["table"].runs) > 1
+        if settings.hls_list_size <= 0 and not restarted:
+            return None
+
+        table = await self._refresh_table(stream)
+        # Segments of runs before the last seek hold audio from before it
+        run_start = table.latest_first_index()
+        if settings.hls_list_size <= 0:
+            return table.render(run_start)
+
+        position = self._playback_position(instance_id, stream)
+        index = table.index_at(position) if position is not None else None
+        if index is None:
+            # Not playing this file yet, or ahead of the encoder
+            if position is None or position < table.latest_start_time:
+                index = run_start
+            else:
+                index = len(table.entries) - 1
+
+        # One segment of slack behind the playing one, for clients that lag
+        first = max(index - 1, run_start, table.first_available())
+        return table.render(first, settings.hls_list_size)
+
+    def _on_player_state(self, instance_id: str, name: str, value: Any):
+        """Notice mpv seeking outside what the encoder has covered"""
+        if name != "time-pos" or instance_id in self.seek_tasks:
+            return
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        stream = self.active_streams.get(instance_id)
+        # The table may be a little behind the encoder; _follow_seek
+        # refreshes it before deciding
+        if stream is None or stream["table"].covers(
+            value, settings.hls_seek_restart_margin
+        ):
+            return
+        self.seek_tasks[instance_id] = asyncio.create_task(
+            self._follow_seek(instance_id, stream, time.monotonic())
+        )
+
+    async def _follow_seek(
+        self, instance_id: str, stream: StreamInfo, requested_at: float
+    ):
+        try:
+            while self.active_streams.get(instance_id) is stream:
+                position = self._playback_position(instance_id, stream)
+                if position is None:
+                    return
+                table = await self._refresh_table(stream)
+                if table.covers(position, settings.hls_seek_restart_margin):
+                    return
+                await self._restart_encoder(instance_id, stream, position, requested_at)
+                # mpv may have seeked again while the encoder restarted
+                requested_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Error following seek of {instance_id}: {e}")
+        finally:
+            self.seek_tasks.pop(instance_id, None)
+
+    async def _restart_encoder(
+        self,
+        instance_id: str,
+        stream: StreamInfo,
+        position: Optional[float] = None,
+        requested_at: Optional[float] = None,
+    ):
+        """Replace the stream's encoder with one starting at ``position``, or
+        where the stopped one got to when None.
+
+        The new encoder writes to the same directory with a playlist of its
+        own and numbers its segments after the last one written, so segment
+        URLs never repeat and clients see the jump as a discontinuity.
+        ``requested_at`` is when the seek that asked for it was noticed.
+        """
+        out_dir = stream["output_dir"]
+
+        await self._stop_encoder(stream["process"])
+        table = await self._refresh_table(stream)
+        continues = position is None
+        if position is None:
+            position = table.latest.end_time
+        logger.info(f"Restarting HLS encoder of {instance_id} at {position:.1f}s")
+
+        def last_on_disk() -> int:
+            numbers = [
+                int(path.stem[len("segment") :])
+                for path in out_dir.glob("segment*.aac")
+                if path.stem[len("segment") :].isdigit()
+            ]
+            return max(numbers, default=-1)
+
+        # A segment may have been renamed into place after the playlist was
+        # last written
+        start_number = max(table.next_number, await asyncio.to_thread(last_on_disk) + 1)
+        playlist_path = out_dir / f"playlist-{len(table.runs)}.m3u8"
+
+        try:
+            process = await self._start_encoder(
+                instance_id,
+                stream["media_file"],
+                out_dir,
+                stream["config"],
+                playlist_path,
+                start_time=position,
+                start_number=start_number,
+            )
+        except Exception as e:
+            logger.error(f"Failed to restart HLS encoder of {instance_id}: {e}")
+            return
+
+        stream["process"] = process
+        table.add_run(position, start_number, playlist_path, continues)
+        if requested_at is not None:
+            self.pending_seeks[instance_id] = (requested_at, start_number)
+            stats = self.seek_stats.setdefault(instance_id, {"restarts": 0})
+            stats["restarts"] += 1
+
+    def get_seek_stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.seek_latencies)
+        return {
+            "enabled": settings.hls_seek_restart and settings.hls_mode != "vod",
+            "restartMargin": settings.hls_seek_restart_margin,
+            "pending": len(self.pending_seeks),
+            "samples": len(latencies),
+            "p50Ms": round(latencies[len(latencies) // 2] * 1000, 1)
+            if latencies
+            else None,
+            "maxMs": round(latencies[-1] * 1000, 1) if latencies else None,
+            "streams": self.seek_stats,
+        }
+
+    async def _collect_segments(self, instance_id: str, stream: StreamInfo):
+        """Delete segments that fell far behind mpv's position"""
+        while self.active_streams.get(instance_id) is stream:
+            await asyncio.sleep(settings.hls_gc_interval)
+            if self.active_streams.get(instance_id) is not stream:
+                break
+            try:
+                position = self._playback_position(instance_id, stream)
+                if position is None:
+                    continue
+                table = await self._refresh_table(stream)
+                index = table.index_at(position)
+                if index is None:
+                    continue
+
+                keep_from = table.entries[index].number - settings.hls_retain_segments
+                if keep_from <= table.removed_below:
+                    continue
+
+                removed, freed = await asyncio.to_thread(
+                    self._remove_segments,
+                    stream["output_dir"],
+                    table.removed_below,
+                    keep_from,
+                )
+                table.removed_below = keep_from
+                stats = self.gc_stats.setdefault(
+                    instance_id, {"removedSegments": 0, "freedBytes": 0}
+                )
+                stats["removedSegments"] += removed
+                stats["freedBytes"] += freed
+                if removed:
+                    logger.debug(
+                        f"Removed {removed} HLS segments ({freed} bytes) behind "
+                        f"playback of {instance_id}"
+                    )
+            except Exception as e:
+                logger.error(f"Error collecting HLS segments of {instance_id}: {e}")
+
+    @staticmethod
+    def _remove_segments(out_dir: Path, first: int, end: int) -> Tuple[int, int]:
+        removed = 0
+        freed = 0
+        for number in range(first, end):
+            segment_path = out_dir / f"segment{number}.aac"
+            try:
+                size = segment_path.stat().st_size
+                segment_path.unlink()
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += size
+        return removed, freed
+
+    async def get_disk_usage(self) -> Dict[str, Any]:
+        """Bytes under hls_dir, per stream directory"""
+        owners: Dict[str, Tuple[str, str]] = {}
+        for instance_id, stream in self.active_streams.items():
+            owners[stream["output_dir"].name] = (instance_id, "active")
+        for instance_id, stream in self.prepared_streams.items():
+            owners[stream["output_dir"].name] = (instance_id, "prepared")
+        hls_dir = Path(settings.hls_dir)
+
+        def scan() -> List[Tuple[str, int, int]]:
+            usage = []
+            if not hls_dir.exists():
+                return usage
+            for directory in hls_dir.iterdir():
+                if not directory.is_dir():
+                    continue
+                files = 0
+                size = 0
+                for entry in os.scandir(directory):
+                    try:
+                        size += entry.stat().st_size
+                        files += 1
+                    except FileNotFoundError:
+                        continue
+                usage.append((directory.name, files, size))
+            return usage
+
+        streams = []
+        for name, files, size in await asyncio.to_thread(scan):
+            instance_id, state = owners.get(name, (None, "orphaned"))
+            stats = self.gc_stats.get(instance_id, {}) if state == "active" else {}
+            streams.append(
+                {
+                    "directory": name,
+                    "instanceId": instance_id,
+                    "state": state,
+                    "files": files,
+                    "bytes": size,
+                    "removedSegments": stats.get("removedSegments", 0),
+                    "freedBytes": stats.get("freedBytes", 0),
+                }
+            )
+
+        return {
+            "hlsDir": str(hls_dir),
+            "window": settings.hls_list_size,
+            "retainSegments": settings.hls_retain_segments,
+            "totalBytes": sum(stream["bytes"] for stream in streams),
+            "streams": streams,
+        }
+
+    def get_vod_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.hls_mode,
+            "lookahead": settings.hls_vod_lookahead,
+            **self.vod_pool.get_stats(),
+            "streams": {
+                instance_id: stream["vod"].get_stats()
+                for instance_id, stream in self.active_streams.items()
+                if stream["vod"] is not None
+            },
+        }
+
     async def get_stream_status(self, instance_id: str) -> HLSStreamStatus:
         stream = self.active_streams.get(instance_id)
         if not stream:
@@ -520,12 +1266,17 @@ class HLSStreamService:
             segmentCount=self.segment_counts.get(instance_id, 0),
             playlistUrl=f"/api/instances/{instance_id}/hls/playlist.m3u8",
             mediaFile=stream["media_file"],
+            encoderRestarts=self.seek_stats.get(instance_id, {}).get("restarts", 0),
+            seekToAudioMs=self.seek_stats.get(instance_id, {}).get("lastMs"),
         )
 
     async def shutdown(self):
         for instance_id in list(self.active_streams.keys()):
             await self.stop_stream(instance_id)
 
+        for instance_id in list(self.prepared_streams.keys()):
+            await self.discard_prepared_stream(instance_id)
+
         for instance_id in list(self.segment_watchers.keys()):
             self.segment_watchers[instance_id].stop()
             self.segment_watchers[instance_id].join()
@@ -541,6 +1292,7 @@ class HLSStreamService:
         self.segment_counts.clear()
         self.on_ready_cbs.clear()
 
+        await self.vod_pool.shutdown()
         self.executor.shutdown(wait=True)
         logger.info("HLS stream service shutdown complete")
 
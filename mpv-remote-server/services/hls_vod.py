@@ -0,0 +1,349 @@
+import asyncio
+import itertools
+import logging
+import math
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from models.model import HLSConfig, HLSSegmentInfo
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+# Requested segments go ahead of lookahead ones
+PRIORITY_REQUESTED = 0
+PRIORITY_LOOKAHEAD = 1
+
+# Longest a single segment job may run
+SEGMENT_TIMEOUT = 60
+
+# Samples per AAC-LC frame; segment boundaries fall on whole frames
+AAC_FRAME_SAMPLES = 1024
+# Frames encoded ahead of a segment and thrown away, so the encoder is
+# warmed up by the audio before the boundary instead of starting cold
+PREROLL_FRAMES = 4
+# The first frame out of ffmpeg's AAC encoder holds its priming delay
+PRIMING_FRAMES = 1
+
+# Packed audio segments carry their start time in this ID3 PRIV frame
+TIMESTAMP_OWNER = b"com.apple.streaming.transportStreamTimestamp\x00"
+
+
+def split_adts(data: bytes) -> List[bytes]:
+    """Cut an ADTS stream into its frames, leaving out a truncated last one"""
+    frames = []
+    offset = 0
+    while offset + 7 <= len(data):
+        header = data[offset : offset + 7]
+        if header[0] != 0xFF or header[1] & 0xF0 != 0xF0:
+            raise ValueError(f"No ADTS sync word at byte {offset}")
+        length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+        if length < 7:
+            raise ValueError(f"Bad ADTS frame length {length} at byte {offset}")
+        if offset + length > len(data):
+            break
+        frames.append(data[offset : offset + length])
+        offset += length
+    return frames
+
+
+def _syncsafe(value: int) -> bytes:
+    return bytes((value >> shift) & 0x7F for shift in (21, 14, 7, 0))
+
+
+def timestamp_tag(seconds: float) -> bytes:
+    """ID3v2.4 tag giving a packed audio segment's start as a 90 kHz MPEG-TS
+    timestamp, as HLS players expect at the head of .aac segments"""
+    pts = round(seconds * 90000) & ((1 << 33) - 1)
+    payload = TIMESTAMP_OWNER + pts.to_bytes(8, "big")
+    frame = b"PRIV" + _syncsafe(len(payload)) + b"\x00\x00" + payload
+    return b"ID3\x04\x00\x00" + _syncsafe(len(frame)) + frame
+
+
+class VODEncoderPool:
+    """A fixed number of workers running segment jobs for every VOD stream.
+
+    Jobs are taken requested first, then lookahead, oldest first within
+    each. A job queued for lookahead and then requested is queued again at
+    the higher priority; both entries share one future, and whichever
+    worker gets to it second finds it done and moves on.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # Created with the workers, on the first job
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._order = itertools.count()
+        # Futures of the jobs being encoded right now
+        self._running: Set[asyncio.Future] = set()
+        self.stats = {"encoded": 0, "failed": 0, "encodeSeconds": 0.0}
+
+    def submit(
+        self, stream: "VODStream", number: int, future: asyncio.Future, priority: int
+    ):
+        if self.queue is None:
+            self.queue = asyncio.PriorityQueue()
+            self._tasks = [
+                asyncio.create_task(self._work()) for _ in range(self.workers)
+            ]
+        self.queue.put_nowait((priority, next(self._order), stream, number, future))
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, stream, number, future = await self.queue.get()
+            if future.done() or future in self._running or stream.closed:
+                continue
+            self._running.add(future)
+            started = loop.time()
+            try:
+                path = await stream.encode(number)
+            except Exception as e:
+                if stream.closed:
+                    # Its directory went away with the stream
+                    logger.debug(f"Dropped segment {number} of a stopped stream")
+                else:
+                    self.stats["failed"] += 1
+                    logger.error(
+                        f"Failed to encode segment {number} of {stream.media_file}: {e}"
+                    )
+                if not future.done():
+                    future.set_result(None)
+                continue
+            finally:
+                self._running.discard(future)
+            self.stats["encoded"] += 1
+            self.stats["encodeSeconds"] += loop.time() - started
+            if not future.done():
+                future.set_result(path)
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        encoded = self.stats["encoded"]
+        return {
+            "workers": self.workers,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "running": len(self._running),
+            "encoded": encoded,
+            "failed": self.stats["failed"],
+            "avgEncodeMs": round(self.stats["encodeSeconds"] / encoded * 1000, 1)
+            if encoded
+            else None,
+        }
+
+
+class VODStream:
+    """An HLS stream whose segments are encoded when they are asked for.
+
+    The playlist is complete from the start: the probed duration cut into
+    segments of about config.segment_duration seconds. Each segmentN.aac is
+    made by a short ffmpeg run over its own time range, written next to the
+    playlist and kept there, so each is encoded at most once per stream.
+    A request also queues the next ``lookahead`` segments, so a listener
+    playing straight through rarely waits.
+
+    Segments are cut at AAC frame boundaries, so the durations in the
+    playlist are exactly what each segment holds and consecutive segments
+    join without gaps or overlap: every job starts PREROLL_FRAMES early and
+    drops the encoder's priming frame and the preroll from its output.
+    """
+
+    def __init__(
+        self,
+        instance_id: str,
+        media_file: str,
+        out_dir: Path,
+        config: HLSConfig,
+        duration: float,
+        audio_info: Dict,
+        pool: VODEncoderPool,
+        lookahead: int,
+        on_segment: Callable,
+    ):
+        self.instance_id = instance_id
+        self.media_file = media_file
+        self.out_dir = out_dir
+        self.config = config
+        self.duration = duration
+        self.audio_info = audio_info
+        self.pool = pool
+        self.lookahead = lookahead
+        self.on_segment = on_segment
+        self.sample_rate = int(audio_info.get("sample_rate") or 48000)
+        self.frame_seconds = AAC_FRAME_SAMPLES / self.sample_rate
+        self.total_frames = math.ceil(duration / self.frame_seconds)
+        self.segment_frames = max(
+            1, round(config.segment_duration / self.frame_seconds)
+        )
+        self.segment_count = math.ceil(self.total_frames / self.segment_frames)
+        # segment number -> the job producing it
+        self.jobs: Dict[int, asyncio.Future] = {}
+        self.closed = False
+
+    def segment_frames_range(self, number: int) -> Tuple[int, int]:
+        """First AAC frame of a segment and its number of frames"""
+        first = number * self.segment_frames
+        return first, min(self.segment_frames, self.total_frames - first)
+
+    def segment_range(self, number: int) -> Tuple[float, float]:
+        """Start and length of a segment, in seconds"""
+        first, count = self.segment_frames_range(number)
+        return first * self.frame_seconds, count * self.frame_seconds
+
+    def encode_range(self, number: int) -> Tuple[float, float, int, int]:
+        """What to ask ffmpeg for to make a segment: start and length in
+        seconds, then the frames of its output to skip and to keep"""
+        first, count = self.segment_frames_range(number)
+        preroll = min(PREROLL_FRAMES, first)
+        skip = preroll + PRIMING_FRAMES
+        start = (first - preroll) * self.frame_seconds
+        # One frame more than needed, in case the last one comes out short
+        length = (skip + count + 1) * self.frame_seconds
+        return start, length, skip, count
+
+    def render_playlist(self) -> str:
+        target_duration = math.ceil(self.segment_frames * self.frame_seconds)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:VOD",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+        ]
+        for number in range(self.segment_count):
+            _, length = self.segment_range(number)
+            lines.append(f"#EXTINF:{length:.6f},")
+            lines.append(f"/api/instances/{self.instance_id}/hls/segment{number}.aac")
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def segment_path(self, number: int) -> Path:
+        return self.out_dir / f"segment{number}.aac"
+
+    async def get_segment(self, number: int) -> Optional[Path]:
+        """The segment's file, encoded first if need be; None if it is out of
+        range or could not be encoded"""
+        if self.closed or not 0 <= number < self.segment_count:
+            return None
+
+        future = self._schedule(number, PRIORITY_REQUESTED)
+        last = min(number + self.lookahead, self.segment_count - 1)
+        for ahead in range(number + 1, last + 1):
+            self._schedule(ahead, PRIORITY_LOOKAHEAD)
+        # Shielded: a client hanging up must not cancel the job for others
+        return await asyncio.shield(future)
+
+    def _schedule(self, number: int, priority: int) -> asyncio.Future:
+        future = self.jobs.get(number)
+        if future is None or (
+            # Failed before: only a request tries again
+            priority == PRIORITY_REQUESTED and future.done() and future.result() is None
+        ):
+            future = asyncio.get_running_loop().create_future()
+            self.jobs[number] = future
+            self.pool.submit(self, number, future, priority)
+        elif priority == PRIORITY_REQUESTED and not future.done():
+            self.pool.submit(self, number, future, priority)
+        return future
+
+    async def encode(self, number: int) -> Path:
+        first, _ = self.segment_frames_range(number)
+        start, length, skip, count = self.encode_range(number)
+        path = self.segment_path(number)
+        tmp_path = path.with_name(path.name + ".tmp")
+        cmd = [
+            "ffmpeg",
+            "-nostdin",
+            "-v",
+            "error",
+            # Input seek: ffmpeg jumps near the position and decodes from
+            # there, discarding audio up to the exact start
+            "-ss",
+            f"{start:.6f}",
+            "-i",
+            self.media_file,
+            "-t",
+            f"{length:.6f}",
+            "-map",
+            "0:a:0",
+            "-c:a",
+            "aac",
+            "-b:a",
+            self.config.bitrate,
+            "-profile:a",
+            "aac_low",
+            "-ar",
+            str(self.sample_rate),
+            "-ac",
+            str(self.audio_info.get("channels", 2)),
+            "-f",
+            "adts",
+            "pipe:1",
+        ]
+
+        def run_ffmpeg():
+            result = subprocess.run(cmd, capture_output=True, timeout=SEGMENT_TIMEOUT)
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"ffmpeg exited with {result.returncode}: "
+                    f"{result.stderr.decode(errors='replace').strip()[-300:]}"
+                )
+            frames = split_adts(result.stdout)[skip : skip + count]
+            if not frames:
+                raise RuntimeError(f"ffmpeg produced no audio from {start:.3f}s")
+            tmp_path.write_bytes(
+                timestamp_tag(first * self.frame_seconds) + b"".join(frames)
+            )
+            # Renamed into place complete, like the live encoder's segments
+            os.replace(tmp_path, path)
+
+        await asyncio.to_thread(run_ffmpeg)
+
+        if not self.closed:
+            await self.on_segment(
+                HLSSegmentInfo(
+                    name=path.name,
+                    url=f"/api/instances/{self.instance_id}/hls/{path.name}",
+                    number=number,
+                    size=path.stat().st_size,
+                    instanceId=self.instance_id,
+                )
+            )
+        return path
+
+    def close(self):
+        """Stop handing out segments; queued jobs are skipped"""
+        self.closed = True
+        for future in self.jobs.values():
+            if not future.done():
+                future.set_result(None)
+        self.jobs.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "segments": self.segment_count,
+            "encoded": sum(
+                1
+                for future in self.jobs.values()
+                if future.done() and future.result() is not None
+            ),
+            "pending": sum(1 for future in self.jobs.values() if not future.done()),
+        }
@@ -0,0 +1,88 @@
+import logging
+import os
+import subprocess
+import sys
+from typing import Any
+
+from models.model import MPVInstance
+from services.mpv_ipc import MPVIPCConnection
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+class MPVBackend:
+    """How MPVManager starts a player and talks to it.
+
+    ``spawn`` returns a process handle with the subset of the
+    subprocess.Popen interface the manager relies on (pid, poll, wait,
+    terminate, kill). ``connect`` returns a connection with the
+    MPVIPCConnection interface: request/request_many taking JSON IPC style
+    payloads, and event listeners receiving JSON IPC style events.
+    """
+
+    name = ""
+    # Whether players keep running when the server process exits, and can
+    # be adopted again by the next one
+    outlives_server = False
+
+    async def spawn(self, instance: MPVInstance, args: list[str]) -> Any:
+        raise NotImplementedError
+
+    def is_reachable(self, instance: MPVInstance, address: str) -> bool:
+        """Cheap check that a connection attempt can succeed yet"""
+        return True
+
+    async def connect(self, instance: MPVInstance, address: str) -> Any:
+        raise NotImplementedError
+
+
+class SubprocessBackend(MPVBackend):
+    """The mpv binary as a child process, controlled over its JSON IPC server"""
+
+    name = "subprocess"
+    outlives_server = True
+
+    async def spawn(self, instance: MPVInstance, args: list[str]) -> Any:
+        return subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def is_reachable(self, instance: MPVInstance, address: str) -> bool:
+        # Named pipes cannot be stat'ed cheaply, so Windows goes straight
+        # to the probe.
+        return sys.platform == "win32" or os.path.exists(address)
+
+    async def connect(self, instance: MPVInstance, address: str) -> Any:
+        # Raises NotImplementedError on Windows loops without named pipe
+        # support; the manager then falls back to a connection per command.
+        connection = MPVIPCConnection(address)
+        await connection.connect()
+        return connection
+
+
+def create_backend(name: str) -> MPVBackend:
+    if name == SubprocessBackend.name:
+        return SubprocessBackend()
+
+    if name == "libmpv":
+        try:
+            from services.mpv_libmpv import LibMPVBackend
+        except (ImportError, OSError) as e:
+            raise Exception(
+                f"mpv_backend is 'libmpv' but python-mpv/libmpv is unavailable: {e}"
+            )
+        return LibMPVBackend()
+
+    raise ValueError(f"Unknown mpv backend: {name}")
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import sys
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from services.codec import LineFramer, encode_line, encode_lines, loads
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+# track-list / demuxer-cache-state replies easily exceed asyncio's 64 KiB default
+STREAM_LIMIT = 4 * 1024 * 1024
+# Replies and event bursts are read a chunk at a time and framed in place
+READ_CHUNK_BYTES = 65536
+
+
+class MPVIPCConnection:
+    """Long-lived JSON IPC connection to a single mpv process.
+
+    A background reader task routes replies to per-request futures keyed by
+    ``request_id`` so concurrent callers can share the socket. Lines without
+    a ``request_id`` (events) are handed to the registered event listeners.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._write_lock = asyncio.Lock()
+        self.event_listeners: Set[Callable[[Dict[str, Any]], None]] = set()
+        self.close_listeners: Set[Callable[[], None]] = set()
+        self.requests_sent = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return (
+            self._writer is not None
+            and not self._writer.is_closing()
+            and self._reader_task is not None
+            and not self._reader_task.done()
+        )
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def connect(self):
+        self._reader, self._writer = await self._open_stream()
+        self._reader_task = asyncio.create_task(self._read_loop())
+        logger.debug(f"IPC connection established to {self.address}")
+
+    async def _open_stream(self):
+        if sys.platform == "win32":
+            loop = asyncio.get_running_loop()
+            if not hasattr(loop, "create_pipe_connection"):
+                # Selector loops cannot open named pipes, callers fall back
+                # to the per-command win32file path.
+                raise NotImplementedError(
+                    "Event loop does not support named pipe connections"
+                )
+            reader = asyncio.StreamReader(limit=STREAM_LIMIT, loop=loop)
+            protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
+            transport, _ = await loop.create_pipe_connection(  # type: ignore[attr-defined]
+                lambda: protocol, self.address
+            )
+            writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+            return reader, writer
+
+        return await asyncio.open_unix_connection(self.address, limit=STREAM_LIMIT)
+
+    async def request(self, payload: Dict[str, Any], timeout: float = 10.0) -> Dict:
+        """Send one command (``payload`` must carry a request_id) and wait for its reply"""
+        if not self.is_connected or self._writer is None:
+            raise ConnectionError(f"IPC connection to {self.address} is not open")
+
+        request_id = payload["request_id"]
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        try:
+            data = encode_line(payload)
+            async with self._write_lock:
+                self._writer.write(data)
+                await self._writer.drain()
+            self.requests_sent += 1
+
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout waiting for response to request_id {request_id}")
+            raise Exception("Timeout waiting for response from MPV")
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def request_many(
+        self, payloads: List[Dict[str, Any]], timeout: float = 10.0
+    ) -> List[Dict]:
+        """Write several commands in one write and collect their replies in order"""
+        if not self.is_connected or self._writer is None:
+            raise ConnectionError(f"IPC connection to {self.address} is not open")
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for payload in payloads:
+            future = loop.create_future()
+            self._pending[payload["request_id"]] = future
+            futures.append(future)
+
+        try:
+            data = encode_lines(payloads)
+            async with self._write_lock:
+                self._writer.write(data)
+                await self._writer.drain()
+            self.requests_sent += len(payloads)
+
+            return await asyncio.wait_for(asyncio.gather(*futures), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout waiting for {len(payloads)} pipelined responses")
+            raise Exception("Timeout waiting for response from MPV")
+        finally:
+            for payload in payloads:
+                self._pending.pop(payload["request_id"], None)
+
+    async def _read_loop(self):
+        assert self._reader is not None
+        framer = LineFramer(STREAM_LIMIT)
+        try:
+            while True:
+                chunk = await self._reader.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    logger.debug(f"IPC connection to {self.address} closed by mpv")
+                    break
+
+                for line in framer.feed(chunk):
+                    self._dispatch(line)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"IPC reader for {self.address} failed: {e}")
+        finally:
+            self._fail_pending(ConnectionError("IPC connection closed"))
+            for listener in list(self.close_listeners):
+                try:
+                    listener()
+                except Exception as e:
+                    logger.error(f"Error in IPC close listener: {e}")
+
+    def _dispatch(self, line: bytes):
+        try:
+            message = loads(line)
+        except ValueError as e:
+            logger.warning(f"Failed to decode JSON response: {line!r}, error: {e}")
+            return
+
+        request_id = message.get("request_id")
+        if request_id is not None and "event" not in message:
+            future = self._pending.get(request_id)
+            if future and not future.done():
+                future.set_result(message)
+            return
+
+        for listener in list(self.event_listeners):
+            try:
+                listener(message)
+            except Exception as e:
+                logger.error(f"Error in IPC event listener: {e}")
+
+    def _fail_pending(self, error: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def close(self):
+        if self._reader_task and not self._reader_task.done():
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
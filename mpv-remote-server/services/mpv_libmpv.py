@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import mpv
+
+from config import settings
+from models.model import MPVInstance
+from services.mpv_backend import MPVBackend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+# Command line options with no meaning for an embedded player
+CLI_ONLY_OPTIONS = {"player-operation-mode", "input-ipc-server"}
+
+# What --player-operation-mode=pseudo-gui turns on for the mpv binary
+PSEUDO_GUI_OPTIONS = {
+    "input-default-bindings": "yes",
+    "input-vo-keyboard": "yes",
+    "osc": "yes",
+}
+
+# libmpv names the handle made by mpv_create "main"; the IPC server names
+# each socket client instead
+CLIENT_NAME = "main"
+
+
+def parse_mpv_args(args: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """Split an mpv command line into libmpv options and files to load"""
+    options: Dict[str, str] = dict(PSEUDO_GUI_OPTIONS)
+    files: List[str] = []
+
+    for arg in args[1:]:
+        if not arg.startswith("--"):
+            files.append(arg)
+            continue
+
+        key, has_value, value = arg[2:].partition("=")
+        if key in CLI_ONLY_OPTIONS:
+            continue
+        options[key] = value if has_value else "yes"
+
+    options.update(settings.libmpv_options)
+    return options, files
+
+
+def _error_string(error: Exception) -> str:
+    # python-mpv raises (message, error code, ...); mpv's own error string
+    # is what the JSON IPC would have replied with
+    if len(error.args) > 1 and isinstance(error.args[1], int):
+        try:
+            return mpv.ErrorCode.human_readable(error.args[1])
+        except Exception:
+            pass
+    return str(error.args[0]) if error.args else str(error)
+
+
+class LibMPVProcess:
+    """Popen-like handle for a player running inside the server process"""
+
+    stdout = None
+    stderr = None
+
+    def __init__(self, player: "mpv.MPV"):
+        self.player = player
+        self.pid = os.getpid()
+        self.returncode: Optional[int] = None
+        self._destroy_lock = threading.Lock()
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None and self.player.core_shutdown:
+            self.returncode = 0
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if self.poll() is None:
+            self.player.wait_for_shutdown(timeout=timeout)
+        self._destroy()
+        self.returncode = 0
+        return self.returncode
+
+    def terminate(self):
+        if self.poll() is None:
+            try:
+                self.player.command("quit")
+            except Exception as e:
+                logger.debug(f"quit failed on libmpv player: {e}")
+
+    def kill(self):
+        self._destroy()
+        self.returncode = 0
+
+    def _destroy(self):
+        with self._destroy_lock:
+            if self.player.handle is not None:
+                self.player.terminate()
+
+
+class LibMPVConnection:
+    """In-process counterpart of MPVIPCConnection.
+
+    Takes the same JSON IPC style payloads and produces the same replies and
+    events, but calls libmpv directly: no socket, no JSON. Commands run on a
+    single worker thread so they execute in submission order, as mpv does
+    for one IPC client, and a busy core never blocks the event loop.
+    """
+
+    def __init__(self, player: "mpv.MPV", loop: asyncio.AbstractEventLoop):
+        self.player = player
+        self.address = "libmpv"
+        self._loop = loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="libmpv-command"
+        )
+        self._pending = 0
+        self._closed = False
+        # property name -> observe ids registered through this connection
+        self._observed: Dict[str, Set[int]] = {}
+        self.event_listeners: Set[Callable[[Dict[str, Any]], None]] = set()
+        self.close_listeners: Set[Callable[[], None]] = set()
+        self.requests_sent = 0
+        player.register_event_callback(self._on_event)
+
+    @property
+    def is_connected(self) -> bool:
+        return not self._closed and not self.player.core_shutdown
+
+    @property
+    def pending_count(self) -> int:
+        return self._pending
+
+    async def request(self, payload: Dict[str, Any], timeout: float = 10.0) -> Dict:
+        if not self.is_connected:
+            raise ConnectionError("libmpv player is not running")
+
+        self._pending += 1
+        try:
+            future = self._loop.run_in_executor(self._executor, self._execute, payload)
+            self.requests_sent += 1
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout waiting for libmpv command {payload.get('command')}")
+            raise Exception("Timeout waiting for response from MPV")
+        finally:
+            self._pending -= 1
+
+    async def request_many(
+        self, payloads: List[Dict[str, Any]], timeout: float = 10.0
+    ) -> List[Dict]:
+        if not self.is_connected:
+            raise ConnectionError("libmpv player is not running")
+
+        self._pending += len(payloads)
+        try:
+            future = self._loop.run_in_executor(
+                self._executor, lambda: [self._execute(p) for p in payloads]
+            )
+            self.requests_sent += len(payloads)
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout waiting for {len(payloads)} libmpv commands")
+            raise Exception("Timeout waiting for response from MPV")
+        finally:
+            self._pending -= len(payloads)
+
+    def _execute(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response: Dict[str, Any] = {
+            "error": "success",
+            "request_id": payload.get("request_id"),
+        }
+
+        command = payload.get("command")
+        if not isinstance(command, list) or not command:
+            response["error"] = "invalid parameter"
+            return response
+
+        name, args = command[0], command[1:]
+        try:
+            if name == "get_property":
+                data = self.player[args[0]]
+                if data is None:
+                    response["error"] = "property unavailable"
+                response["data"] = data
+            elif name == "set_property":
+                self.player[args[0]] = args[1]
+            elif name == "observe_property":
+                self._observe(int(args[0]), args[1])
+            elif name == "unobserve_property":
+                self._unobserve(int(args[0]))
+            elif name == "client_name":
+                response["data"] = CLIENT_NAME
+            else:
+                response["data"] = self.player.command(name, *args)
+        except Exception as e:
+            response["error"] = _error_string(e)
+
+        return response
+
+    def _observe(self, observe_id: int, name: str):
+        # Record the id first: the initial value can arrive before
+        # observe_property returns
+        ids = self._observed.get(name)
+        if ids is not None:
+            ids.add(observe_id)
+            return
+        self._observed[name] = {observe_id}
+        self.player.observe_property(name, self._on_property_change)
+
+    def _unobserve(self, observe_id: int):
+        for name, ids in list(self._observed.items()):
+            ids.discard(observe_id)
+            if not ids:
+                del self._observed[name]
+                self.player.unobserve_property(name, self._on_property_change)
+
+    def _on_property_change(self, name: str, value: Any):
+        # Runs on python-mpv's event thread
+        for observe_id in list(self._observed.get(name, ())):
+            self._emit(
+                {
+                    "event": "property-change",
+                    "id": observe_id,
+                    "name": name,
+                    "data": value,
+                }
+            )
+
+    def _on_event(self, event: Any):
+        # Runs on python-mpv's event thread. Property changes arrive through
+        # _on_property_change with their observe ids instead.
+        event_id = event.event_id.value
+        if event_id == mpv.MpvEventID.PROPERTY_CHANGE:
+            return
+
+        try:
+            message = event.as_dict(decoder=mpv.lazy_decoder)
+        except Exception as e:
+            logger.warning(f"Failed to convert libmpv event {event_id}: {e}")
+            return
+        self._emit(message)
+
+        if event_id == mpv.MpvEventID.SHUTDOWN:
+            self._call_soon(self._on_shutdown)
+
+    def _emit(self, message: Dict[str, Any]):
+        if not self._closed:
+            self._call_soon(self._dispatch, message)
+
+    def _call_soon(self, callback: Callable, *args: Any):
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The event loop is gone, nobody is listening any more
+            pass
+
+    def _dispatch(self, message: Dict[str, Any]):
+        for listener in list(self.event_listeners):
+            try:
+                listener(message)
+            except Exception as e:
+                logger.error(f"Error in libmpv event listener: {e}")
+
+    def _on_shutdown(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._notify_closed()
+
+    def _notify_closed(self):
+        for listener in list(self.close_listeners):
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Error in libmpv close listener: {e}")
+
+    async def close(self):
+        was_open = not self._closed
+        self._closed = True
+
+        try:
+            self.player.unregister_event_callback(self._on_event)
+        except ValueError:
+            pass
+        if not self.player.core_shutdown:
+            for name in list(self._observed):
+                try:
+                    self.player.unobserve_property(name, self._on_property_change)
+                except Exception:
+                    pass
+        self._observed.clear()
+        self._executor.shutdown(wait=False)
+
+        if was_open:
+            self._notify_closed()
+
+
+class LibMPVBackend(MPVBackend):
+    """mpv embedded through python-mpv: commands and property observers are
+    direct libmpv calls instead of JSON over a socket"""
+
+    name = "libmpv"
+
+    async def spawn(self, instance: MPVInstance, args: list[str]) -> Any:
+        options, files = parse_mpv_args(args)
+        logger.debug(f"Creating libmpv player for {instance.id} with {options}")
+
+        def create_player() -> "mpv.MPV":
+            player = mpv.MPV(**options)
+            for media_file in files:
+                player.command("loadfile", media_file)
+            return player
+
+        return LibMPVProcess(await asyncio.to_thread(create_player))
+
+    async def connect(self, instance: MPVInstance, address: str) -> Any:
+        process = instance.process
+        if not isinstance(process, LibMPVProcess):
+            raise ConnectionError(f"Instance {instance.id} has no libmpv player")
+        if process.poll() is not None:
+            raise ConnectionError("libmpv player has shut down")
+        return LibMPVConnection(process.player, asyncio.get_running_loop())
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+# Most severe first; filtering by a level keeps that level and everything
+# above it
+LOG_LEVELS = ("error", "warn", "info")
+
+# mpv does not print the level of a message to the terminal. Warnings and
+# errors go to stderr, so stderr lines start out as warnings and get
+# promoted to errors when they read like one.
+ERROR_PATTERN = re.compile(rb"\b(error|failed|cannot|could not)\b", re.IGNORECASE)
+
+# Longer lines are cut, so a runaway line cannot grow a buffer either
+MAX_LINE_BYTES = 2048
+READ_CHUNK_BYTES = 65536
+
+# (seq, unix time, stream, level, text)
+LogLine = Tuple[int, float, str, str, str]
+
+
+def classify_line(stream: str, line: bytes) -> str:
+    if ERROR_PATTERN.search(line):
+        return "error"
+    return "warn" if stream == "stderr" else "info"
+
+
+class LogRing:
+    """The most recent lines one instance wrote, oldest dropped first"""
+
+    def __init__(self, max_lines: int):
+        self.lines: Deque[LogLine] = deque(maxlen=max_lines)
+        self.seq = 0
+        self.dropped = 0
+        self.bytes_read = 0
+
+    def append(self, stream: str, line: bytes):
+        line = line.strip()
+        if not line:
+            return
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.seq += 1
+        self.lines.append(
+            (
+                self.seq,
+                time.time(),
+                stream,
+                classify_line(stream, line),
+                line[:MAX_LINE_BYTES].decode("utf-8", errors="replace"),
+            )
+        )
+
+    def query(self, level: str, limit: int, since: int) -> List[LogLine]:
+        allowed = LOG_LEVELS[: LOG_LEVELS.index(level) + 1]
+        matches = [
+            entry for entry in self.lines if entry[0] > since and entry[3] in allowed
+        ]
+        return matches[-limit:] if limit > 0 else matches
+
+
+class MPVLogCollector:
+    """Drains the stdout and stderr pipes of every mpv process.
+
+    Nothing else reads those pipes, so without a drain a chatty mpv fills
+    the pipe buffer and blocks on its next write, freezing playback. Each
+    pipe is made non-blocking and registered with the event loop, which
+    reads whatever is there whenever it becomes readable; platforms whose
+    loop cannot watch pipes (Windows) get one reader thread per pipe.
+
+    Lines go into a fixed size ring per instance, so memory stays bounded
+    however long the session runs. The ring survives restarts of the
+    instance's process and is dropped with the instance.
+    """
+
+    def __init__(self, max_lines: int):
+        self.max_lines = max_lines
+        self.buffers: Dict[str, LogRing] = {}
+        # instance id -> stops each drain of its current process
+        self._drains: Dict[str, List[Callable[[], None]]] = {}
+
+    def attach(self, instance_id: str, process: Any):
+        """Start draining a freshly spawned process of the instance"""
+        self.detach(instance_id)
+        ring = self.buffers.get(instance_id)
+        if ring is None:
+            ring = self.buffers[instance_id] = LogRing(self.max_lines)
+
+        for stream in ("stdout", "stderr"):
+            pipe = getattr(process, stream, None)
+            if pipe is None:
+                continue
+            stop = self._drain_nonblocking(instance_id, ring, stream, pipe)
+            if stop is None:
+                stop = self._drain_thread(ring, stream, pipe)
+            self._drains.setdefault(instance_id, []).append(stop)
+
+    def _drain_nonblocking(
+        self, instance_id: str, ring: LogRing, stream: str, pipe: Any
+    ) -> Optional[Callable[[], None]]:
+        loop = asyncio.get_running_loop()
+        try:
+            fd = pipe.fileno()
+            os.set_blocking(fd, False)
+        except (AttributeError, OSError, ValueError):
+            return None
+
+        partial = bytearray()
+        stopped = False
+
+        def stop():
+            nonlocal stopped
+            if stopped:
+                return
+            stopped = True
+            loop.remove_reader(fd)
+            if partial:
+                ring.append(stream, bytes(partial))
+                partial.clear()
+            pipe.close()
+
+        def on_readable():
+            try:
+                chunk = os.read(fd, READ_CHUNK_BYTES)
+            except BlockingIOError:
+                return
+            except OSError:
+                chunk = b""
+
+            if not chunk:
+                # mpv closed its end, it has exited
+                drains = self._drains.get(instance_id)
+                if drains and stop in drains:
+                    drains.remove(stop)
+                stop()
+                return
+
+            ring.bytes_read += len(chunk)
+            partial.extend(chunk)
+            # \r ends the lines mpv rewrites in place, such as the status line
+            *lines, rest = re.split(rb"[\r\n]", bytes(partial))
+            for line in lines:
+                ring.append(stream, line)
+            partial[:] = rest
+            if len(partial) > MAX_LINE_BYTES:
+                ring.append(stream, bytes(partial))
+                partial.clear()
+
+        try:
+            loop.add_reader(fd, on_readable)
+        except (NotImplementedError, OSError):
+            os.set_blocking(fd, True)
+            return None
+        return stop
+
+    def _drain_thread(
+        self, ring: LogRing, stream: str, pipe: Any
+    ) -> Callable[[], None]:
+        loop = asyncio.get_running_loop()
+
+        def drain():
+            try:
+                for line in iter(lambda: pipe.readline(MAX_LINE_BYTES), b""):
+                    ring.bytes_read += len(line)
+                    loop.call_soon_threadsafe(ring.append, stream, line)
+            except (OSError, ValueError, RuntimeError):
+                # Pipe closed under us, or the loop is gone
+                pass
+
+        threading.Thread(target=drain, daemon=True).start()
+        # The thread ends on its own once mpv exits and the pipe hits EOF
+        return lambda: None
+
+    def detach(self, instance_id: str):
+        for stop in self._drains.pop(instance_id, []):
+            try:
+                stop()
+            except Exception as e:
+                logger.debug(f"Error stopping log drain for {instance_id}: {e}")
+
+    def forget(self, instance_id: str):
+        self.detach(instance_id)
+        self.buffers.pop(instance_id, None)
+
+    def get_logs(
+        self, instance_id: str, level: str = "info", limit: int = 200, since: int = 0
+    ) -> Optional[Dict[str, Any]]:
+        ring = self.buffers.get(instance_id)
+        if ring is None:
+            return None
+        return {
+            "instanceId": instance_id,
+            "level": level,
+            "lastSeq": ring.seq,
+            "dropped": ring.dropped,
+            "bytesRead": ring.bytes_read,
+            "draining": bool(self._drains.get(instance_id)),
+            "lines": [
+                {
+                    "seq": seq,
+                    "time": timestamp,
+                    "stream": stream,
+                    "level": line_level,
+                    "text": text,
+                }
+                for seq, timestamp, stream, line_level, text in ring.query(
+                    level, limit, since
+                )
+            ],
+        }
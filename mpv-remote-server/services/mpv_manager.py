@@ -1,23 +1,43 @@
 import asyncio
+from dataclasses import asdict
 from datetime import datetime
-import json
 import logging
+import os
 import subprocess
 import uuid
 import sys
-from typing import Optional
+from typing import Any, Callable, Optional
 
 if sys.platform == "win32":
     import win32file
     import pywintypes
 
+from config import settings
+from services.codec import (
+    LineFramer,
+    MPVReply,
+    command_payload,
+    encode_line,
+    loads,
+    to_response,
+)
+from services.mpv_backend import create_backend
+from services.mpv_ipc import STREAM_LIMIT, MPVIPCConnection
+from services.mpv_logs import MPVLogCollector
+from services.mpv_pool import MPVWarmPool
+from services.playlist_queue import PlaylistQueue
+from services.mpv_registry import AdoptedProcess, MPVRegistry, list_socket_paths
+from services.mpv_scheduler import CommandScheduler
+from services.mpv_supervisor import MPVSupervisor
+from services.resources import ResourceMonitor
+from services.telemetry import TelemetryCollector
 from models.model import (
     MPVInstance,
     MPVCommand,
-    MPVResponse,
     RemoteCommand,
     RemoteCommandAction,
     MPVStatus,
+    CommandPriority,
 )
 
 logger = logging.getLogger(__name__)
@@ -32,137 +52,684 @@ if not logger.handlers:
     logger.propagate = False
 
 
+# Properties kept current in each instance's state snapshot via observe_property.
+# path, aid and sid let the supervisor resume a crashed player where it was.
+OBSERVED_PROPERTIES = [
+    "time-pos",
+    "duration",
+    "pause",
+    "volume",
+    "title",
+    "track-list",
+    "path",
+    "aid",
+    "sid",
+    "playlist-pos",
+    "playlist-count",
+]
+
+# Properties the polling fallback reads when events are unavailable
+POLLED_PROPERTIES = ["time-pos", "duration", "pause", "volume", "title"]
+
+# Instances that count against the instance cap
+ACTIVE_STATUSES = (MPVStatus.STARTING, MPVStatus.RUNNING)
+
+
+class AdmissionError(Exception):
+    """A new instance was refused: the instance cap is reached or the box is saturated"""
+
+
 class MPVManager:
     def __init__(self):
         self.instances: dict[str, MPVInstance] = {}
         self.request_count = 0
         self._creation_lock = asyncio.Lock()
+        self._connection_locks: dict[str, asyncio.Lock] = {}
+        self.player_states: dict[str, dict[str, Any]] = {}
+        self.state_listeners: dict[str, set[Callable]] = {}
+        self.global_state_listeners: set[Callable] = set()
+        self.schedulers: dict[str, CommandScheduler] = {}
+        # Per-process facts (client name, mpv version, pid) read once at readiness
+        self.instance_metadata: dict[str, dict[str, Any]] = {}
+        self.backend = create_backend(settings.mpv_backend)
+        self.pool = MPVWarmPool(self, settings.mpv_pool_size)
+        self.supervisor = MPVSupervisor(self)
+        self.registry = MPVRegistry(settings.mpv_registry_file)
+        self.logs = MPVLogCollector(settings.mpv_log_buffer_lines)
+        self.telemetry = TelemetryCollector(self)
+        self.queue = PlaylistQueue(self)
+        self.resources = ResourceMonitor()
+        self.resource_usage: dict[str, dict[str, Any]] = {}
+        self.system_usage: dict[str, Any] = {}
+        self._resource_task: Optional[asyncio.Task] = None
         logger.info("MPVManager initialized")
 
+    async def start(self):
+        await self.adopt_instances()
+        await self.pool.start()
+        self._resource_task = asyncio.create_task(self._resource_loop())
+        self.telemetry.start()
+
+    async def shutdown(self):
+        if self._resource_task and not self._resource_task.done():
+            self._resource_task.cancel()
+        await self.telemetry.shutdown()
+        await self.supervisor.shutdown()
+        await self.pool.shutdown()
+
     async def create_instance(
         self,
         media_file: Optional[str] = None,
         stream_audio: bool = False,
     ) -> str:
         async with self._creation_lock:
-            # Double-check for running instances inside the lock
-            running_instances = [
-                inst
-                for inst in self.instances.values()
-                if inst.status == MPVStatus.RUNNING
-            ]
+            self._check_admission()
 
-            if running_instances:
-                logger.warning(
-                    f"Instance creation blocked - found {len(running_instances)} running instances"
-                )
-                raise Exception(
-                    "Cannot create instance - another instance is already running"
+            instance = await self._claim_pooled_instance(media_file, stream_audio)
+            if instance is None:
+                instance = await self._start_new_instance(media_file, stream_audio)
+            instance_id = instance.id
+            instance.stream_audio = stream_audio
+
+            if stream_audio and media_file:
+                from services.hls_stream import hls_stream_service
+
+                asyncio.create_task(
+                    hls_stream_service.start_stream(instance_id, media_file)
                 )
 
-            instance_id = str(uuid.uuid4())
-            pipe_name = f"mpvsocket_{instance_id}"
+            self.supervisor.watch(instance)
+            self._record_instance(instance)
+            self.pool.refill()
 
-            if sys.platform == "win32":
-                pipe_address = f"\\\\.\\pipe\\{pipe_name}"
-            else:
-                pipe_address = f"/tmp/{pipe_name}"
-
-            logger.info(f"Creating MPV instance {instance_id} with pipe {pipe_name}")
-            if media_file:
-                logger.info(f"Loading media file: {media_file}")
-
-            instance = MPVInstance(
-                id=instance_id,
-                pipeName=pipe_name,
-                status=MPVStatus.STARTING,
-                lastSeen=datetime.now(),
-                process=None,
-                clientName=None,
+            return instance_id
+
+    def _check_admission(self):
+        active = [i for i in self.instances.values() if i.status in ACTIVE_STATUSES]
+        if len(active) >= settings.mpv_max_instances:
+            logger.warning(
+                f"Instance creation blocked - {len(active)} of "
+                f"{settings.mpv_max_instances} instances active"
+            )
+            raise AdmissionError(
+                f"Instance limit reached ({settings.mpv_max_instances} active)"
             )
 
-            self.instances[instance_id] = instance
+        system = self.system_usage or self.resources.system_usage()
+        cpu_percent = system.get("cpuPercent")
+        if (
+            cpu_percent is not None
+            and cpu_percent >= settings.admission_max_cpu_percent
+        ):
+            logger.warning(f"Instance creation blocked - CPU {cpu_percent}% busy")
+            raise AdmissionError(f"System is saturated (CPU {cpu_percent}% busy)")
+
+        available = system.get("memAvailableBytes")
+        if (
+            available is not None
+            and available < settings.admission_min_memory_mb * 1024 * 1024
+        ):
+            logger.warning(
+                f"Instance creation blocked - {available // (1024 * 1024)} MiB available"
+            )
+            raise AdmissionError(
+                f"System is saturated ({available // (1024 * 1024)} MiB memory available)"
+            )
 
+    async def _resource_loop(self):
+        while True:
             try:
-                args = [
-                    "mpv",
-                    "--player-operation-mode=pseudo-gui",
-                    "--idle=yes",
-                    "--force-window=yes",
-                    "--sub-auto=fuzzy",
-                    "--slang=en,eng",
-                    f"--input-ipc-server={pipe_address}",
-                ]
+                self._sample_resources()
+            except Exception as e:
+                logger.error(f"Error sampling resource usage: {e}")
+            await asyncio.sleep(settings.resource_sample_interval)
+
+    def _sample_resources(self):
+        self.system_usage = self.resources.system_usage()
+        self.resource_usage = {
+            instance_id: self._instance_usage(instance)
+            for instance_id, instance in list(self.instances.items())
+            if instance.status in ACTIVE_STATUSES
+        }
+        # HLS encoders come and go with every file; forget the ones that did
+        from services.hls_stream import hls_stream_service
 
-                if stream_audio:
-                    args.append("--ao=null")
+        pids = {
+            instance.process.pid
+            for instance in self.instances.values()
+            if instance.process is not None
+        }
+        pids.update(
+            stream["process"].pid
+            for stream in hls_stream_service.active_streams.values()
+            if stream["process"] is not None
+        )
+        self.resources.retain(pids)
 
-                if media_file:
-                    args.append(media_file)
+    def _instance_usage(self, instance: MPVInstance) -> dict[str, Any]:
+        """CPU and RSS of the player and its HLS encoder, plus IPC activity"""
+        from services.hls_stream import hls_stream_service
 
-                logger.debug(f"Starting MPV with args: {args}")
-                process = subprocess.Popen(
-                    args,
-                    stdin=subprocess.DEVNULL,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                )
+        player = None
+        process = instance.process
+        # An embedded libmpv player has no process of its own
+        if process is not None and process.pid != os.getpid():
+            player = self.resources.process_usage(process.pid)
 
-                instance.process = process
-                logger.debug(f"MPV process started with PID: {process.pid}")
+        encoder = None
+        stream = hls_stream_service.active_streams.get(instance.id)
+        # VOD streams run short per-segment jobs instead of one encoder
+        if stream is not None and stream["process"] is not None:
+            encoder = self.resources.process_usage(stream["process"].pid)
 
-                await asyncio.sleep(2.0)
+        connection = instance.connection
+        processes = [p for p in (player, encoder) if p is not None]
+        cpu = [p["cpuPercent"] for p in processes if p["cpuPercent"] is not None]
+        rss = [p["rssBytes"] for p in processes if p["rssBytes"] is not None]
 
-                try:
-                    logger.debug(f"Testing IPC connection for instance {instance_id}")
-                    await self.send_command(
-                        instance_id,
-                        MPVCommand(
-                            command=["get_property", "mpv-version"], **{"async": None}
-                        ),
-                        allow_starting=True,
-                    )
-                    instance.status = MPVStatus.RUNNING
-                    logger.info(f"MPV instance {instance_id} is now running")
-                except Exception as e:
-                    instance.status = MPVStatus.ERROR
-                    logger.error(
-                        f"IPC connection failed for instance {instance_id}: {e}"
-                    )
-                    raise Exception("MPV Started but IPC failed")
+        return {
+            "cpuPercent": round(sum(cpu), 1) if cpu else None,
+            "rssBytes": sum(rss) if rss else None,
+            "mpv": player,
+            "hlsEncoder": encoder,
+            "ipc": {
+                "connected": connection is not None and connection.is_connected,
+                "pendingRequests": connection.pending_count if connection else 0,
+                "requestsSent": connection.requests_sent if connection else 0,
+            },
+        }
 
-                if stream_audio and media_file:
-                    from services.hls_stream import hls_stream_service
+    def get_resource_usage(self, instance_id: str) -> Optional[dict[str, Any]]:
+        usage = self.resource_usage.get(instance_id)
+        if usage is None:
+            instance = self.instances.get(instance_id)
+            if instance is None or instance.status not in ACTIVE_STATUSES:
+                return None
+            usage = self.resource_usage[instance_id] = self._instance_usage(instance)
+        return usage
 
-                    asyncio.create_task(
-                        hls_stream_service.start_stream(instance_id, media_file)
-                    )
+    def get_admission_stats(self) -> dict[str, Any]:
+        return {
+            "maxInstances": settings.mpv_max_instances,
+            "activeInstances": sum(
+                1 for i in self.instances.values() if i.status in ACTIVE_STATUSES
+            ),
+            "maxCpuPercent": settings.admission_max_cpu_percent,
+            "minMemoryMb": settings.admission_min_memory_mb,
+            "system": self.system_usage,
+        }
+
+    def _new_instance(self) -> MPVInstance:
+        instance_id = str(uuid.uuid4())
+        return MPVInstance(
+            id=instance_id,
+            pipeName=f"mpvsocket_{instance_id}",
+            status=MPVStatus.STARTING,
+            lastSeen=datetime.now(),
+            process=None,
+            clientName=None,
+        )
+
+    def _build_mpv_args(
+        self,
+        pipe_address: str,
+        media_file: Optional[str] = None,
+        stream_audio: bool = False,
+        pooled: bool = False,
+        extra_args: Optional[list[str]] = None,
+    ) -> list[str]:
+        args = [
+            "mpv",
+            "--player-operation-mode=pseudo-gui",
+            "--idle=yes",
+            # Pooled players stay hidden until they are claimed
+            "--force-window=no" if pooled else "--force-window=yes",
+            "--sub-auto=fuzzy",
+            "--slang=en,eng",
+            f"--input-ipc-server={pipe_address}",
+            f"--msg-level=all={settings.mpv_log_level}",
+        ]
+
+        if stream_audio:
+            args.append("--ao=null")
+
+        if settings.mpv_prefetch_playlist:
+            # Open the next playlist entry while the current one is playing
+            args.append("--prefetch-playlist=yes")
+
+        if extra_args:
+            args.extend(extra_args)
 
-                asyncio.create_task(self._monitor_process(instance_id, process))
-                asyncio.create_task(self._clean_dead_instances())
+        if media_file:
+            args.append(media_file)
 
-                return instance_id
+        return args
 
+    async def _launch(self, instance: MPVInstance, args: list[str]):
+        """Spawn mpv for an instance and wait until its IPC server answers"""
+        logger.debug(f"Starting MPV ({self.backend.name}) with args: {args}")
+        spawned_at = asyncio.get_running_loop().time()
+        process = await self.backend.spawn(instance, args)
+
+        instance.process = process
+        self.logs.attach(instance.id, process)
+        logger.debug(f"MPV process started with PID: {process.pid}")
+
+        logger.debug(f"Testing IPC connection for instance {instance.id}")
+        await self._wait_until_ready(instance, process)
+        instance.startup_ms = round(
+            (asyncio.get_running_loop().time() - spawned_at) * 1000, 1
+        )
+        await self._load_metadata(instance)
+
+    async def _start_new_instance(
+        self, media_file: Optional[str], stream_audio: bool
+    ) -> MPVInstance:
+        instance = self._new_instance()
+        instance_id = instance.id
+
+        logger.info(
+            f"Creating MPV instance {instance_id} with pipe {instance.pipe_name}"
+        )
+        if media_file:
+            logger.info(f"Loading media file: {media_file}")
+
+        self.instances[instance_id] = instance
+
+        try:
+            args = self._build_mpv_args(
+                self._get_pipe_address(instance.pipe_name), media_file, stream_audio
+            )
+
+            try:
+                await self._launch(instance, args)
+                instance.status = MPVStatus.RUNNING
+                logger.info(
+                    f"MPV instance {instance_id} is now running "
+                    f"(ready in {instance.startup_ms} ms)"
+                )
+                await self.start_observing(instance_id)
             except Exception as e:
                 instance.status = MPVStatus.ERROR
-                logger.error(f"Failed to create MPV instance {instance_id}: {e}")
-                raise e
-
-    async def _monitor_process(self, instance_id: str, process: subprocess.Popen):
-        logger.debug(f"Starting process monitor for instance {instance_id}")
-        await asyncio.create_subprocess_exec(
-            *[],
-            stdout=process.stdout,
-            stderr=process.stderr,
+                logger.error(f"IPC connection failed for instance {instance_id}: {e}")
+                raise Exception("MPV Started but IPC failed")
+
+            return instance
+
+        except Exception as e:
+            # Don't leave a half-started player running behind an ERROR entry
+            await self.dispose_instance(instance)
+            instance.status = MPVStatus.ERROR
+            self.supervisor.reap_later(instance_id)
+            logger.error(f"Failed to create MPV instance {instance_id}: {e}")
+            raise e
+
+    async def relaunch_instance(self, instance: MPVInstance, state: dict[str, Any]):
+        """Start a fresh mpv for an instance whose player died, resuming the
+        file, position, pause state, volume and tracks from its last state"""
+        extra_args = []
+        if state.get("time-pos"):
+            extra_args.append(f"--start={state['time-pos']}")
+        if state.get("pause"):
+            extra_args.append("--pause=yes")
+        if state.get("volume") is not None:
+            extra_args.append(f"--volume={state['volume']}")
+        for track in ("aid", "sid"):
+            if state.get(track) is not None:
+                value = "no" if state[track] is False else state[track]
+                extra_args.append(f"--{track}={value}")
+
+        args = self._build_mpv_args(
+            self._get_pipe_address(instance.pipe_name),
+            state.get("path"),
+            instance.stream_audio,
+            extra_args=extra_args,
         )
-        exit_code = await asyncio.to_thread(process.wait)
+
+        instance.last_seen = datetime.now()
+        await self._launch(instance, args)
+        instance.status = MPVStatus.RUNNING
+        await self.start_observing(instance.id)
+        self._record_instance(instance)
+
+    async def create_pooled_instance(self) -> MPVInstance:
+        """Start an idle, hidden mpv for the warm pool. It is not registered
+        in self.instances until claimed."""
+        instance = self._new_instance()
+        logger.info(f"Starting pooled MPV instance {instance.id}")
+
+        try:
+            await self._launch(
+                instance,
+                self._build_mpv_args(
+                    self._get_pipe_address(instance.pipe_name), pooled=True
+                ),
+            )
+        except BaseException:
+            # Also on cancellation, so a pool shutdown never leaks a process
+            await self.dispose_instance(instance)
+            raise
+
+        instance.status = MPVStatus.RUNNING
+        self._record_instance(instance, pooled=True)
+        return instance
+
+    async def _claim_pooled_instance(
+        self, media_file: Optional[str], stream_audio: bool
+    ) -> Optional[MPVInstance]:
+        instance = await self.pool.claim()
+        if instance is None:
+            return None
+
+        logger.info(f"Claimed pooled MPV instance {instance.id}")
+        instance.last_seen = datetime.now()
+        self.instances[instance.id] = instance
+
+        cmds = [MPVCommand(command=["set_property", "force-window", "yes"], **{})]
+        if stream_audio:
+            # ao can only change at runtime through an explicit reload
+            cmds.append(MPVCommand(command=["set_property", "ao", "null"], **{}))
+            cmds.append(MPVCommand(command=["ao-reload"], **{}))
+        if media_file:
+            cmds.append(MPVCommand(command=["loadfile", media_file], **{}))
+
+        try:
+            responses = await self.send_commands(instance.id, cmds)
+            for cmd, response in zip(cmds, responses):
+                if response.error != "success":
+                    raise Exception(f"{cmd.command} failed: {response.error}")
+            await self.start_observing(instance.id)
+        except Exception as e:
+            logger.warning(f"Pooled instance {instance.id} unusable, discarding: {e}")
+            del self.instances[instance.id]
+            await self.dispose_instance(instance)
+            return None
+
+        return instance
+
+    async def probe_instance(self, instance: MPVInstance, timeout: float = 10.0):
+        """Round trip mpv-version without requiring the instance to be registered"""
+        await self._request_direct(
+            instance, ["get_property", "mpv-version"], timeout=timeout
+        )
+
+    async def _request_direct(
+        self, instance: MPVInstance, command: list, timeout: float = 10.0
+    ) -> dict[str, Any]:
+        """One command outside the scheduler, for instances not (yet) in self.instances"""
+        payload = {"command": command, "request_id": self._next_request_id()}
+
+        connection = await self._get_connection(instance)
+        if connection is None:
+            response = await asyncio.wait_for(
+                self._send_command_windows(
+                    self._get_pipe_address(instance.pipe_name),
+                    encode_line(payload),
+                    payload["request_id"],
+                ),
+                timeout=timeout,
+            )
+            return asdict(response)
+
+        return await connection.request(payload, timeout=timeout)
+
+    def _record_instance(self, instance: MPVInstance, pooled: bool = False):
+        if self.backend.outlives_server:
+            self.registry.record(
+                instance, self._get_pipe_address(instance.pipe_name), pooled
+            )
+
+    async def adopt_instances(self):
+        """Take back the players a previous server process left running.
+
+        Every registered socket is probed concurrently with a short timeout.
+        Players that answer are re-attached under their old ids (pooled ones
+        go back to the warm pool), with a new HLS encoder for those streaming
+        audio; the rest are dropped from the registry and their dead sockets
+        removed.
+        """
+        if not self.backend.outlives_server:
+            return
+
+        records = self.registry.load()
+        started = asyncio.get_running_loop().time()
+        results = await asyncio.gather(
+            *[
+                self._adopt_instance(instance_id, record)
+                for instance_id, record in records.items()
+            ],
+            return_exceptions=True,
+        )
+
+        adopted = [r for r in results if isinstance(r, MPVInstance)]
+        for instance_id, result in zip(records, results):
+            if not isinstance(result, MPVInstance):
+                logger.info(f"Dropping unreachable instance {instance_id}: {result}")
+                self.registry.remove(instance_id)
+                self.registry.dropped += 1
+
+        await self._collect_stale_sockets(
+            {self._get_pipe_address(i.pipe_name) for i in adopted}
+        )
+
+        if records:
+            logger.info(
+                f"Adopted {len(adopted)} of {len(records)} registered instances in "
+                f"{(asyncio.get_running_loop().time() - started) * 1000:.1f} ms"
+            )
+
+    async def _adopt_instance(
+        self, instance_id: str, record: dict[str, Any]
+    ) -> MPVInstance:
+        instance = MPVInstance(
+            id=instance_id,
+            pipeName=record["pipeName"],
+            status=MPVStatus.STARTING,
+            lastSeen=datetime.now(),
+            streamAudio=record.get("streamAudio", False),
+        )
+        pooled = record.get("pooled", False)
+        started = asyncio.get_running_loop().time()
+
+        try:
+            # The pid comes from mpv itself, so a reused pid can never be adopted
+            response = await self._request_direct(
+                instance, ["get_property", "pid"], timeout=settings.mpv_adopt_timeout
+            )
+            if response.get("error") != "success":
+                raise Exception(f"pid query failed: {response.get('error')}")
+        except BaseException:
+            await self._close_connection(instance)
+            raise
+
+        instance.process = AdoptedProcess(int(response["data"]))
+        # Its output went to the previous server, so the ring starts empty
+        self.logs.attach(instance.id, instance.process)
+        instance.startup_ms = round(
+            (asyncio.get_running_loop().time() - started) * 1000, 1
+        )
+        await self._load_metadata(instance)
+        instance.status = MPVStatus.RUNNING
+
+        if pooled:
+            if not self.pool.adopt(instance):
+                await self.dispose_instance(instance)
+                raise Exception("warm pool is full")
+        else:
+            self.instances[instance_id] = instance
+            await self.start_observing(instance_id)
+            self.supervisor.watch(instance)
+            if instance.stream_audio:
+                await self._resume_hls_stream(instance)
+
+        self.registry.adopted += 1
+        self._record_instance(instance, pooled)
         logger.info(
-            f"MPV process for instance {instance_id} exited with code {exit_code}"
+            f"Adopted {'pooled ' if pooled else ''}instance {instance_id} "
+            f"(pid {instance.process.pid}) in {instance.startup_ms} ms"
+        )
+        return instance
+
+    async def _resume_hls_stream(self, instance: MPVInstance):
+        """Start a new encoder for an adopted player; the previous server
+        stopped its own at shutdown. It starts at the beginning of the file;
+        with hls_seek_restart it moves to mpv's position as after a seek."""
+        response = await self._request_direct(instance, ["get_property", "path"])
+        media_file = response.get("data")
+        if response.get("error") != "success" or not media_file:
+            return
+
+        from services.hls_stream import hls_stream_service
+
+        asyncio.create_task(hls_stream_service.start_stream(instance.id, media_file))
+
+    async def _collect_stale_sockets(self, live_addresses: set[str]):
+        """Remove IPC sockets whose mpv is gone. Sockets that still accept
+        connections are left alone, whoever they belong to."""
+        for path in list_socket_paths():
+            if path in live_addresses:
+                continue
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_unix_connection(path), timeout=0.2
+                )
+                writer.close()
+                logger.warning(f"Leaving unregistered live mpv socket {path} alone")
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(path)
+                    self.registry.sockets_removed += 1
+                    logger.info(f"Removed stale mpv socket {path}")
+                except OSError as e:
+                    logger.warning(f"Failed to remove stale socket {path}: {e}")
+            except Exception as e:
+                logger.debug(f"Could not check socket {path}: {e}")
+
+    async def _load_metadata(self, instance: MPVInstance):
+        """Read the facts that never change for the life of the process, so
+        listing and lookups never need a round trip to mpv."""
+        cmds = [
+            {"command": ["client_name"], "request_id": self._next_request_id()},
+            {
+                "command": ["get_property", "mpv-version"],
+                "request_id": self._next_request_id(),
+            },
+        ]
+
+        try:
+            connection = await self._get_connection(instance)
+            if connection is None:
+                responses = [
+                    asdict(
+                        await self._send_command_windows(
+                            self._get_pipe_address(instance.pipe_name),
+                            encode_line(cmd),
+                            cmd["request_id"],
+                        )
+                    )
+                    for cmd in cmds
+                ]
+            else:
+                responses = await connection.request_many(cmds, timeout=5.0)
+        except Exception as e:
+            logger.warning(f"Failed to read metadata for instance {instance.id}: {e}")
+            return
+
+        client_name, mpv_version = [res.get("data") for res in responses]
+        self.instance_metadata[instance.id] = {
+            "clientName": client_name or "",
+            "mpvVersion": mpv_version,
+            "pid": instance.process.pid if instance.process else None,
+        }
+        instance.client_name = client_name or ""
+        logger.debug(
+            f"Cached metadata for instance {instance.id}: "
+            f"{self.instance_metadata[instance.id]}"
         )
 
-        if instance_id in self.instances:
-            self.instances[instance_id].status = MPVStatus.STOPPED
-            logger.info(f"Instance {instance_id} status set to STOPPED")
+    def _invalidate_metadata(self, instance: MPVInstance):
+        self.instance_metadata.pop(instance.id, None)
+        instance.client_name = None
+
+    def get_instance_metadata(self, instance_id: str) -> Optional[dict[str, Any]]:
+        metadata = self.instance_metadata.get(instance_id)
+        return dict(metadata) if metadata is not None else None
+
+    async def release_instance(self, instance: MPVInstance):
+        """Drop everything tied to the instance's current process"""
+        await self._close_connection(instance)
+        self._invalidate_metadata(instance)
+        self.resource_usage.pop(instance.id, None)
+        if instance.process is not None:
+            self.resources.forget(instance.process.pid)
+
+    async def remove_instance(self, instance: MPVInstance):
+        await self.release_instance(instance)
+        self.registry.remove(instance.id)
+        self.logs.forget(instance.id)
+        self.telemetry.forget(instance.id)
+        self.queue.forget(instance.id)
+        if self.instances.get(instance.id) is instance:
+            del self.instances[instance.id]
+        self.state_listeners.pop(instance.id, None)
+
+    async def stop_hls_stream(self, instance_id: str):
+        from services.hls_stream import hls_stream_service
+
+        await hls_stream_service.stop_stream(instance_id)
+        await hls_stream_service.discard_prepared_stream(instance_id)
+
+    async def dispose_instance(self, instance: MPVInstance):
+        """Terminate an instance's process and release its connection"""
+        await self.release_instance(instance)
+        self.registry.remove(instance.id)
+        process = instance.process
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(asyncio.to_thread(process.wait), timeout=5)
+            except asyncio.TimeoutError:
+                process.kill()
+        instance.status = MPVStatus.STOPPED
+        if self.instances.get(instance.id) is not instance:
+            # Never registered (warm pool), nobody will ask for its logs
+            self.logs.forget(instance.id)
+
+    async def _wait_until_ready(self, instance: MPVInstance, process: subprocess.Popen):
+        """Wait for the IPC socket to appear, then probe mpv-version with backoff.
+
+        Gives up early if mpv exits, or after settings.mpv_ready_timeout.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.mpv_ready_timeout
+        backoff = settings.mpv_ready_initial_backoff
+        last_error: Optional[Exception] = None
+        pipe_address = self._get_pipe_address(instance.pipe_name)
+
+        while True:
+            exit_code = process.poll()
+            if exit_code is not None:
+                raise Exception(f"MPV exited with code {exit_code} during startup")
+
+            if self.backend.is_reachable(instance, pipe_address):
+                try:
+                    await self.probe_instance(
+                        instance, timeout=max(deadline - loop.time(), 0.01)
+                    )
+                    return
+                except Exception as e:
+                    last_error = e
+                    logger.debug(f"MPV not ready yet for {instance.id}: {e}")
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise Exception(
+                    f"MPV did not become ready within "
+                    f"{settings.mpv_ready_timeout}s: {last_error}"
+                )
+
+            await asyncio.sleep(min(backoff, remaining))
+            backoff = min(backoff * 2, settings.mpv_ready_max_backoff)
 
     async def _connect_to_windows_pipe(self, pipe_address: str):
         """Connect to a Windows named pipe using win32 API"""
@@ -223,10 +790,81 @@ class MPVManager:
         await asyncio.to_thread(close_pipe)
 
     async def send_command(
+        self,
+        instance_id: str,
+        cmd: MPVCommand,
+        allow_starting: bool = False,
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> MPVReply:
+        if allow_starting:
+            # Startup probes run before anything else is queued
+            return await self._send_now(instance_id, cmd, allow_starting=True)
+
+        return await self._get_scheduler(instance_id).submit(
+            lambda: self._send_now(instance_id, cmd), priority
+        )
+
+    async def _send_now(
         self, instance_id: str, cmd: MPVCommand, allow_starting: bool = False
-    ) -> MPVResponse:
+    ) -> MPVReply:
         logger.debug(f"Sending command to instance {instance_id}: {cmd.command}")
 
+        instance = self._get_commandable_instance(instance_id, allow_starting)
+
+        request_id = self._next_request_id()
+
+        cmd_dict = command_payload(cmd, request_id)
+
+        logger.debug(f"Sending command with request_id {request_id}: {cmd_dict}")
+
+        connection = await self._get_connection(instance)
+        if connection is None:
+            return await self._send_command_windows(
+                self._get_pipe_address(instance.pipe_name),
+                encode_line(cmd_dict),
+                request_id,
+            )
+
+        res = await connection.request(cmd_dict, timeout=10.0)
+        logger.debug(f"Found matching response for request_id {request_id}")
+        return to_response(res)
+
+    async def send_commands(
+        self,
+        instance_id: str,
+        cmds: list[MPVCommand],
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+    ) -> list[MPVReply]:
+        """Pipeline several commands: one write to the socket, replies matched by request_id.
+
+        mpv executes them in order, so dependent commands (loadfile, then seek)
+        keep their meaning. The batch is scheduled as a single unit.
+        """
+        return await self._get_scheduler(instance_id).submit(
+            lambda: self._send_many_now(instance_id, cmds), priority
+        )
+
+    async def _send_many_now(
+        self, instance_id: str, cmds: list[MPVCommand]
+    ) -> list[MPVReply]:
+        logger.debug(
+            f"Sending {len(cmds)} pipelined commands to instance {instance_id}"
+        )
+
+        instance = self._get_commandable_instance(instance_id)
+
+        connection = await self._get_connection(instance)
+        if connection is None:
+            return [await self._send_now(instance_id, cmd) for cmd in cmds]
+
+        payloads = [command_payload(cmd, self._next_request_id()) for cmd in cmds]
+
+        responses = await connection.request_many(payloads, timeout=10.0)
+        return [to_response(res) for res in responses]
+
+    def _get_commandable_instance(
+        self, instance_id: str, allow_starting: bool = False
+    ) -> MPVInstance:
         instance = self.instances.get(instance_id)
 
         if not instance:
@@ -247,65 +885,223 @@ class MPVManager:
                 f"MPV Instance {instance_id} is not in a valid state ({instance.status})"
             )
 
-        if sys.platform == "win32":
-            pipe_address = f"\\\\.\\pipe\\{instance.pipe_name}"
-        else:
-            pipe_address = f"/tmp/{instance.pipe_name}"
-
-        logger.debug(f"Connecting to pipe: {pipe_address}")
+        return instance
 
+    def _next_request_id(self) -> int:
         request_id = self.request_count
         self.request_count += 1
+        return request_id
 
-        cmd_dict = cmd.model_dump(exclude_none=True)
-        cmd_dict["request_id"] = request_id
-        cmd_json = json.dumps(cmd_dict) + "\n"
+    def _get_pipe_address(self, pipe_name: str) -> str:
+        if sys.platform == "win32":
+            return f"\\\\.\\pipe\\{pipe_name}"
+        return f"/tmp/{pipe_name}"
+
+    async def _get_connection(
+        self, instance: MPVInstance
+    ) -> Optional[MPVIPCConnection]:
+        """Return the instance's persistent IPC connection, opening it on first use.
+
+        Returns None on Windows event loops without named pipe support, in which
+        case the caller falls back to a connection per command.
+        """
+        connection = instance.connection
+        if connection is not None and connection.is_connected:
+            return connection
+
+        lock = self._connection_locks.setdefault(instance.id, asyncio.Lock())
+        async with lock:
+            connection = instance.connection
+            if connection is not None and connection.is_connected:
+                return connection
+
+            if connection is not None:
+                await connection.close()
+                instance.connection = None
+
+            pipe_address = self._get_pipe_address(instance.pipe_name)
+            logger.debug(f"Connecting to pipe: {pipe_address}")
 
-        logger.debug(
-            f"Sending command with request_id {request_id}: {cmd_json.strip()}"
+            try:
+                connection = await self.backend.connect(instance, pipe_address)
+            except NotImplementedError:
+                return None
+
+            connection.event_listeners.add(
+                lambda event: self._handle_event(instance.id, event)
+            )
+            instance.connection = connection
+
+            # Observers belong to the client connection, so a reconnect has to
+            # register them again.
+            if instance.id in self.player_states:
+                asyncio.create_task(self._observe_properties(instance.id, connection))
+            # mpv names each IPC client, so the cached name belongs to the old one
+            if instance.id in self.instance_metadata:
+                asyncio.create_task(self._refresh_client_name(instance, connection))
+
+            return connection
+
+    async def _refresh_client_name(
+        self, instance: MPVInstance, connection: MPVIPCConnection
+    ):
+        try:
+            res = await connection.request(
+                {"command": ["client_name"], "request_id": self._next_request_id()},
+                timeout=5.0,
+            )
+        except Exception as e:
+            logger.warning(
+                f"Failed to refresh client name for instance {instance.id}: {e}"
+            )
+            return
+
+        metadata = self.instance_metadata.get(instance.id)
+        if metadata is not None:
+            metadata["clientName"] = res.get("data") or ""
+            instance.client_name = metadata["clientName"]
+
+    async def start_observing(self, instance_id: str) -> bool:
+        """Keep the instance's state snapshot current from property-change events.
+
+        Returns False when events are unavailable (per-command Windows fallback),
+        in which case callers should poll with poll_player_state instead.
+        """
+        if instance_id in self.player_states:
+            return True
+
+        instance = self.instances.get(instance_id)
+        if not instance:
+            raise Exception(f"MPV Instance {instance_id} not found")
+
+        connection = await self._get_connection(instance)
+        if connection is None:
+            return False
+
+        self.player_states[instance_id] = {}
+        try:
+            await self._observe_properties(instance_id, connection)
+        except Exception:
+            self.player_states.pop(instance_id, None)
+            raise
+        return True
+
+    async def _observe_properties(self, instance_id: str, connection: MPVIPCConnection):
+        logger.debug(f"Observing {OBSERVED_PROPERTIES} on instance {instance_id}")
+        await asyncio.gather(
+            *[
+                connection.request(
+                    {
+                        "command": ["observe_property", observe_id, name],
+                        "request_id": self._next_request_id(),
+                    }
+                )
+                for observe_id, name in enumerate(OBSERVED_PROPERTIES, start=1)
+            ]
         )
 
-        if sys.platform == "win32":
-            return await self._send_command_windows(pipe_address, cmd_json, request_id)
-        else:
-            return await self._send_command_unix(pipe_address, cmd_json, request_id)
+    def _handle_event(self, instance_id: str, event: dict[str, Any]):
+        if event.get("event") != "property-change":
+            return
+
+        state = self.player_states.get(instance_id)
+        name = event.get("name")
+        if state is None or name not in OBSERVED_PROPERTIES:
+            return
+
+        value = event.get("data")
+        if name in state and state[name] == value:
+            return
+        state[name] = value
+
+        listeners = [
+            *self.state_listeners.get(instance_id, set()),
+            *self.global_state_listeners,
+        ]
+        for listener in listeners:
+            try:
+                listener(instance_id, name, value)
+            except Exception as e:
+                logger.error(f"Error in state listener for {instance_id}: {e}")
+
+    def get_player_state(self, instance_id: str) -> Optional[dict[str, Any]]:
+        state = self.player_states.get(instance_id)
+        return dict(state) if state is not None else None
+
+    async def poll_player_state(self, instance_id: str) -> dict[str, Any]:
+        """Read the polled properties directly, for instances without events"""
+        results = await asyncio.gather(
+            *[
+                self.send_command(
+                    instance_id,
+                    MPVCommand(command=["get_property", name], **{}),
+                    priority=CommandPriority.BACKGROUND,
+                )
+                for name in POLLED_PROPERTIES
+            ],
+            return_exceptions=True,
+        )
+        return {
+            name: result.data if isinstance(result, MPVReply) else None
+            for name, result in zip(POLLED_PROPERTIES, results)
+        }
+
+    def add_state_listener(self, instance_id: str, callback: Callable):
+        if instance_id not in self.state_listeners:
+            self.state_listeners[instance_id] = set()
+        self.state_listeners[instance_id].add(callback)
+
+    def remove_state_listener(self, instance_id: str, callback: Callable):
+        if instance_id in self.state_listeners:
+            self.state_listeners[instance_id].discard(callback)
+
+    def add_global_state_listener(self, callback: Callable):
+        """Listen to state changes of every instance"""
+        self.global_state_listeners.add(callback)
+
+    def remove_global_state_listener(self, callback: Callable):
+        self.global_state_listeners.discard(callback)
+
+    async def _close_connection(self, instance: MPVInstance):
+        if instance.connection is not None:
+            await instance.connection.close()
+            instance.connection = None
+        self._connection_locks.pop(instance.id, None)
+        self.player_states.pop(instance.id, None)
+        scheduler = self.schedulers.pop(instance.id, None)
+        if scheduler:
+            scheduler.cancel()
 
     async def _send_command_windows(
-        self, pipe_address: str, cmd_json: str, request_id: int
-    ) -> MPVResponse:
+        self, pipe_address: str, cmd_line: bytes, request_id: int
+    ) -> MPVReply:
         """Send command using Windows named pipes"""
         handle = None
         try:
             handle = await self._connect_to_windows_pipe(pipe_address)
-            await self._write_to_windows_pipe(handle, cmd_json.encode())
+            await self._write_to_windows_pipe(handle, cmd_line)
 
-            buffer = b""
+            framer = LineFramer(STREAM_LIMIT)
             while True:
                 try:
                     data = await self._read_from_windows_pipe(handle, timeout=10.0)
                     if not data:
                         break
 
-                    buffer += data
-                    lines = buffer.split(b"\n")
-                    buffer = lines[-1]  # Keep incomplete line in buffer
-
-                    for line in lines[:-1]:  # Process complete lines
-                        if line.strip():
-                            line_str = line.decode().strip()
-                            logger.debug(f"Received response: {line_str}")
-                            try:
-                                res = json.loads(line_str)
-                                if res.get("request_id") == request_id:
-                                    logger.debug(
-                                        f"Found matching response for request_id {request_id}"
-                                    )
-                                    return MPVResponse(**res)
-                            except json.JSONDecodeError as e:
-                                logger.warning(
-                                    f"Failed to decode JSON response: {line_str}, error: {e}"
-                                )
-                                continue
+                    for line in framer.feed(data):
+                        logger.debug(f"Received response: {line!r}")
+                        try:
+                            res = loads(line)
+                        except ValueError as e:
+                            logger.warning(
+                                f"Failed to decode JSON response: {line!r}, error: {e}"
+                            )
+                            continue
+                        if res.get("request_id") == request_id:
+                            logger.debug(
+                                f"Found matching response for request_id {request_id}"
+                            )
+                            return to_response(res)
                 except asyncio.TimeoutError:
                     logger.error(f"Timeout waiting for response from MPV instance")
                     raise Exception("Timeout waiting for response from MPV")
@@ -317,51 +1113,59 @@ class MPVManager:
         logger.error(f"No matching response found for request_id {request_id}")
         raise Exception("No matching response found")
 
-    async def _send_command_unix(
-        self, pipe_address: str, cmd_json: str, request_id: int
-    ) -> MPVResponse:
-        """Send command using Unix domain sockets"""
-        reader, writer = await asyncio.open_connection(path=pipe_address)
+    async def execute_remote_command(
+        self, instance_id: str, remote_cmd: RemoteCommand
+    ) -> MPVReply:
+        logger.info(
+            f"Executing remote command {remote_cmd.action} on instance {instance_id}"
+        )
+
+        mpv_command = self._build_mpv_command(remote_cmd)
+        return await self._get_scheduler(instance_id).submit(
+            lambda: self._send_now(instance_id, mpv_command),
+            CommandPriority.INTERACTIVE,
+            self._coalesce_key(remote_cmd),
+        )
 
-        writer.write(cmd_json.encode())
-        await writer.drain()
+    def _coalesce_key(self, remote_cmd: RemoteCommand) -> Optional[str]:
+        """Commands where only the latest value matters, so bursts can be merged"""
+        params = remote_cmd.params or {}
 
-        try:
-            while True:
-                line = await asyncio.wait_for(reader.readline(), timeout=10.0)
-                if not line:
-                    logger.debug(f"No more data from MPV instance")
-                    break
-
-                line_str = line.decode().strip()
-                if line_str:
-                    logger.debug(f"Received response: {line_str}")
-                    try:
-                        res = json.loads(line_str)
-                        if res.get("request_id") == request_id:
-                            logger.debug(
-                                f"Found matching response for request_id {request_id}"
-                            )
-                            return MPVResponse(**res)
-                    except json.JSONDecodeError as e:
-                        logger.warning(
-                            f"Failed to decode JSON response: {line_str}, error: {e}"
-                        )
-                        continue
-        finally:
-            writer.close()
-            await writer.wait_closed()
+        if remote_cmd.action == RemoteCommandAction.SEEK:
+            # Relative seeks add up, so dropping one would change the result
+            if params.get("type", "absolute") in ("absolute", "absolute-percent"):
+                return "seek"
+        elif remote_cmd.action == RemoteCommandAction.VOLUME and "level" in params:
+            return "volume"
 
-        logger.error(f"Timeout waiting for response from MPV instance")
-        raise Exception("Timeout waiting for response from MPV")
+        return None
 
-    async def execute_remote_command(
-        self, instance_id: str, remote_cmd: RemoteCommand
-    ) -> MPVResponse:
+    def _get_scheduler(self, instance_id: str) -> CommandScheduler:
+        # Fail fast instead of queueing behind other commands
+        self._get_commandable_instance(instance_id)
+
+        if instance_id not in self.schedulers:
+            self.schedulers[instance_id] = CommandScheduler(instance_id)
+        return self.schedulers[instance_id]
+
+    def get_scheduler_stats(self, instance_id: str) -> dict[str, Any]:
+        scheduler = self.schedulers.get(instance_id)
+        if scheduler is None:
+            return CommandScheduler(instance_id).get_stats()
+        return scheduler.get_stats()
+
+    async def execute_remote_commands(
+        self, instance_id: str, remote_cmds: list[RemoteCommand]
+    ) -> list[MPVReply]:
         logger.info(
-            f"Executing remote command {remote_cmd.action} on instance {instance_id}"
+            f"Executing {len(remote_cmds)} remote commands on instance {instance_id}"
         )
 
+        # Build everything first so a bad command rejects the whole batch
+        mpv_commands = [self._build_mpv_command(cmd) for cmd in remote_cmds]
+        return await self.send_commands(instance_id, mpv_commands)
+
+    def _build_mpv_command(self, remote_cmd: RemoteCommand) -> MPVCommand:
         mpv_command: MPVCommand
 
         if remote_cmd.action in [RemoteCommandAction.PLAY, RemoteCommandAction.PAUSE]:
@@ -446,7 +1250,27 @@ class MPVManager:
             logger.error(f"Unknown action: {remote_cmd.action}")
             raise ValueError(f"Unknown action: {remote_cmd.action}")
 
-        return await self.send_command(instance_id, mpv_command)
+        return mpv_command
+
+    async def get_tracks(self, instance_id: str):
+        """Available and current tracks in a single pipelined round trip"""
+        logger.debug(f"Getting tracks for instance {instance_id}")
+
+        tracks_response, audio_track, subtitle_track = await self.send_commands(
+            instance_id,
+            [
+                MPVCommand(command=["get_property", "track-list"], **{}),
+                MPVCommand(command=["get_property", "aid"], **{}),
+                MPVCommand(command=["get_property", "sid"], **{}),
+            ],
+            priority=CommandPriority.BACKGROUND,
+        )
+
+        return {
+            **self._parse_tracks(tracks_response.data or []),
+            "audioTrack": audio_track.data,
+            "subtitleTrack": subtitle_track.data,
+        }
 
     async def get_available_tracks(
         self,
@@ -457,9 +1281,12 @@ class MPVManager:
         tracks_response = await self.send_command(
             instance_id=instance_id,
             cmd=MPVCommand(command=["get_property", "track-list"], **{}),
+            priority=CommandPriority.BACKGROUND,
         )
 
-        tracks = tracks_response.data or []
+        return self._parse_tracks(tracks_response.data or [])
+
+    def _parse_tracks(self, tracks: list):
         logger.debug(f"Found {len(tracks)} tracks")
 
         audio_tracks = [
@@ -515,10 +1342,14 @@ class MPVManager:
 
         audio_track, subtitle_track = await asyncio.gather(
             self.send_command(
-                instance_id, MPVCommand(command=["get_property", "aid"], **{})
+                instance_id,
+                MPVCommand(command=["get_property", "aid"], **{}),
+                priority=CommandPriority.BACKGROUND,
             ),
             self.send_command(
-                instance_id, MPVCommand(command=["get_property", "sid"], **{})
+                instance_id,
+                MPVCommand(command=["get_property", "sid"], **{}),
+                priority=CommandPriority.BACKGROUND,
             ),
         )
 
@@ -535,8 +1366,14 @@ class MPVManager:
             logger.error(f"MPV instance {instance_id} not found")
             raise Exception(f"MPV instance {instance_id} not found")
 
+        metadata = self.instance_metadata.get(instance_id)
+        if metadata is not None:
+            return metadata["clientName"]
+
         cmd_response = await self.send_command(
-            instance_id, MPVCommand(command=["client_name"], **{})
+            instance_id,
+            MPVCommand(command=["client_name"], **{}),
+            priority=CommandPriority.BACKGROUND,
         )
 
         client_name = cmd_response.data or ""
@@ -544,43 +1381,24 @@ class MPVManager:
         return client_name
 
     async def get_instance(self, instance_id: str) -> Optional[MPVInstance]:
+        """Served from the metadata cache, never from mpv"""
         logger.debug(f"Getting instance {instance_id}")
 
         instance = self.instances.get(instance_id)
-        if instance:
-            try:
-                client_name = await self.get_client_name(instance_id)
-                instance.client_name = client_name
-            except Exception as e:
-                logger.warning(
-                    f"Failed to get client name for instance {instance_id}: {e}"
-                )
-        else:
+        if not instance:
             logger.warning(f"Instance {instance_id} not found")
         return instance
 
     async def get_all_instances(self) -> list[MPVInstance]:
+        """Served from the metadata cache, never from mpv"""
         logger.debug(f"Getting all instances (count: {len(self.instances)})")
 
-        instances = list(self.instances.values())
-
-        for instance in instances:
-            try:
-                client_name = await self.get_client_name(instance.id)
-                instance.client_name = client_name
-            except Exception as e:
-                logger.warning(
-                    f"Failed to get client name for instance {instance.id}: {e}"
-                )
-
-        return instances
+        return list(self.instances.values())
 
     async def stop_instance(self, instance_id: str):
         logger.info(f"Stopping instance {instance_id}")
 
-        from services.hls_stream import hls_stream_service
-
-        await hls_stream_service.stop_stream(instance_id)
+        await self.stop_hls_stream(instance_id)
 
         instance = self.instances.get(instance_id)
         if instance and instance.process:
@@ -591,36 +1409,18 @@ class MPVManager:
                 logger.warning(
                     f"Failed to send quit command to instance {instance_id}: {e}"
                 )
+                # Mark it first so the supervisor does not take the
+                # SIGTERM for a crash
+                instance.status = MPVStatus.STOPPED
                 if instance.process and hasattr(instance.process, "terminate"):
                     logger.debug(f"Terminating process for instance {instance_id}")
                     instance.process.terminate()
             instance.status = MPVStatus.STOPPED
+            await self.release_instance(instance)
+            self.supervisor.reap_later(instance_id)
             logger.info(f"Instance {instance_id} stopped")
         else:
             logger.warning(f"Instance {instance_id} not found or has no process")
 
-    async def _clean_dead_instances(self):
-        logger.debug("Starting dead instance cleanup task")
-        await asyncio.sleep(5 * 60)
-        now = datetime.now()
-        dead_instances = []
-
-        for instance_id, instance in self.instances.items():
-            if (
-                instance.status == MPVStatus.ERROR
-                or (now - instance.last_seen).total_seconds() > 5 * 60
-            ):
-                dead_instances.append(instance_id)
-                logger.debug(
-                    f"Marking instance {instance_id} for cleanup (status: {instance.status})"
-                )
-
-        for instance_id in dead_instances:
-            logger.info(f"Cleaning up dead instance {instance_id}")
-            del self.instances[instance_id]
-
-        if dead_instances:
-            logger.info(f"Cleaned up {len(dead_instances)} dead instances")
-
 
 mpv_manager = MPVManager()
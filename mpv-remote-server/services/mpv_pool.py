@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from config import settings
+from models.model import MPVInstance
+
+if TYPE_CHECKING:
+    from services.mpv_manager import MPVManager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+class MPVWarmPool:
+    """Keeps idle mpv processes started and answering IPC so a play request
+    can claim one and loadfile instead of paying for a cold start."""
+
+    def __init__(self, manager: "MPVManager", size: int):
+        self.manager = manager
+        self.size = size
+        self.idle: List[MPVInstance] = []
+        self.hits = 0
+        self.misses = 0
+        self.spawned = 0
+        self.discarded = 0
+        self._refill_task: Optional[asyncio.Task] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.size <= 0:
+            return
+        self.refill()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    def refill(self):
+        if self.size <= 0:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._fill())
+
+    async def _fill(self):
+        failures = 0
+        while len(self.idle) < self.size:
+            try:
+                instance = await self.manager.create_pooled_instance()
+            except Exception as e:
+                failures += 1
+                logger.error(f"Failed to start pooled MPV instance: {e}")
+                if failures >= 3:
+                    # Leave it to the next refill instead of respawning forever
+                    return
+                await asyncio.sleep(2**failures)
+                continue
+
+            failures = 0
+            self.spawned += 1
+            self.idle.append(instance)
+            logger.info(f"Warm pool now holds {len(self.idle)}/{self.size} instances")
+
+    async def claim(self) -> Optional[MPVInstance]:
+        while self.idle:
+            instance = self.idle.pop(0)
+            if self._is_alive(instance):
+                self.hits += 1
+                return instance
+            await self._discard(instance)
+
+        self.misses += 1
+        return None
+
+    def adopt(self, instance: MPVInstance) -> bool:
+        """Take back an idle player left by a previous server process"""
+        if len(self.idle) >= self.size:
+            return False
+        self.idle.append(instance)
+        return True
+
+    def _is_alive(self, instance: MPVInstance) -> bool:
+        process = instance.process
+        connection = instance.connection
+        return (
+            process is not None
+            and process.poll() is None
+            and (connection is None or connection.is_connected)
+        )
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(settings.mpv_pool_health_interval)
+            for instance in list(self.idle):
+                try:
+                    if not self._is_alive(instance):
+                        raise Exception("process exited")
+                    await self.manager.probe_instance(instance, timeout=2.0)
+                except Exception as e:
+                    logger.warning(
+                        f"Pooled instance {instance.id} failed health check: {e}"
+                    )
+                    if instance in self.idle:
+                        self.idle.remove(instance)
+                    await self._discard(instance)
+            self.refill()
+
+    async def _discard(self, instance: MPVInstance):
+        self.discarded += 1
+        try:
+            await self.manager.dispose_instance(instance)
+        except Exception as e:
+            logger.error(f"Error disposing pooled instance {instance.id}: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "size": self.size,
+            "idle": len(self.idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "spawned": self.spawned,
+            "discarded": self.discarded,
+        }
+
+    async def shutdown(self):
+        for task in (self._refill_task, self._health_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        for instance in self.idle:
+            await self.manager.dispose_instance(instance)
+        self.idle.clear()
@@ -0,0 +1,157 @@
+import glob
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from models.model import MPVInstance
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+def pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32  # type: ignore[attr-defined]
+        # SYNCHRONIZE access, then a zero timeout wait: WAIT_TIMEOUT means running
+        handle = kernel32.OpenProcess(0x00100000, False, pid)
+        if not handle:
+            return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == 0x102
+        finally:
+            kernel32.CloseHandle(handle)
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    # An exited process nobody has reaped yet still accepts signals
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        return stat[stat.rfind(b")") + 2 : stat.rfind(b")") + 3] != b"Z"
+    except OSError:
+        return True
+
+
+class AdoptedProcess:
+    """Popen-like handle for an mpv started by an earlier server process.
+
+    It is not our child, so its exit code cannot be collected; an exit is
+    reported as 0.
+    """
+
+    stdout = None
+    stderr = None
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode: Optional[int] = None
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None and not pid_alive(self.pid):
+            self.returncode = 0
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired("mpv", timeout or 0)
+            time.sleep(0.2)
+        return self.returncode or 0
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(getattr(signal, "SIGKILL", signal.SIGTERM))
+
+    def _signal(self, sig: int):
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+
+class MPVRegistry:
+    """Players this server started, kept on disk so a restarted server can
+    take them back instead of leaving them running as orphans."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.adopted = 0
+        self.dropped = 0
+        self.sockets_removed = 0
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if self.path.exists():
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f).get("instances", {})
+        except Exception as e:
+            logger.error(f"Error loading instance registry {self.path}: {e}")
+            self.entries = {}
+        return dict(self.entries)
+
+    def record(self, instance: MPVInstance, address: str, pooled: bool = False):
+        self.entries[instance.id] = {
+            "pid": instance.process.pid if instance.process else None,
+            "pipeName": instance.pipe_name,
+            "address": address,
+            "streamAudio": instance.stream_audio,
+            "pooled": pooled,
+            "recordedAt": datetime.now().isoformat(),
+        }
+        self._save()
+
+    def remove(self, instance_id: str):
+        if self.entries.pop(instance_id, None) is not None:
+            self._save()
+
+    def _save(self):
+        try:
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w") as f:
+                json.dump({"instances": self.entries}, f, indent=2)
+            # Atomic, so a crash mid-write never leaves a truncated registry
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving instance registry {self.path}: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "recorded": len(self.entries),
+            "adopted": self.adopted,
+            "dropped": self.dropped,
+            "socketsRemoved": self.sockets_removed,
+        }
+
+
+def list_socket_paths() -> List[str]:
+    """IPC sockets of mpv instances started by any server run (Unix only)"""
+    if sys.platform == "win32":
+        return []
+    return glob.glob("/tmp/mpvsocket_*")
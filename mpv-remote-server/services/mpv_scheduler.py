@@ -0,0 +1,270 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from config import settings
+from models.model import CommandPriority
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+class ScheduledCommand:
+    def __init__(
+        self,
+        run: Callable[[], Awaitable[Any]],
+        coalesce_key: Optional[str],
+        enqueued_at: float,
+        settle_at: float,
+    ):
+        self.run = run
+        self.coalesce_key = coalesce_key
+        self.enqueued_at = enqueued_at
+        # Later commands may fold into this one until then
+        self.settle_at = settle_at
+        self.futures: List[asyncio.Future] = []
+
+
+class CommandLane:
+    """One priority class: its own queue, timeout, concurrency limit and stats"""
+
+    def __init__(self, priority: CommandPriority, timeout: float, concurrency: int):
+        self.priority = priority
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.queue: Deque[ScheduledCommand] = deque()
+        self.in_flight = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.failed = 0
+        self.max_depth = 0
+        # coalesce key -> when a command with it was last dispatched
+        self.last_dispatched: Dict[str, float] = {}
+        # enqueue-to-reply latency of recent commands, in milliseconds
+        self.latencies: Deque[float] = deque(maxlen=512)
+
+    def next_ready(self, now: float) -> Optional[ScheduledCommand]:
+        """The first queued command that has settled, if the lane has room"""
+        if self.in_flight >= self.concurrency:
+            return None
+        for item in self.queue:
+            # Only coalescable commands are ever unsettled, and a discrete
+            # command queued behind one settles it, so skipping unsettled
+            # items never reorders a command past a barrier
+            if item.settle_at <= now:
+                return item
+        return None
+
+    def next_settle_at(self) -> Optional[float]:
+        return min((item.settle_at for item in self.queue), default=None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            "depth": len(self.queue),
+            "maxDepth": self.max_depth,
+            "inFlight": self.in_flight,
+            "concurrency": self.concurrency,
+            "timeout": self.timeout,
+            "dispatched": self.dispatched,
+            "dropped": self.dropped,
+            "timeouts": self.timeouts,
+            "failed": self.failed,
+            "latencyMs": {
+                "p50": percentile(0.50),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1], 2) if latencies else None,
+            },
+        }
+
+
+class CommandScheduler:
+    """Per-instance dispatcher for mpv commands with priority lanes.
+
+    Interactive commands (user actions) are always dispatched before
+    background ones (state polling, metadata and track queries). Each lane has
+    its own timeout and concurrency limit, so a backlog of background reads
+    cannot hold up a pause.
+
+    Within a lane, commands with a coalesce key (absolute seeks, volume
+    levels) replace a still-queued command of the same kind, so only the
+    latest target reaches mpv. The first command of a burst goes out at
+    once; one following within command_coalesce_window of it waits out the
+    rest of the window, so a slider drag reaches mpv at most once per
+    window while other commands and lanes keep dispatching. Commands without a key are discrete: they are
+    never merged and act as barriers, so a seek queued after a pause is never
+    folded into one queued before it. Callers of superseded commands receive
+    the result of the command that replaced theirs.
+    """
+
+    def __init__(self, instance_id: str):
+        self.instance_id = instance_id
+        self.lanes: Dict[CommandPriority, CommandLane] = {
+            CommandPriority.INTERACTIVE: CommandLane(
+                CommandPriority.INTERACTIVE,
+                settings.command_interactive_timeout,
+                settings.command_interactive_concurrency,
+            ),
+            CommandPriority.BACKGROUND: CommandLane(
+                CommandPriority.BACKGROUND,
+                settings.command_background_timeout,
+                settings.command_background_concurrency,
+            ),
+        }
+        self._wakeup = asyncio.Event()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._pump: Optional[asyncio.Task] = None
+        self._in_flight: Dict[asyncio.Task, ScheduledCommand] = {}
+
+    async def submit(
+        self,
+        run: Callable[[], Awaitable[Any]],
+        priority: CommandPriority = CommandPriority.INTERACTIVE,
+        coalesce_key: Optional[str] = None,
+    ) -> Any:
+        lane = self.lanes[priority]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        now = loop.time()
+
+        item = self._find_coalescable(lane, coalesce_key) if coalesce_key else None
+        if item is not None:
+            item.run = run
+            lane.dropped += 1
+        else:
+            settle_at = now
+            if coalesce_key:
+                last = lane.last_dispatched.get(coalesce_key)
+                if last is not None:
+                    settle_at = max(now, last + settings.command_coalesce_window)
+            else:
+                # Nothing can fold into commands queued before a discrete one
+                for queued in lane.queue:
+                    queued.settle_at = min(queued.settle_at, now)
+            item = ScheduledCommand(run, coalesce_key, now, settle_at)
+            lane.queue.append(item)
+            lane.max_depth = max(lane.max_depth, len(lane.queue))
+        item.futures.append(future)
+
+        self._wakeup.set()
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run())
+
+        return await future
+
+    def _find_coalescable(
+        self, lane: CommandLane, coalesce_key: str
+    ) -> Optional[ScheduledCommand]:
+        # Only look back as far as the most recent discrete command
+        for item in reversed(lane.queue):
+            if item.coalesce_key is None:
+                return None
+            if item.coalesce_key == coalesce_key:
+                return item
+        return None
+
+    def _next_ready(self, now: float) -> Optional[Tuple[CommandLane, ScheduledCommand]]:
+        # Lanes are declared in priority order
+        for lane in self.lanes.values():
+            item = lane.next_ready(now)
+            if item is not None:
+                return lane, item
+        return None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            ready = self._next_ready(loop.time())
+            if ready is None:
+                settle_times = [
+                    settle_at
+                    for lane in self.lanes.values()
+                    if (settle_at := lane.next_settle_at()) is not None
+                ]
+                if not self._in_flight and not settle_times:
+                    return
+                self._wakeup.clear()
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if settle_times:
+                    # Wake up when the next coalescing window closes
+                    self._timer = loop.call_at(min(settle_times), self._wakeup.set)
+                await self._wakeup.wait()
+                continue
+
+            lane, item = ready
+            lane.queue.remove(item)
+            if item.coalesce_key:
+                lane.last_dispatched[item.coalesce_key] = loop.time()
+            lane.in_flight += 1
+            task = asyncio.create_task(self._execute(lane, item))
+            self._in_flight[task] = item
+
+    async def _execute(self, lane: CommandLane, item: ScheduledCommand):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await asyncio.wait_for(item.run(), timeout=lane.timeout)
+            lane.dispatched += 1
+            for future in item.futures:
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            error = e
+            if isinstance(e, asyncio.TimeoutError):
+                lane.timeouts += 1
+                error = Exception(
+                    f"{lane.priority.value} command timed out after {lane.timeout}s"
+                )
+            else:
+                lane.failed += 1
+            for future in item.futures:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            lane.latencies.append((loop.time() - item.enqueued_at) * 1000)
+            lane.in_flight -= 1
+            task = asyncio.current_task()
+            if task is not None:
+                self._in_flight.pop(task, None)
+            self._wakeup.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {lane.priority.value: lane.get_stats() for lane in self.lanes.values()}
+
+    def cancel(self):
+        if self._pump and not self._pump.done():
+            self._pump.cancel()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        items: List[ScheduledCommand] = []
+        for lane in self.lanes.values():
+            items.extend(lane.queue)
+            lane.queue.clear()
+        for task, item in self._in_flight.items():
+            task.cancel()
+            items.append(item)
+        self._in_flight.clear()
+
+        for item in items:
+            for future in item.futures:
+                if not future.done():
+                    future.set_exception(Exception("Command scheduler stopped"))
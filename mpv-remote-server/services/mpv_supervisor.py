@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from config import settings
+from models.model import MPVInstance, MPVStatus
+
+if TYPE_CHECKING:
+    from services.mpv_manager import MPVManager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+class MPVSupervisor:
+    """Watches instance processes and reacts as soon as one exits.
+
+    Exit detection is event driven where the platform allows it: a pidfd
+    registered with the event loop becomes readable when the child exits,
+    so no thread sits in waitpid. Elsewhere (Windows, old kernels, embedded
+    libmpv players) a single worker thread waits on the process instead.
+
+    On exit the instance's status is updated immediately. A crash (non-zero
+    exit code) is restarted with exponential backoff when mpv_auto_restart
+    is enabled, resuming the same file, position, pause state, volume and
+    tracks under the same instance id. Instances that are not restarted are
+    removed from the instance table after mpv_reap_delay seconds.
+    """
+
+    def __init__(self, manager: "MPVManager"):
+        self.manager = manager
+        # instance id -> stops that instance's exit watch
+        self._watches: Dict[str, Callable[[], None]] = {}
+        self._restart_tasks: Dict[str, asyncio.Task] = {}
+        self._reap_tasks: Dict[str, asyncio.Task] = {}
+        self._attempts: Dict[str, int] = {}
+        self._started_at: Dict[str, float] = {}
+        self.pidfd_watches = 0
+        self.thread_watches = 0
+        self.exits = 0
+        self.crashes = 0
+        self.restarts = 0
+        self.reaped = 0
+
+    def watch(self, instance: MPVInstance):
+        self.unwatch(instance.id)
+        self.cancel_reap(instance.id)
+        self._started_at[instance.id] = asyncio.get_running_loop().time()
+
+        process = instance.process
+        if process is None:
+            return
+
+        if not self._watch_pidfd(instance, process):
+            self._watch_thread(instance, process)
+
+    def unwatch(self, instance_id: str):
+        stop = self._watches.pop(instance_id, None)
+        if stop is not None:
+            stop()
+
+    def _watch_pidfd(self, instance: MPVInstance, process: Any) -> bool:
+        # Embedded libmpv players share the server's pid and cannot be watched
+        if not hasattr(os, "pidfd_open") or process.pid == os.getpid():
+            return False
+
+        loop = asyncio.get_running_loop()
+        try:
+            fd = os.pidfd_open(process.pid)
+        except OSError as e:
+            logger.debug(f"pidfd unavailable for pid {process.pid}: {e}")
+            return False
+
+        def stop():
+            loop.remove_reader(fd)
+            os.close(fd)
+
+        def on_exit():
+            self._watches.pop(instance.id, None)
+            stop()
+            # The pidfd only reports the exit; wait() reaps the zombie and
+            # returns at once
+            self._exited(instance, process, process.wait())
+
+        try:
+            loop.add_reader(fd, on_exit)
+        except (NotImplementedError, OSError):
+            os.close(fd)
+            return False
+
+        self._watches[instance.id] = stop
+        self.pidfd_watches += 1
+        return True
+
+    def _watch_thread(self, instance: MPVInstance, process: Any):
+        task = asyncio.create_task(asyncio.to_thread(process.wait))
+
+        def on_exit(task: asyncio.Task):
+            if task.cancelled():
+                return
+            self._watches.pop(instance.id, None)
+            error = task.exception()
+            self._exited(instance, process, None if error else task.result())
+
+        task.add_done_callback(on_exit)
+        self._watches[instance.id] = task.cancel
+        self.thread_watches += 1
+
+    def _exited(self, instance: MPVInstance, process: Any, exit_code: Optional[int]):
+        if instance.process is not process:
+            # A watch left over from before a restart
+            return
+        asyncio.create_task(self._handle_exit(instance, exit_code))
+
+    async def _handle_exit(self, instance: MPVInstance, exit_code: Optional[int]):
+        manager = self.manager
+        if manager.instances.get(instance.id) is not instance:
+            return
+
+        self.exits += 1
+        logger.info(
+            f"MPV process for instance {instance.id} exited with code {exit_code}"
+        )
+
+        # Capture where playback was before the state snapshot is dropped
+        state = manager.get_player_state(instance.id) or {}
+        stopped = instance.status == MPVStatus.STOPPED
+        crashed = not stopped and exit_code != 0
+        await manager.release_instance(instance)
+
+        if crashed:
+            self.crashes += 1
+            if settings.mpv_auto_restart and self._may_restart(instance.id):
+                instance.status = MPVStatus.STARTING
+                self._restart_tasks[instance.id] = asyncio.create_task(
+                    self._restart(instance, state)
+                )
+                return
+
+        instance.status = MPVStatus.ERROR if crashed else MPVStatus.STOPPED
+        logger.info(f"Instance {instance.id} status set to {instance.status.value}")
+        await manager.stop_hls_stream(instance.id)
+        self.reap_later(instance.id)
+
+    def _may_restart(self, instance_id: str) -> bool:
+        started_at = self._started_at.get(instance_id)
+        loop = asyncio.get_running_loop()
+        if (
+            started_at is not None
+            and loop.time() - started_at >= settings.mpv_restart_reset_after
+        ):
+            # It ran long enough to count as healthy, so start counting afresh
+            self._attempts[instance_id] = 0
+        return self._attempts.get(instance_id, 0) < settings.mpv_restart_max_attempts
+
+    async def _restart(self, instance: MPVInstance, state: Dict[str, Any]):
+        try:
+            while (
+                self._attempts.get(instance.id, 0) < settings.mpv_restart_max_attempts
+            ):
+                attempt = self._attempts.get(instance.id, 0)
+                self._attempts[instance.id] = attempt + 1
+                delay = min(
+                    settings.mpv_restart_initial_backoff * 2**attempt,
+                    settings.mpv_restart_max_backoff,
+                )
+                logger.info(
+                    f"Restarting instance {instance.id} in {delay}s "
+                    f"(attempt {attempt + 1}/{settings.mpv_restart_max_attempts})"
+                )
+                await asyncio.sleep(delay)
+
+                # Stopped or removed while waiting
+                if (
+                    self.manager.instances.get(instance.id) is not instance
+                    or instance.status != MPVStatus.STARTING
+                ):
+                    return
+
+                try:
+                    await self.manager.relaunch_instance(instance, state)
+                except Exception as e:
+                    logger.error(f"Restart of instance {instance.id} failed: {e}")
+                    await self.manager.dispose_instance(instance)
+                    instance.status = MPVStatus.STARTING
+                    continue
+
+                self.restarts += 1
+                instance.restarts += 1
+                logger.info(f"Instance {instance.id} restarted")
+                self.watch(instance)
+                return
+
+            logger.error(
+                f"Giving up on instance {instance.id} after "
+                f"{settings.mpv_restart_max_attempts} restart attempts"
+            )
+            instance.status = MPVStatus.ERROR
+            await self.manager.stop_hls_stream(instance.id)
+            self.reap_later(instance.id)
+        finally:
+            self._restart_tasks.pop(instance.id, None)
+
+    def reap_later(self, instance_id: str):
+        """Remove a dead instance from the table once clients had a chance to see it"""
+        self.cancel_reap(instance_id)
+        self._reap_tasks[instance_id] = asyncio.create_task(self._reap(instance_id))
+
+    def cancel_reap(self, instance_id: str):
+        task = self._reap_tasks.pop(instance_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    async def _reap(self, instance_id: str):
+        await asyncio.sleep(settings.mpv_reap_delay)
+        self._reap_tasks.pop(instance_id, None)
+
+        instance = self.manager.instances.get(instance_id)
+        if instance is None or instance.status in (
+            MPVStatus.STARTING,
+            MPVStatus.RUNNING,
+        ):
+            return
+
+        logger.info(f"Reaping {instance.status.value} instance {instance_id}")
+        await self.manager.remove_instance(instance)
+        self.forget(instance_id)
+        self.reaped += 1
+
+    def forget(self, instance_id: str):
+        self.unwatch(instance_id)
+        self.cancel_reap(instance_id)
+        task = self._restart_tasks.pop(instance_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        self._attempts.pop(instance_id, None)
+        self._started_at.pop(instance_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "watched": len(self._watches),
+            "pidfdWatches": self.pidfd_watches,
+            "threadWatches": self.thread_watches,
+            "exits": self.exits,
+            "crashes": self.crashes,
+            "restarts": self.restarts,
+            "restarting": len(self._restart_tasks),
+            "reaped": self.reaped,
+            "autoRestart": settings.mpv_auto_restart,
+        }
+
+    async def shutdown(self):
+        for instance_id in list(self._watches):
+            self.unwatch(instance_id)
+        for task in [*self._restart_tasks.values(), *self._reap_tasks.values()]:
+            task.cancel()
+        self._restart_tasks.clear()
+        self._reap_tasks.clear()
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List
+
+from config import settings
+from models.model import CommandPriority, MPVCommand
+
+if TYPE_CHECKING:
+    from services.mpv_manager import MPVManager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+# Properties whose changes mean the playlist moved on or was edited
+PLAYLIST_PROPERTIES = ("playlist-pos", "playlist-count")
+
+
+class PlaylistQueue:
+    """Server-side play queue per instance, backed by mpv's own playlist.
+
+    Files are appended to mpv's playlist, so mpv advances on its own and,
+    with --prefetch-playlist, opens the next file before the current one
+    ends. The queue follows mpv's playlist through property-change events:
+    whenever the position moves it switches the instance's HLS audio to the
+    new file, then warms the item after it (ffprobe metadata, and an HLS
+    encoder started ahead of time) so the next transition costs nothing.
+
+    mpv stays the source of truth, so loadfile commands sent through other
+    endpoints are reflected too.
+    """
+
+    def __init__(self, manager: "MPVManager"):
+        self.manager = manager
+        # instance id -> files in mpv's playlist, in order
+        self.items: Dict[str, List[str]] = {}
+        self.positions: Dict[str, int] = {}
+        # instance id -> the upcoming file that has been warmed
+        self.warmed: Dict[str, str] = {}
+        self._listeners: Dict[str, Any] = {}
+        self._sync_tasks: Dict[str, asyncio.Task] = {}
+        self._dirty: Dict[str, bool] = {}
+        self.transitions = 0
+
+    async def enqueue(
+        self, instance_id: str, files: List[str], replace: bool = False
+    ) -> Dict[str, Any]:
+        if not files:
+            raise ValueError("Nothing to enqueue")
+        self._attach(instance_id)
+
+        if replace:
+            modes = ["replace"] + ["append"] * (len(files) - 1)
+        else:
+            # append-play starts playback when mpv is idle, and only appends
+            # otherwise
+            modes = ["append-play"] + ["append"] * (len(files) - 1)
+
+        responses = await self.manager.send_commands(
+            instance_id,
+            [
+                MPVCommand(command=["loadfile", media_file, mode], **{})
+                for media_file, mode in zip(files, modes)
+            ],
+        )
+        failed = [
+            f"{media_file}: {response.error}"
+            for media_file, response in zip(files, responses)
+            if response.error != "success"
+        ]
+        if failed:
+            logger.warning(f"Failed to enqueue on {instance_id}: {failed}")
+
+        await self._sync(instance_id)
+        return self.get_queue(instance_id)
+
+    async def clear(self, instance_id: str) -> Dict[str, Any]:
+        """Drop everything but the file that is playing"""
+        self._attach(instance_id)
+        await self.manager.send_command(
+            instance_id, MPVCommand(command=["playlist-clear"], **{})
+        )
+        await self._sync(instance_id)
+        return self.get_queue(instance_id)
+
+    def get_queue(self, instance_id: str) -> Dict[str, Any]:
+        items = self.items.get(instance_id, [])
+        position = self.positions.get(instance_id, -1)
+        warmed = self.warmed.get(instance_id)
+        return {
+            "instanceId": instance_id,
+            "position": position,
+            "count": len(items),
+            "items": [
+                {
+                    "index": index,
+                    "path": media_file,
+                    "title": Path(media_file).stem,
+                    "current": index == position,
+                    "warmed": index == position + 1 and media_file == warmed,
+                }
+                for index, media_file in enumerate(items)
+            ],
+        }
+
+    def _attach(self, instance_id: str):
+        if instance_id in self._listeners:
+            return
+
+        def on_state_change(instance_id: str, name: str, value: Any):
+            if name in PLAYLIST_PROPERTIES:
+                self._schedule_sync(instance_id)
+
+        self._listeners[instance_id] = on_state_change
+        self.manager.add_state_listener(instance_id, on_state_change)
+
+    def _schedule_sync(self, instance_id: str):
+        # playlist-pos and playlist-count usually change together, so fold
+        # changes that arrive during a sync into one more pass
+        self._dirty[instance_id] = True
+        task = self._sync_tasks.get(instance_id)
+        if task is None or task.done():
+            self._sync_tasks[instance_id] = asyncio.create_task(
+                self._sync_loop(instance_id)
+            )
+
+    async def _sync_loop(self, instance_id: str):
+        while self._dirty.pop(instance_id, False):
+            try:
+                await self._sync(instance_id)
+            except Exception as e:
+                logger.error(f"Failed to sync play queue of {instance_id}: {e}")
+
+    async def _sync(self, instance_id: str):
+        response = await self.manager.send_command(
+            instance_id,
+            MPVCommand(command=["get_property", "playlist"], **{}),
+            priority=CommandPriority.BACKGROUND,
+        )
+        if response.error != "success" or not isinstance(response.data, list):
+            return
+
+        entries = response.data
+        items = [entry.get("filename", "") for entry in entries]
+        position = next(
+            (index for index, entry in enumerate(entries) if entry.get("current")),
+            -1,
+        )
+
+        previous = self.positions.get(instance_id)
+        self.items[instance_id] = items
+        self.positions[instance_id] = position
+
+        if position != previous and position >= 0:
+            if previous is not None:
+                self.transitions += 1
+            await self._follow_current(instance_id, items[position])
+        await self._warm_next(instance_id)
+
+    async def _follow_current(self, instance_id: str, media_file: str):
+        """Point the instance's HLS audio at the file that is now playing"""
+        from services.hls_stream import hls_stream_service
+
+        instance = self.manager.instances.get(instance_id)
+        if instance is None or not instance.stream_audio:
+            return
+
+        stream = hls_stream_service.active_streams.get(instance_id)
+        if stream is not None and stream["media_file"] == media_file:
+            return
+
+        logger.info(f"Switching HLS audio of {instance_id} to {media_file}")
+        await hls_stream_service.switch_stream(instance_id, media_file)
+
+    async def _warm_next(self, instance_id: str):
+        from services.hls_stream import hls_stream_service
+
+        items = self.items.get(instance_id, [])
+        position = self.positions.get(instance_id, -1)
+        upcoming = items[position + 1] if position + 1 < len(items) else None
+        if upcoming is None:
+            # Nothing left to play after this one
+            if self.warmed.pop(instance_id, None) is not None:
+                await hls_stream_service.discard_prepared_stream(instance_id)
+            return
+        if self.warmed.get(instance_id) == upcoming:
+            return
+        self.warmed[instance_id] = upcoming
+
+        logger.info(f"Warming up {upcoming} for instance {instance_id}")
+        await hls_stream_service.probe_media_file(upcoming, background=True)
+
+        instance = self.manager.instances.get(instance_id)
+        if settings.queue_prepare_hls and instance and instance.stream_audio:
+            await hls_stream_service.prepare_stream(instance_id, upcoming)
+
+    def is_active(self, instance_id: str) -> bool:
+        return instance_id in self._listeners
+
+    def forget(self, instance_id: str):
+        listener = self._listeners.pop(instance_id, None)
+        if listener is not None:
+            self.manager.remove_state_listener(instance_id, listener)
+        task = self._sync_tasks.pop(instance_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        self._dirty.pop(instance_id, None)
+        self.items.pop(instance_id, None)
+        self.positions.pop(instance_id, None)
+        self.warmed.pop(instance_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queues": len(self._listeners),
+            "transitions": self.transitions,
+        }
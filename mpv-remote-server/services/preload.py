@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from config import settings
+from models.model import MediaFile, Track
+from services.hls_stream import hls_stream_service
+from services.mpv_manager import MPVManager
+from services.shares import MediaShare
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+def advise_willneed(path: str, length: int):
+    """Ask the kernel to start reading the head of a file into the page cache"""
+    with open(path, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, length, os.POSIX_FADV_WILLNEED)
+            return
+        # No fadvise (Windows): reading it has the same effect, just slower
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+
+
+class PreloadEngine:
+    """Gets the file after the one an instance just started ready ahead of time.
+
+    The next file is the following entry of the same share directory, in
+    the order MediaCache.get_share_files lists it. Preparing it means
+    probing it, generating its thumbnail, having the kernel read ahead its
+    first preload_readahead_bytes and, with preload_hls, starting its HLS
+    audio encoder early. That encoder is taken over when the instance
+    actually moves on to the file.
+
+    Everything runs on a single background worker, after a delay that lets
+    the starting file have the disk first, and is skipped while the box is
+    busy. Instances with a play queue are left to the queue, which warms
+    its own next item.
+    """
+
+    def __init__(self, shares: MediaShare, manager: MPVManager):
+        self.shares = shares
+        self.manager = manager
+        # (instance id, share name, next file)
+        self.queue: asyncio.Queue[Tuple[str, str, Track]] = asyncio.Queue(maxsize=16)
+        # instance id -> the next file preloaded for it
+        self.preloaded: Dict[str, str] = {}
+        self._worker: Optional[asyncio.Task] = None
+        self.stats = {"preloaded": 0, "skipped": 0, "failed": 0, "hlsTakeovers": 0}
+
+    def start(self):
+        self.manager.add_global_state_listener(self._on_state_change)
+        self._worker = asyncio.create_task(self._work())
+
+    async def shutdown(self):
+        self.manager.remove_global_state_listener(self._on_state_change)
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+
+    def _on_state_change(self, instance_id: str, name: str, value: Any):
+        if name != "path" or not value:
+            return
+
+        asyncio.create_task(self._take_over_hls(instance_id, value))
+
+        if self.manager.queue.is_active(instance_id):
+            return
+        found = self.find_next(value)
+        if found is None or self.preloaded.get(instance_id) == found[1].src:
+            return
+        try:
+            self.queue.put_nowait((instance_id, *found))
+        except asyncio.QueueFull:
+            self.stats["skipped"] += 1
+
+    def find_next(self, media_file: str) -> Optional[Tuple[str, Track]]:
+        """The share and file listed after media_file in its share directory"""
+        path = Path(media_file)
+        for share_name, share_root in settings.media_shares.items():
+            try:
+                sub_path = path.parent.relative_to(share_root).as_posix()
+            except ValueError:
+                continue
+
+            files, _ = self.shares.cache.get_share_files(
+                share_name, "" if sub_path == "." else sub_path
+            )
+            for index, track in enumerate(files):
+                if Path(track.src) == path:
+                    if index + 1 < len(files):
+                        return share_name, files[index + 1]
+                    return None
+        return None
+
+    async def _take_over_hls(self, instance_id: str, media_file: str):
+        """Switch audio streaming instances to the encoder preloaded for the
+        file they just moved on to"""
+        instance = self.manager.instances.get(instance_id)
+        if instance is None or not instance.stream_audio:
+            return
+        if self.manager.queue.is_active(instance_id):
+            return
+
+        prepared = hls_stream_service.prepared_streams.get(instance_id)
+        active = hls_stream_service.active_streams.get(instance_id)
+        if prepared is None or prepared["media_file"] != media_file:
+            return
+        if active is not None and active["media_file"] == media_file:
+            return
+
+        self.stats["hlsTakeovers"] += 1
+        await hls_stream_service.switch_stream(instance_id, media_file)
+
+    async def _work(self):
+        while True:
+            instance_id, share_name, track = await self.queue.get()
+            media_file = track.src
+            await asyncio.sleep(settings.preload_delay)
+
+            if instance_id not in self.manager.instances:
+                self.forget(instance_id)
+                continue
+            cpu = self.manager.system_usage.get("cpuPercent")
+            if cpu is not None and cpu >= settings.preload_max_cpu_percent:
+                logger.info(f"Skipping preload of {media_file}, CPU at {cpu}%")
+                self.stats["skipped"] += 1
+                continue
+
+            try:
+                await self._preload(instance_id, share_name, track)
+                self.preloaded[instance_id] = media_file
+                self.stats["preloaded"] += 1
+            except Exception as e:
+                logger.error(f"Failed to preload {media_file}: {e}")
+                self.stats["failed"] += 1
+
+    async def _preload(self, instance_id: str, share_name: str, track: Track):
+        media_file = track.src
+        logger.info(f"Preloading {media_file} for instance {instance_id}")
+
+        await asyncio.to_thread(
+            advise_willneed, media_file, settings.preload_readahead_bytes
+        )
+        await hls_stream_service.probe_media_file(media_file, background=True)
+        path = Path(media_file)
+        stat = await asyncio.to_thread(path.stat)
+        # Returns at once when the thumbnail exists already
+        await self.shares.thumbnail_generator.generate_thumbnail(
+            MediaFile(
+                id=track.id,
+                path=media_file,
+                filename=path.name,
+                shareName=share_name,
+                size=stat.st_size,
+                modifiedAt=datetime.fromtimestamp(stat.st_mtime),
+            ),
+            background=True,
+        )
+
+        instance = self.manager.instances.get(instance_id)
+        if settings.preload_hls and instance and instance.stream_audio:
+            await hls_stream_service.prepare_stream(instance_id, media_file)
+
+    def forget(self, instance_id: str):
+        self.preloaded.pop(instance_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": self.queue.qsize()}
@@ -0,0 +1,127 @@
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+PROC_AVAILABLE = os.path.exists("/proc/self/stat")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_process_ticks(pid: int) -> Optional[int]:
+    """utime + stime of a process, in clock ticks"""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # comm may contain spaces and parentheses, so split after the last ")"
+    fields = stat[stat.rfind(b")") + 2 :].split()
+    return int(fields[11]) + int(fields[12])
+
+
+def read_process_rss(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def read_system_ticks() -> Optional[Tuple[int, int]]:
+    """(busy, total) clock ticks across all CPUs"""
+    try:
+        with open("/proc/stat", "rb") as f:
+            fields = [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    # idle + iowait
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    total = sum(fields)
+    return total - idle, total
+
+
+def read_available_memory() -> Optional[int]:
+    try:
+        with open("/proc/meminfo", "rb") as f:
+            for line in f:
+                if line.startswith(b"MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class ResourceMonitor:
+    """CPU and RSS of processes, and load of the whole box, from /proc.
+
+    CPU usage is a rate, so each reading is measured against the previous
+    one for the same pid. A process is at 100% when it keeps one core busy.
+    Everything reads as None where /proc does not exist.
+    """
+
+    def __init__(self) -> None:
+        self._process_last: Dict[int, Tuple[int, float]] = {}
+        self._system_last: Optional[Tuple[int, int]] = None
+
+    def process_usage(self, pid: int) -> Dict[str, Any]:
+        usage: Dict[str, Any] = {"pid": pid, "cpuPercent": None, "rssBytes": None}
+        if not PROC_AVAILABLE:
+            return usage
+
+        ticks = read_process_ticks(pid)
+        if ticks is None:
+            self._process_last.pop(pid, None)
+            return usage
+
+        now = time.monotonic()
+        last = self._process_last.get(pid)
+        self._process_last[pid] = (ticks, now)
+        if last is not None and now > last[1]:
+            seconds = (ticks - last[0]) / CLOCK_TICKS
+            usage["cpuPercent"] = round(seconds / (now - last[1]) * 100, 1)
+
+        usage["rssBytes"] = read_process_rss(pid)
+        return usage
+
+    def system_usage(self) -> Dict[str, Any]:
+        usage: Dict[str, Any] = {
+            "cpuCount": os.cpu_count(),
+            "cpuPercent": None,
+            "memAvailableBytes": None,
+        }
+        if not PROC_AVAILABLE:
+            return usage
+
+        ticks = read_system_ticks()
+        if ticks is not None:
+            last = self._system_last
+            self._system_last = ticks
+            if last is not None and ticks[1] > last[1]:
+                usage["cpuPercent"] = round(
+                    (ticks[0] - last[0]) / (ticks[1] - last[1]) * 100, 1
+                )
+
+        usage["memAvailableBytes"] = read_available_memory()
+        return usage
+
+    def forget(self, pid: int):
+        self._process_last.pop(pid, None)
+
+    def retain(self, pids: Iterable[int]):
+        """Forget every process but ``pids``"""
+        keep = set(pids)
+        for pid in [pid for pid in self._process_last if pid not in keep]:
+            del self._process_last[pid]
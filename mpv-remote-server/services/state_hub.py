@@ -0,0 +1,309 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Union
+
+from config import settings
+from services.codec import dumps_text, response_dict
+from services.mpv_manager import OBSERVED_PROPERTIES, POLLED_PROPERTIES, mpv_manager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+def format_player_state(state: Dict[str, Any]) -> list:
+    return [
+        {
+            "command": ["get_property", name],
+            "data": response_dict(
+                "success" if state.get(name) is not None else "property unavailable",
+                state.get(name),
+            ),
+        }
+        for name in POLLED_PROPERTIES
+    ]
+
+
+# Properties a protocol 2 client may subscribe to
+DELTA_PROPERTIES = OBSERVED_PROPERTIES
+
+
+class StateSubscriber:
+    """Bounded outbox for one state WebSocket (protocol 1).
+
+    When the client falls behind, the oldest queued message is dropped so a
+    slow phone only ever misses stale snapshots and never blocks the hub.
+    """
+
+    protocol = 1
+
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue[Optional[str]] = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    async def next_message(self) -> Optional[str]:
+        return await self.queue.get()
+
+    def push(self, message: Optional[str]):
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(message)
+
+
+class DeltaStateSubscriber:
+    """Outbox for one state WebSocket speaking protocol 2.
+
+    The first message is a full snapshot of the subscribed properties,
+    after that only the ones that changed since the last message sent to
+    this client, each message numbered by ``seq``:
+
+        {"v":2,"type":"snapshot","seq":1,"state":{"pause":false,...}}
+        {"v":2,"type":"delta","seq":2,"changes":{"time-pos":12.5}}
+
+    Only the latest state is held, not a queue: a slow client or a low
+    ``max_rate`` just folds several changes into one delta, so deltas are
+    always relative to what the client has and never go missing.
+    """
+
+    protocol = 2
+
+    def __init__(self, props: List[str], max_rate: float):
+        self.props = props
+        self.min_interval = 1 / max_rate if max_rate > 0 else 0.0
+        self.seq = 0
+        self.dropped = 0
+        self._latest: Optional[Dict[str, Any]] = None
+        # What the client has; None means the next message is a snapshot
+        self._sent: Optional[Dict[str, Any]] = None
+        self._error: Optional[str] = None
+        self._closed = False
+        self._changed = asyncio.Event()
+        self._next_send_at = 0.0
+
+    def publish_state(self, state: Dict[str, Any]):
+        if self._changed.is_set() and self._latest is not None:
+            # Folded into the update still waiting to go out
+            self.dropped += 1
+        self._latest = {name: state.get(name) for name in self.props}
+        self._changed.set()
+
+    def publish_error(self, error: str):
+        self._error = error
+        self._changed.set()
+
+    def resync(self):
+        """Send a full snapshot next, e.g. after the client lost its state"""
+        self._sent = None
+        self._changed.set()
+
+    def close(self):
+        self._closed = True
+        self._changed.set()
+
+    async def next_message(self) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._changed.wait()
+            if self._closed:
+                return None
+
+            delay = self._next_send_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if self._closed:
+                    return None
+            self._changed.clear()
+
+            if self._error is not None:
+                error, self._error = self._error, None
+                return dumps_text({"v": 2, "type": "error", "error": error})
+
+            latest = self._latest
+            if latest is None:
+                continue
+
+            if self._sent is None:
+                message: Dict[str, Any] = {"type": "snapshot", "state": latest}
+            else:
+                changes = {
+                    name: value
+                    for name, value in latest.items()
+                    if self._sent.get(name) != value
+                }
+                if not changes:
+                    continue
+                message = {"type": "delta", "changes": changes}
+
+            self._sent = latest
+            self.seq += 1
+            self._next_send_at = loop.time() + self.min_interval
+            return dumps_text({"v": 2, "seq": self.seq, **message})
+
+
+Subscriber = Union[StateSubscriber, DeltaStateSubscriber]
+
+
+class StateHub:
+    """Reads each instance's player state once and fans it out to all subscribers"""
+
+    def __init__(self) -> None:
+        self.subscribers: Dict[str, Set[Subscriber]] = {}
+        self._publishers: Dict[str, asyncio.Task] = {}
+
+    def subscribe(
+        self,
+        instance_id: str,
+        protocol: int = 1,
+        props: Optional[List[str]] = None,
+        max_rate: float = 0.0,
+    ) -> Subscriber:
+        subscriber: Subscriber
+        if protocol == 2:
+            subscriber = DeltaStateSubscriber(props or POLLED_PROPERTIES, max_rate)
+        else:
+            subscriber = StateSubscriber(settings.state_subscriber_queue_size)
+
+        if instance_id not in self.subscribers:
+            self.subscribers[instance_id] = set()
+        self.subscribers[instance_id].add(subscriber)
+
+        publisher = self._publishers.get(instance_id)
+        if publisher is None or publisher.done():
+            self._publishers[instance_id] = asyncio.create_task(
+                self._publish_loop(instance_id)
+            )
+        else:
+            # Late joiners get the current snapshot without waiting for a change
+            state = mpv_manager.get_player_state(instance_id)
+            if state is not None:
+                if isinstance(subscriber, DeltaStateSubscriber):
+                    subscriber.publish_state(state)
+                else:
+                    subscriber.push(dumps_text(format_player_state(state)))
+
+        logger.debug(
+            f"State subscriber added for {instance_id} "
+            f"({len(self.subscribers[instance_id])} total)"
+        )
+        return subscriber
+
+    def unsubscribe(self, instance_id: str, subscriber: Subscriber):
+        subscribers = self.subscribers.get(instance_id)
+        if subscribers is None:
+            return
+
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self.subscribers[instance_id]
+            publisher = self._publishers.pop(instance_id, None)
+            if publisher:
+                publisher.cancel()
+            logger.debug(f"Last state subscriber left {instance_id}")
+
+    def _publish_state(self, instance_id: str, state: Dict[str, Any]):
+        # Protocol 1 clients all get the same message, so encode it once
+        message = None
+        for subscriber in list(self.subscribers.get(instance_id, set())):
+            if isinstance(subscriber, DeltaStateSubscriber):
+                subscriber.publish_state(state)
+                continue
+            if message is None:
+                message = dumps_text(format_player_state(state))
+            subscriber.push(message)
+
+    def _publish_error(self, instance_id: str, error: str):
+        for subscriber in list(self.subscribers.get(instance_id, set())):
+            if isinstance(subscriber, DeltaStateSubscriber):
+                subscriber.publish_error(error)
+            else:
+                subscriber.push(dumps_text({"error": error}))
+
+    def _close_all(self, instance_id: str):
+        for subscriber in list(self.subscribers.get(instance_id, set())):
+            if isinstance(subscriber, DeltaStateSubscriber):
+                subscriber.close()
+            else:
+                # None tells the subscriber to close its socket
+                subscriber.push(None)
+
+    async def _publish_loop(self, instance_id: str):
+        changed = asyncio.Event()
+
+        def on_state_change(instance_id: str, name: str, value):
+            changed.set()
+
+        mpv_manager.add_state_listener(instance_id, on_state_change)
+
+        try:
+            while self.subscribers.get(instance_id):
+                if instance_id not in mpv_manager.instances:
+                    logger.warning(f"Instance {instance_id} not found")
+                    self._publish_error(instance_id, "Instance not found")
+                    await asyncio.sleep(1)
+                    continue
+
+                try:
+                    observing = await mpv_manager.start_observing(instance_id)
+                except Exception as e:
+                    # The player went away; its final state is polled below
+                    logger.debug(f"Cannot observe {instance_id}: {e}")
+                    observing = False
+                if not observing:
+                    # No event stream for this instance, poll once for everyone
+                    state = await mpv_manager.poll_player_state(instance_id)
+                    self._publish_state(instance_id, state)
+                    await asyncio.sleep(settings.state_poll_interval)
+                    continue
+
+                changed.clear()
+                state = mpv_manager.get_player_state(instance_id) or {}
+                self._publish_state(instance_id, state)
+
+                # time-pos changes every frame, so coalesce bursts of changes.
+                # Events simply stop when the player exits, so look again
+                # every state_poll_interval for a connection that was closed
+                while not changed.is_set():
+                    try:
+                        await asyncio.wait_for(
+                            changed.wait(), settings.state_poll_interval
+                        )
+                    except asyncio.TimeoutError:
+                        if mpv_manager.get_player_state(instance_id) is None:
+                            break
+                if changed.is_set():
+                    await asyncio.sleep(settings.state_push_interval)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"State hub error for instance {instance_id}: {e}")
+            self._close_all(instance_id)
+        finally:
+            mpv_manager.remove_state_listener(instance_id, on_state_change)
+
+    def get_stats(self, instance_id: str) -> Dict[str, int]:
+        subscribers = self.subscribers.get(instance_id, set())
+        return {
+            "subscribers": len(subscribers),
+            "dropped": sum(s.dropped for s in subscribers),
+        }
+
+    async def shutdown(self):
+        for publisher in self._publishers.values():
+            publisher.cancel()
+        self._publishers.clear()
+        self.subscribers.clear()
+
+
+state_hub = StateHub()
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import math
+import time
+from array import array
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from config import settings
+from models.model import CommandPriority, MPVCommand, MPVInstance, MPVStatus
+
+if TYPE_CHECKING:
+    from services.mpv_manager import MPVManager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+# Sampled rather than observed: avsync and the cache state change every
+# frame, and observing them would flood the event stream
+TELEMETRY_PROPERTIES = [
+    "demuxer-cache-state",
+    "cache-buffering-state",
+    "frame-drop-count",
+    "decoder-frame-drop-count",
+    "avsync",
+    "estimated-vf-fps",
+]
+
+# Columns of a series, in order
+METRICS = [
+    "time",
+    # Seconds of media buffered ahead of the playback position
+    "cacheDuration",
+    "forwardBytes",
+    # Bytes/s the demuxer is currently reading from the source
+    "inputRate",
+    # 1 while the demuxer ran dry, 0 otherwise
+    "underrun",
+    # Percent of the cache filled while playback waits for it
+    "bufferingPercent",
+    # Cumulative counts since the file was loaded
+    "frameDrops",
+    "decoderFrameDrops",
+    "avsync",
+    "vfFps",
+]
+
+# Below this much buffered media the source is not keeping up
+STARVED_CACHE_SECONDS = 1.0
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return math.nan
+
+
+def _counter_increase(values: List[float]) -> Optional[int]:
+    """How much a counter grew, tolerating resets when a new file loads"""
+    increase = 0.0
+    last = None
+    for value in values:
+        if math.isnan(value):
+            continue
+        if last is not None:
+            increase += value - last if value >= last else value
+        last = value
+    return None if last is None else int(increase)
+
+
+class TelemetrySeries:
+    """Fixed capacity ring of samples, one array of doubles per metric.
+
+    About 80 bytes per sample however many samples are taken; a missing
+    value is stored as NaN.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.columns = {name: array("d", [math.nan]) * capacity for name in METRICS}
+        self.head = 0
+        self.count = 0
+
+    def append(self, sample: Dict[str, float]):
+        for name, column in self.columns.items():
+            column[self.head] = sample.get(name, math.nan)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def values(self, name: str, last: Optional[int] = None) -> List[float]:
+        """Oldest first, optionally only the most recent ``last`` samples"""
+        count = self.count if last is None else max(0, min(last, self.count))
+        column = self.columns[name]
+        start = (self.head - count) % self.capacity
+        if start + count <= self.capacity:
+            return column[start : start + count].tolist()
+        return column[start:].tolist() + column[: self.head].tolist()
+
+
+class TelemetryCollector:
+    """Samples playback health of every running instance at a fixed interval.
+
+    The readings tell a starved source (network share too slow: the demuxer
+    cache drains, underruns, buffering pauses) apart from an overloaded
+    decoder (cache healthy, but frames dropped and A/V drifting).
+    """
+
+    def __init__(self, manager: "MPVManager"):
+        self.manager = manager
+        self.series: Dict[str, TelemetrySeries] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def shutdown(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(settings.telemetry_interval)
+            instances = [
+                instance
+                for instance in list(self.manager.instances.values())
+                if instance.status == MPVStatus.RUNNING
+            ]
+            await asyncio.gather(
+                *[self._sample(instance) for instance in instances],
+                return_exceptions=True,
+            )
+
+    async def _sample(self, instance: MPVInstance):
+        try:
+            responses = await self.manager.send_commands(
+                instance.id,
+                [
+                    MPVCommand(command=["get_property", name], **{})
+                    for name in TELEMETRY_PROPERTIES
+                ],
+                priority=CommandPriority.BACKGROUND,
+            )
+        except Exception as e:
+            logger.debug(f"Telemetry sample failed for instance {instance.id}: {e}")
+            return
+
+        values = {
+            name: response.data if response.error == "success" else None
+            for name, response in zip(TELEMETRY_PROPERTIES, responses)
+        }
+        cache = values["demuxer-cache-state"] or {}
+
+        series = self.series.get(instance.id)
+        if series is None:
+            series = self.series[instance.id] = TelemetrySeries(
+                settings.telemetry_history
+            )
+        series.append(
+            {
+                "time": time.time(),
+                "cacheDuration": _number(cache.get("cache-duration")),
+                "forwardBytes": _number(cache.get("fw-bytes")),
+                "inputRate": _number(cache.get("raw-input-rate")),
+                "underrun": _number(cache.get("underrun")),
+                "bufferingPercent": _number(values["cache-buffering-state"]),
+                "frameDrops": _number(values["frame-drop-count"]),
+                "decoderFrameDrops": _number(values["decoder-frame-drop-count"]),
+                "avsync": _number(values["avsync"]),
+                "vfFps": _number(values["estimated-vf-fps"]),
+            }
+        )
+
+    def forget(self, instance_id: str):
+        self.series.pop(instance_id, None)
+
+    def get_health(self, instance_id: str, last: Optional[int] = None) -> Dict:
+        # Nothing sampled yet reads as an empty series
+        series = self.series.get(instance_id) or TelemetrySeries(1)
+
+        samples = {
+            name: [
+                None if math.isnan(v) else round(v, 4)
+                for v in series.values(name, last)
+            ]
+            for name in METRICS
+        }
+        return {
+            "instanceId": instance_id,
+            "interval": settings.telemetry_interval,
+            "sampleCount": len(samples["time"]),
+            "summary": self._summarize(series, last),
+            # Columnar: samples[metric][i] belongs to samples["time"][i]
+            "samples": samples,
+        }
+
+    def _summarize(self, series: TelemetrySeries, last: Optional[int]) -> Dict:
+        def present(name: str) -> List[float]:
+            return [v for v in series.values(name, last) if not math.isnan(v)]
+
+        cache = present("cacheDuration")
+        avsync = present("avsync")
+        fps = present("vfFps")
+        underruns = int(sum(present("underrun")))
+        buffering = sum(1 for v in present("bufferingPercent") if v < 100)
+        frame_drops = _counter_increase(series.values("frameDrops", last))
+        decoder_drops = _counter_increase(series.values("decoderFrameDrops", last))
+
+        starved = underruns > 0 or (
+            bool(cache) and min(cache) < STARVED_CACHE_SECONDS and buffering > 0
+        )
+        overloaded = bool(frame_drops or decoder_drops)
+        if starved:
+            verdict = "source-starved"
+        elif overloaded:
+            verdict = "decode-overload"
+        else:
+            verdict = "healthy"
+
+        return {
+            "verdict": verdict,
+            "minCacheDuration": round(min(cache), 3) if cache else None,
+            "underrunSamples": underruns,
+            "bufferingSamples": buffering,
+            "frameDrops": frame_drops,
+            "decoderFrameDrops": decoder_drops,
+            "maxAbsAvsync": round(max(abs(v) for v in avsync), 4) if avsync else None,
+            "avgVfFps": round(sum(fps) / len(fps), 3) if fps else None,
+        }
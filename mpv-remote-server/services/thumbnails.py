@@ -7,6 +7,7 @@ from concurrent.futures import ThreadPoolExecutor
 
 from models.model import MediaFile, ThumbnailResult
 from config import settings
+from services.hls_stream import background_process
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.ERROR)
@@ -37,7 +38,11 @@ class ThumbnailGenerator:
     async def start(self):
         self._worker_task = asyncio.create_task(self._process_queue())
 
-    async def generate_thumbnail(self, media_file: MediaFile) -> ThumbnailResult:
+    async def generate_thumbnail(
+        self, media_file: MediaFile, background: bool = False
+    ) -> ThumbnailResult:
+        """``background`` runs ffmpeg and ffprobe at the lowest priority, for
+        thumbnails nobody is looking at yet"""
         if not self.is_running:
             raise Exception("Thumbnail generator is not running")
 
@@ -49,7 +54,7 @@ class ThumbnailGenerator:
         self.process_cache[media_file.id] = future
 
         try:
-            result = await self._do_generate_thumbnail(media_file)
+            result = await self._do_generate_thumbnail(media_file, background)
             future.set_result(result)
             return result
         except Exception as e:
@@ -170,7 +175,9 @@ class ThumbnailGenerator:
             logger.error("Error checking ffprobe availability: %s", e)
             return False
 
-    async def _do_generate_thumbnail(self, media_file: MediaFile) -> ThumbnailResult:
+    async def _do_generate_thumbnail(
+        self, media_file: MediaFile, background: bool = False
+    ) -> ThumbnailResult:
         thumb_path = settings.thumbnails_dir / f"{media_file.id}.jpg"
         url = f"/api/thumbnails/{media_file.id}"
         logger.debug(
@@ -205,7 +212,7 @@ class ThumbnailGenerator:
                     fileId=media_file.id,
                 )
 
-            duration = await self._get_media_duration(media_file.path)
+            duration = await self._get_media_duration(media_file.path, background)
             seek_time = max(10, int(duration * 0.1))
 
             ffmpeg_args = [
@@ -221,12 +228,19 @@ class ThumbnailGenerator:
                 "-y",
                 str(thumb_path),
             ]
+            popen_args: Dict = {}
+            if background:
+                ffmpeg_args, popen_args = background_process(ffmpeg_args)
             logger.debug("Running ffmpeg command: %s", " ".join(ffmpeg_args))
 
             def run_ffmpeg_thumbnail():
                 try:
                     result = subprocess.run(
-                        ffmpeg_args, capture_output=True, text=True, timeout=60
+                        ffmpeg_args,
+                        capture_output=True,
+                        text=True,
+                        timeout=60,
+                        **popen_args,
                     )
                     return result.returncode, result.stdout, result.stderr
                 except subprocess.TimeoutExpired:
@@ -284,7 +298,9 @@ class ThumbnailGenerator:
                 fileId=media_file.id,
             )
 
-    async def _get_media_duration(self, file_path: str) -> float:
+    async def _get_media_duration(
+        self, file_path: str, background: bool = False
+    ) -> float:
         try:
             logger.debug("Getting duration for: %s", file_path)
 
@@ -293,22 +309,28 @@ class ThumbnailGenerator:
                 logger.error("FFprobe is not available or not working")
                 return 0.0
 
+            cmd = [
+                "ffprobe",
+                "-v",
+                "quiet",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "csv=p=0",
+                file_path,
+            ]
+            popen_args: Dict = {}
+            if background:
+                cmd, popen_args = background_process(cmd)
+
             def run_ffprobe_duration():
                 try:
                     result = subprocess.run(
-                        [
-                            "ffprobe",
-                            "-v",
-                            "quiet",
-                            "-show_entries",
-                            "format=duration",
-                            "-of",
-                            "csv=p=0",
-                            file_path,
-                        ],
+                        cmd,
                         capture_output=True,
                         text=True,
                         timeout=30,
+                        **popen_args,
                     )
                     return result.returncode, result.stdout, result.stderr
                 except subprocess.TimeoutExpired:
@@ -0,0 +1,103 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from config import settings
+from models.model import MPVInstance, MPVStatus
+from services.mpv_manager import AdmissionError, MPVManager
+
+GIB = 1024 * 1024 * 1024
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "mpv_max_instances", 2)
+    monkeypatch.setattr(settings, "admission_max_cpu_percent", 90.0)
+    monkeypatch.setattr(settings, "admission_min_memory_mb", 512)
+
+
+def make_manager(*statuses: MPVStatus) -> MPVManager:
+    manager = MPVManager()
+    for number, status in enumerate(statuses):
+        manager.instances[f"i{number}"] = MPVInstance(
+            id=f"i{number}",
+            pipeName=f"mpvsocket_i{number}",
+            status=status,
+            lastSeen=datetime.now(),
+        )
+    manager.system_usage = {"cpuPercent": 20.0, "memAvailableBytes": 4 * GIB}
+    return manager
+
+
+def test_admits_below_the_limits(limits):
+    # Dead instances do not count towards the cap
+    make_manager(MPVStatus.RUNNING, MPVStatus.ERROR)._check_admission()
+
+
+def test_instance_cap(limits):
+    manager = make_manager(MPVStatus.RUNNING, MPVStatus.STARTING)
+
+    with pytest.raises(AdmissionError, match="Instance limit reached"):
+        manager._check_admission()
+
+
+def test_cpu_saturated(limits):
+    manager = make_manager()
+    manager.system_usage["cpuPercent"] = 95.0
+
+    with pytest.raises(AdmissionError, match="CPU 95.0% busy"):
+        manager._check_admission()
+
+
+def test_memory_low(limits):
+    manager = make_manager()
+    manager.system_usage["memAvailableBytes"] = 256 * 1024 * 1024
+
+    with pytest.raises(AdmissionError, match="256 MiB memory available"):
+        manager._check_admission()
+
+
+def test_unknown_usage_is_admitted(limits):
+    # Platforms without /proc report no CPU or memory figures
+    manager = make_manager()
+    manager.system_usage = {"cpuPercent": None, "memAvailableBytes": None}
+
+    manager._check_admission()
+
+
+def test_rejection_is_503(limits, monkeypatch):
+    from main import app, mpv_manager
+
+    monkeypatch.setattr(mpv_manager, "system_usage", {"cpuPercent": 99.0})
+    body = json.dumps({"reuse": False}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/instances",
+        "raw_path": b"/api/instances",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+    }
+    response = {"body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    asyncio.run(app(scope, receive, send))
+
+    assert response["status"] == 503
+    assert "CPU 99.0% busy" in json.loads(response["body"])["detail"]
@@ -0,0 +1,47 @@
+import pytest
+
+from services.codec import LineFramer, MPVReply, encode_line, loads, to_response
+
+
+def test_framer_splits_complete_lines():
+    framer = LineFramer(limit=1024)
+
+    assert framer.feed(b'{"a":1}\n{"b":2}\n') == [b'{"a":1}', b'{"b":2}']
+
+
+def test_framer_carries_partial_lines_over():
+    framer = LineFramer(limit=1024)
+
+    assert framer.feed(b'{"event":') == []
+    assert framer.feed(b'"pause"}\n{"req') == [b'{"event":"pause"}']
+    assert framer.feed(b'uest_id":3}\n') == [b'{"request_id":3}']
+
+
+def test_framer_skips_blank_lines():
+    framer = LineFramer(limit=1024)
+
+    assert framer.feed(b'\n  \n{"a":1}\n\n') == [b'{"a":1}']
+
+
+def test_framer_rejects_oversized_messages():
+    framer = LineFramer(limit=8)
+
+    with pytest.raises(ValueError):
+        framer.feed(b"0123456789")
+    # The oversized line is dropped and framing starts over
+    assert framer.feed(b'{"a":1}\n') == [b'{"a":1}']
+
+
+def test_encode_line_round_trips():
+    payload = {"command": ["get_property", "time-pos"], "request_id": 7}
+    line = encode_line(payload)
+
+    assert line.endswith(b"\n") and line.count(b"\n") == 1
+    assert loads(line) == payload
+
+
+def test_to_response_defaults():
+    assert to_response({"data": 12.5, "request_id": 4}) == MPVReply("success", 12.5, 4)
+    assert to_response({"error": "property unavailable"}) == MPVReply(
+        "property unavailable"
+    )
@@ -0,0 +1,70 @@
+import asyncio
+from pathlib import Path
+
+from models.model import HLSConfig
+from services.hls_cache import CachedSegment, SegmentRing
+from services.hls_playlist import SegmentTable
+from services.hls_stream import HLSStreamService, StreamInfo
+
+
+def make_stream(out_dir: Path) -> StreamInfo:
+    return StreamInfo(
+        process=None,
+        playlist_path=out_dir / "playlist.m3u8",
+        output_dir=out_dir,
+        config=HLSConfig(),
+        media_file="/media/episode.mkv",
+        table=SegmentTable(out_dir / "playlist.m3u8"),
+        vod=None,
+    )
+
+
+def test_ring_evicts_least_recently_used():
+    ring = SegmentRing(max_segments=2, max_bytes=1000)
+    ring.put(1, CachedSegment(b"a" * 100, "1"))
+    ring.put(2, CachedSegment(b"b" * 100, "2"))
+    assert ring.get(1) is not None
+    ring.put(3, CachedSegment(b"c" * 100, "3"))
+
+    assert list(ring.segments) == [1, 3]
+    assert ring.evictions == 1
+    assert ring.bytes == 200
+
+
+def test_ring_respects_byte_budget():
+    ring = SegmentRing(max_segments=10, max_bytes=250)
+    for number in range(3):
+        ring.put(number, CachedSegment(b"x" * 100, str(number)))
+    ring.put(9, CachedSegment(b"x" * 300, "9"))
+
+    assert list(ring.segments) == [1, 2]
+    assert ring.bytes == 200
+
+
+def test_read_through_hits_under_live_playback(tmp_path):
+    """The encoder is far ahead of playback; listeners at the same position
+    share what the first of them read from disk"""
+    service = HLSStreamService()
+    # 60 segments written, playback only at the start
+    for number in range(60):
+        (tmp_path / f"segment{number}.aac").write_bytes(bytes([number]) * 1000)
+    service.active_streams["instance"] = make_stream(tmp_path)
+
+    async def play(listeners: int, segments: int):
+        for number in range(segments):
+            for _ in range(listeners):
+                cached = service.get_cached_segment("instance", number)
+                if cached is None:
+                    cached = await service.load_segment("instance", number)
+                assert cached.data == bytes([number]) * 1000
+
+    try:
+        asyncio.run(play(listeners=3, segments=20))
+    finally:
+        service.executor.shutdown()
+
+    stats = service.segment_cache.get_stats()
+    assert stats["misses"] == 20
+    assert stats["hits"] == 40
+    assert stats["hitRate"] > 0.6
+    assert stats["segments"] <= service.segment_cache.max_segments
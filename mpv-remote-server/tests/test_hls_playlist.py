@@ -0,0 +1,181 @@
+from pathlib import Path
+
+from services.hls_playlist import SegmentTable
+
+
+def playlist(first: int, durations: list, ended: bool = False) -> str:
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-TARGETDURATION:4",
+        f"#EXT-X-MEDIA-SEQUENCE:{first}",
+    ]
+    for number, duration in enumerate(durations, start=first):
+        lines.append(f"#EXTINF:{duration:.6f},")
+        lines.append(f"segment{number}.aac")
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def tag_value(text: str, tag: str) -> int:
+    for line in text.splitlines():
+        if line.startswith(f"#{tag}:"):
+            return int(line.split(":", 1)[1])
+    raise AssertionError(f"{tag} missing")
+
+
+def make_table() -> SegmentTable:
+    """Four segments from the start, then a restart at 100s with three more"""
+    table = SegmentTable(Path("playlist.m3u8"))
+    table.parse(playlist(0, [4.0, 4.0, 4.0, 4.0]))
+    table.add_run(100.0, table.next_number, Path("playlist-1.m3u8"))
+    table.parse(playlist(4, [4.0, 4.0, 2.5], ended=True))
+    return table
+
+
+def test_parse_tracks_start_times():
+    table = SegmentTable(Path("playlist.m3u8"))
+    table.parse(playlist(0, [4.0, 4.0, 3.5]))
+
+    assert [entry.start for entry in table.entries] == [0.0, 4.0, 8.0]
+    assert table.latest.end_time == 11.5
+    assert table.next_number == 3
+    assert not table.ended
+
+
+def test_runs_are_stitched_in_number_order():
+    table = make_table()
+
+    assert [entry.number for entry in table.entries] == list(range(7))
+    assert [entry.run for entry in table.entries] == [0, 0, 0, 0, 1, 1, 1]
+    assert table.entries[4].start == 100.0
+    assert table.latest_first_index() == 4
+    assert table.ended
+
+
+def test_render_marks_run_boundaries():
+    text = make_table().render(0)
+    lines = text.splitlines()
+
+    assert lines.count("#EXT-X-DISCONTINUITY") == 1
+    assert lines[lines.index("#EXT-X-DISCONTINUITY") + 2] == "segment4.aac"
+    assert tag_value(text, "EXT-X-DISCONTINUITY-SEQUENCE") == 0
+    assert lines[-1] == "#EXT-X-ENDLIST"
+
+
+def test_discontinuity_sequence_counts_tags_left_behind():
+    table = make_table()
+
+    # Opening on the new run's first segment keeps its tag in the window
+    at_boundary = table.render(4, 2)
+    assert "#EXT-X-DISCONTINUITY" in at_boundary.splitlines()
+    assert tag_value(at_boundary, "EXT-X-DISCONTINUITY-SEQUENCE") == 0
+    assert tag_value(at_boundary, "EXT-X-MEDIA-SEQUENCE") == 4
+    assert "#EXT-X-ENDLIST" not in at_boundary
+
+    past_boundary = table.render(5)
+    assert "#EXT-X-DISCONTINUITY" not in past_boundary.splitlines()
+    assert tag_value(past_boundary, "EXT-X-DISCONTINUITY-SEQUENCE") == 1
+
+
+def test_render_before_a_restarted_run_writes_anything():
+    table = make_table()
+    table.add_run(200.0, table.next_number, Path("playlist-2.m3u8"))
+    text = table.render(table.latest_first_index())
+
+    assert tag_value(text, "EXT-X-MEDIA-SEQUENCE") == 7
+    assert tag_value(text, "EXT-X-DISCONTINUITY-SEQUENCE") == 1
+    assert "#EXT-X-ENDLIST" not in text
+
+
+def test_index_at_and_covers_use_latest_run():
+    table = make_table()
+
+    assert table.index_at(100.0) == 4
+    assert table.index_at(105.0) == 5
+    assert table.index_at(110.4) == 6
+    assert table.index_at(110.5) is None
+    # Positions from the earlier run are not the latest run's
+    assert table.index_at(2.0) is None
+    assert not table.covers(2.0)
+    assert table.covers(105.0)
+    # The run has ended, so nothing more is coming past its end
+    assert not table.covers(111.0, margin=30.0)
+
+
+def test_covers_ahead_of_a_running_encoder():
+    table = SegmentTable(Path("playlist.m3u8"))
+    table.parse(playlist(0, [4.0, 4.0]))
+
+    assert table.covers(10.0, margin=5.0)
+    assert not table.covers(20.0, margin=5.0)
+
+
+def test_removed_segments_are_not_available():
+    table = make_table()
+    table.removed_below = 5
+
+    assert table.first_available() == 5
+    assert not table.covers(100.0)
+    assert table.covers(105.0)
+
+    table.removed_below = 0
+    assert table.first_available() == 0
+
+
+def test_continuation_runs_play_in_order():
+    table = SegmentTable(Path("playlist.m3u8"))
+    table.parse(playlist(0, [4.0, 4.0, 4.0], ended=True))
+    table.add_run(12.0, table.next_number, Path("playlist-1.m3u8"), continues=True)
+    table.parse(playlist(3, [4.0, 4.0]))
+
+    # The earlier run is still part of what plays, up to the latest run
+    assert table.latest_first_index() == 0
+    assert table.latest_start_time == 0.0
+    assert table.index_at(1.0) == 0
+    assert table.index_at(13.0) == 3
+    assert table.covers(1.0)
+
+    text = table.render(table.latest_first_index())
+    assert "segment0.aac" in text
+    assert text.splitlines().count("#EXT-X-DISCONTINUITY") == 1
+
+    # A seek after that starts a new span
+    table.add_run(100.0, table.next_number, Path("playlist-2.m3u8"))
+    assert table.latest_first_index() == 5
+    assert not table.covers(1.0)
+
+
+def test_parse_tail_reads_only_appended_entries():
+    table = SegmentTable(Path("playlist.m3u8"))
+    table.parse(playlist(0, [4.0, 4.0]))
+    grown = playlist(0, [4.0, 4.0, 4.0, 3.0], ended=True).encode()
+
+    offset = table.tail_offset()
+    assert 0 < offset < len(grown)
+    assert table.parse_tail(grown[offset:])
+    assert [entry.number for entry in table.entries] == [0, 1, 2, 3]
+    assert [entry.start for entry in table.entries] == [0.0, 4.0, 8.0, 12.0]
+    assert table.index_at(12.5) == 3
+    assert table.ended
+
+    # Nothing new: nothing added
+    assert table.parse_tail(grown[table.tail_offset() :])
+    assert len(table.entries) == 4
+
+
+def test_parse_tail_refuses_a_shifted_file():
+    table = SegmentTable(Path("playlist.m3u8"))
+    table.parse(playlist(0, [4.0, 4.0]))
+    # A longer header moves every entry, so the last parsed one is not
+    # where it was
+    shifted = playlist(0, [4.0, 4.0, 4.0]).replace(
+        "TARGETDURATION:4", "TARGETDURATION:10"
+    )
+
+    assert not table.parse_tail(shifted.encode()[table.tail_offset() :])
+    assert len(table.entries) == 2
+    table.parse(shifted)
+    assert len(table.entries) == 3
+    assert table.target_duration == 10
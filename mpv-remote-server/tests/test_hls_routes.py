@@ -0,0 +1,104 @@
+import asyncio
+from typing import Dict, Tuple
+
+import pytest
+
+from main import app
+from models.model import HLSConfig
+from services.hls_playlist import SegmentTable
+from services.hls_stream import StreamInfo, hls_stream_service
+
+SEGMENT = bytes(range(256)) * 4
+
+
+def get(path: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+    """One GET through the ASGI app"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+    }
+    response = {"body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {
+                k.decode(): v.decode() for k, v in message["headers"]
+            }
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    asyncio.run(app(scope, receive, send))
+    return response["status"], response["headers"], response["body"]
+
+
+@pytest.fixture(params=[True, False], ids=["cached", "from-disk"])
+def segment_url(request, tmp_path, monkeypatch):
+    """A segment of an active stream, served from the cache or the file"""
+    if not request.param:
+        monkeypatch.setattr(hls_stream_service.segment_cache, "max_segments", 0)
+    (tmp_path / "segment1.aac").write_bytes(SEGMENT)
+    playlist_path = tmp_path / "playlist.m3u8"
+    hls_stream_service.active_streams["routes"] = StreamInfo(
+        process=None,
+        playlist_path=playlist_path,
+        output_dir=tmp_path,
+        config=HLSConfig(),
+        media_file="/media/episode.mkv",
+        table=SegmentTable(playlist_path),
+        vod=None,
+        suspended=False,
+    )
+    yield "/api/instances/routes/hls/segment{}.aac"
+    hls_stream_service.active_streams.pop("routes", None)
+    hls_stream_service.segment_cache.drop("routes")
+
+
+def test_segment_is_immutable(segment_url):
+    status, headers, body = get(segment_url.format(1), {})
+
+    assert status == 200
+    assert body == SEGMENT
+    assert headers["etag"]
+    assert "immutable" in headers["cache-control"]
+
+
+def test_if_none_match_gets_304(segment_url):
+    _, headers, _ = get(segment_url.format(1), {})
+    status, not_modified, body = get(
+        segment_url.format(1), {"If-None-Match": headers["etag"]}
+    )
+
+    assert status == 304
+    assert body == b""
+    assert not_modified["etag"] == headers["etag"]
+
+    status, _, _ = get(segment_url.format(1), {"If-None-Match": '"other"'})
+    assert status == 200
+
+
+def test_range_gets_206(segment_url):
+    status, headers, body = get(segment_url.format(1), {"Range": "bytes=10-19"})
+
+    assert status == 206
+    assert headers["content-range"] == f"bytes 10-19/{len(SEGMENT)}"
+    assert body == SEGMENT[10:20]
+
+
+def test_missing_segment_gets_404(segment_url):
+    status, _, _ = get(segment_url.format(2), {})
+
+    assert status == 404
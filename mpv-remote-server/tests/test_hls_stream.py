@@ -0,0 +1,212 @@
+import asyncio
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from config import settings
+from models.model import HLSConfig
+from services.hls_playlist import SegmentTable
+from services.hls_stream import HLSStreamService, StreamInfo, wait_process
+
+SLEEPER = [sys.executable, "-c", "import time; time.sleep(60)"]
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGSTOP"), reason="needs SIGSTOP")
+def test_suspended_encoders_hold_no_executor_workers():
+    service = HLSStreamService()
+    processes = [
+        subprocess.Popen(SLEEPER) for _ in range(service.executor._max_workers + 2)
+    ]
+
+    async def main():
+        monitors = []
+        for process in processes:
+            process.send_signal(signal.SIGSTOP)
+            monitors.append(asyncio.create_task(service._monitor_process("i", process)))
+        await asyncio.sleep(0.1)
+
+        # The pool is still free for ffprobe and the like
+        loop = asyncio.get_running_loop()
+        assert (
+            await asyncio.wait_for(
+                loop.run_in_executor(service.executor, lambda: "free"), 1
+            )
+            == "free"
+        )
+
+        await asyncio.wait_for(
+            asyncio.gather(*(service._stop_encoder(p) for p in processes)), 5
+        )
+        await asyncio.wait_for(asyncio.gather(*monitors), 2)
+
+    try:
+        asyncio.run(main())
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        service.executor.shutdown()
+
+    assert all(process.returncode is not None for process in processes)
+
+
+def test_wait_process_returns_exit_code():
+    process = subprocess.Popen([sys.executable, "-c", "raise SystemExit(3)"])
+
+    assert asyncio.run(asyncio.wait_for(wait_process(process, 0.05), 5)) == 3
+    # Already reaped: returns at once
+    assert asyncio.run(wait_process(process)) == 3
+
+
+def test_refresh_table_parses_appended_tail(tmp_path):
+    service = HLSStreamService()
+    playlist_path = tmp_path / "playlist.m3u8"
+    stream = StreamInfo(
+        process=None,
+        playlist_path=playlist_path,
+        output_dir=tmp_path,
+        config=HLSConfig(),
+        media_file="/media/episode.mkv",
+        table=SegmentTable(playlist_path),
+        vod=None,
+        suspended=False,
+    )
+    header = "#EXTM3U\n#EXT-X-TARGETDURATION:6\n#EXT-X-MEDIA-SEQUENCE:0\n"
+
+    def write(count: int, target: int = 6):
+        lines = [header.replace("6", str(target), 1)]
+        lines += [f"#EXTINF:6.000000,\nsegment{n}.aac\n" for n in range(count)]
+        playlist_path.write_text("".join(lines))
+
+    async def refresh() -> SegmentTable:
+        return await service._refresh_table(stream)
+
+    try:
+        write(2)
+        table = asyncio.run(refresh())
+        assert len(table.entries) == 2
+        parsed = table.latest.parsed_bytes
+
+        write(5)
+        table = asyncio.run(refresh())
+        assert [entry.number for entry in table.entries] == [0, 1, 2, 3, 4]
+        assert table.latest.parsed_bytes > parsed
+
+        # A header of another length falls back to a full parse
+        write(6, target=10)
+        table = asyncio.run(refresh())
+        assert len(table.entries) == 6
+        assert table.target_duration == 10
+    finally:
+        service.executor.shutdown()
+
+
+def write_playlist(path, first: int, count: int, duration: float = 4.0):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:4", f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+    for number in range(first, first + count):
+        lines += [f"#EXTINF:{duration:.6f},", f"segment{number}.aac"]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def seek_stream(tmp_path, monkeypatch):
+    """A stream with segments 0-3 (0-16s) written, whose encoder restarts
+    are recorded instead of run"""
+    monkeypatch.setattr(settings, "hls_seek_restart_margin", 30.0)
+    monkeypatch.setattr(settings, "hls_list_size", 10)
+    service = HLSStreamService()
+    playlist_path = tmp_path / "playlist.m3u8"
+    write_playlist(playlist_path, 0, 4)
+    stream = StreamInfo(
+        process=None,
+        playlist_path=playlist_path,
+        output_dir=tmp_path,
+        config=HLSConfig(),
+        media_file="/media/episode.mkv",
+        table=SegmentTable(playlist_path),
+        vod=None,
+        suspended=False,
+    )
+    service.active_streams["i"] = stream
+    restarts = []
+
+    async def start_encoder(
+        instance_id,
+        media_file,
+        out_dir,
+        config,
+        playlist_path,
+        start_time=0.0,
+        start_number=0,
+        background=False,
+    ):
+        restarts.append((start_time, start_number, playlist_path.name))
+        return None
+
+    monkeypatch.setattr(service, "_start_encoder", start_encoder)
+    return service, stream, restarts
+
+
+def follow_seek_to(service, stream, monkeypatch, position: float):
+    monkeypatch.setattr(service, "_playback_position", lambda i, s: position)
+    asyncio.run(service._follow_seek("i", stream, 1.0))
+
+
+def test_seek_within_reach_keeps_encoder(tmp_path, monkeypatch):
+    service, stream, restarts = seek_stream(tmp_path, monkeypatch)
+    try:
+        # Already encoded, then ahead of the encoder but within the margin
+        for position in (10.0, 16.0 + 29.0):
+            follow_seek_to(service, stream, monkeypatch, position)
+        assert restarts == []
+        assert service.seek_stats == {}
+    finally:
+        service.executor.shutdown()
+
+
+def test_seek_past_margin_restarts_encoder(tmp_path, monkeypatch):
+    service, stream, restarts = seek_stream(tmp_path, monkeypatch)
+    try:
+        follow_seek_to(service, stream, monkeypatch, 500.0)
+
+        # Once, at the position, numbering on after the last segment
+        assert restarts == [(500.0, 4, "playlist-1.m3u8")]
+        assert service.pending_seeks["i"] == (1.0, 4)
+        assert service.seek_stats["i"] == {"restarts": 1}
+        table = stream["table"]
+        assert table.latest.start_time == 500.0
+        assert table.latest_first_index() == 4
+
+        # A seek back into what the old run encoded restarts again
+        follow_seek_to(service, stream, monkeypatch, 5.0)
+        assert restarts[-1] == (5.0, 4, "playlist-2.m3u8")
+    finally:
+        service.executor.shutdown()
+
+
+def test_rendered_playlist_opens_on_the_new_run(tmp_path, monkeypatch):
+    service, stream, restarts = seek_stream(tmp_path, monkeypatch)
+    try:
+        follow_seek_to(service, stream, monkeypatch, 500.0)
+        write_playlist(tmp_path / "playlist-1.m3u8", 4, 3)
+
+        text = asyncio.run(service.render_playlist("i"))
+        lines = text.splitlines()
+        uris = [line for line in lines if line.endswith(".aac")]
+
+        # Nothing from before the seek, which holds the wrong audio
+        assert uris == ["segment4.aac", "segment5.aac", "segment6.aac"]
+        assert lines[lines.index("#EXT-X-DISCONTINUITY") + 2] == "segment4.aac"
+        assert "#EXT-X-MEDIA-SEQUENCE:4" in lines
+        assert "#EXT-X-DISCONTINUITY-SEQUENCE:0" in lines
+
+        # Playing further in, the window slides with one segment of slack
+        monkeypatch.setattr(service, "_playback_position", lambda i, s: 509.0)
+        lines = asyncio.run(service.render_playlist("i")).splitlines()
+        assert [line for line in lines if line.endswith(".aac")][0] == "segment5.aac"
+        assert "#EXT-X-DISCONTINUITY" not in lines
+        assert "#EXT-X-DISCONTINUITY-SEQUENCE:1" in lines
+    finally:
+        service.executor.shutdown()
@@ -0,0 +1,155 @@
+from pathlib import Path
+
+import pytest
+
+from models.model import HLSConfig
+from services.hls_vod import (
+    PREROLL_FRAMES,
+    PRIMING_FRAMES,
+    TIMESTAMP_OWNER,
+    VODEncoderPool,
+    VODStream,
+    split_adts,
+    timestamp_tag,
+)
+
+
+def adts_frame(length: int, fill: int = 0) -> bytes:
+    """An ADTS frame of ``length`` bytes, header included"""
+    header = bytes(
+        [
+            0xFF,
+            0xF1,
+            0x4C,
+            0x80 | (length >> 11) & 0x03,
+            (length >> 3) & 0xFF,
+            ((length & 0x07) << 5) | 0x1F,
+            0xFC,
+        ]
+    )
+    return header + bytes([fill]) * (length - 7)
+
+
+def make_stream(duration: float = 60.0, sample_rate: int = 48000) -> VODStream:
+    async def on_segment(info):
+        pass
+
+    return VODStream(
+        "instance",
+        "/media/episode.mkv",
+        Path("/tmp/unused"),
+        HLSConfig(segment_duration=6),
+        duration,
+        {"sample_rate": sample_rate, "channels": 2},
+        VODEncoderPool(1),
+        3,
+        on_segment,
+    )
+
+
+def test_split_adts_uses_all_length_bits():
+    # Lengths whose 13 bits spread over all three header bytes
+    frames = [adts_frame(7), adts_frame(300, 1), adts_frame(2100, 2), adts_frame(9)]
+
+    assert split_adts(b"".join(frames)) == frames
+
+
+def test_split_adts_leaves_out_a_truncated_last_frame():
+    frames = [adts_frame(100), adts_frame(120, 1)]
+    data = b"".join(frames) + adts_frame(200, 2)[:150]
+
+    assert split_adts(data) == frames
+    # A header cut short is left out as well
+    assert split_adts(b"".join(frames) + adts_frame(50)[:5]) == frames
+
+
+def test_split_adts_rejects_lost_sync():
+    with pytest.raises(ValueError):
+        split_adts(adts_frame(100) + b"\x00" * 20)
+    with pytest.raises(ValueError):
+        split_adts(adts_frame(6))
+
+
+def test_segments_cover_every_frame_once():
+    stream = make_stream()
+    frame = 1024 / 48000
+
+    assert stream.segment_frames == round(6 / frame)
+    assert stream.total_frames == 2813
+    assert stream.segment_count == 11
+
+    position = 0.0
+    frames = 0
+    for number in range(stream.segment_count):
+        start, length = stream.segment_range(number)
+        assert start == pytest.approx(position)
+        position = start + length
+        frames += stream.segment_frames_range(number)[1]
+    assert frames == stream.total_frames
+    # The last segment holds what is left over
+    assert stream.segment_frames_range(10) == (2810, 3)
+
+
+def test_first_segment_has_no_preroll():
+    stream = make_stream()
+    start, length, skip, count = stream.encode_range(0)
+
+    assert start == 0.0
+    assert skip == PRIMING_FRAMES
+    assert count == stream.segment_frames
+    assert length == pytest.approx((skip + count + 1) * stream.frame_seconds)
+
+
+def test_later_segments_start_preroll_frames_early():
+    stream = make_stream()
+    for number in (1, stream.segment_count - 1):
+        first, frames = stream.segment_frames_range(number)
+        start, length, skip, count = stream.encode_range(number)
+
+        assert start == pytest.approx((first - PREROLL_FRAMES) * stream.frame_seconds)
+        assert skip == PREROLL_FRAMES + PRIMING_FRAMES
+        assert count == frames
+        # Keeping frames [skip:skip + count] lands exactly on the segment
+        kept_from = start + (skip - PRIMING_FRAMES) * stream.frame_seconds
+        assert kept_from == pytest.approx(first * stream.frame_seconds)
+
+
+def test_preroll_is_cut_short_near_the_start():
+    stream = make_stream(duration=0.1)
+    stream.segment_frames = 2
+
+    start, _, skip, _ = stream.encode_range(1)
+    assert start == 0.0
+    assert skip == 2 + PRIMING_FRAMES
+
+
+def test_playlist_durations_match_segments():
+    stream = make_stream()
+    lines = stream.render_playlist().splitlines()
+    durations = [
+        float(line[len("#EXTINF:") :].rstrip(","))
+        for line in lines
+        if line.startswith("#EXTINF:")
+    ]
+
+    assert len(durations) == stream.segment_count
+    assert sum(durations) == pytest.approx(stream.total_frames * stream.frame_seconds)
+    assert "#EXT-X-TARGETDURATION:6" in lines
+    assert lines[-1] == "#EXT-X-ENDLIST"
+
+
+def test_timestamp_tag_bytes():
+    tag = timestamp_tag(10.0)
+    payload = TIMESTAMP_OWNER + (900000).to_bytes(8, "big")
+    frame = b"PRIV" + bytes([0, 0, 0, len(payload)]) + b"\x00\x00" + payload
+
+    assert tag == b"ID3\x04\x00\x00" + bytes([0, 0, 0, len(frame)]) + frame
+    assert len(tag) == 10 + 10 + 45 + 8
+
+
+def test_timestamp_tag_sizes_are_syncsafe_and_pts_wraps():
+    # 33 bits of 90 kHz ticks wrap after about 26.5 hours
+    wrap = (1 << 33) / 90000
+    assert timestamp_tag(wrap + 1.0)[-8:] == (90000).to_bytes(8, "big")
+    # No size byte may have its top bit set
+    assert all(byte < 0x80 for byte in timestamp_tag(1.0)[6:10])
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from benchmarks.fake_mpv import FakeMPVServer
+from services.mpv_ipc import MPVIPCConnection
+
+
+def run_with_server(test, **server_args):
+    """Run ``test(server, connection)`` against a fake mpv"""
+
+    async def main():
+        path = os.path.join(tempfile.mkdtemp(), "mpvsocket")
+        async with FakeMPVServer(path, **server_args) as server:
+            connection = MPVIPCConnection(path)
+            await connection.connect()
+            try:
+                return await test(server, connection)
+            finally:
+                await connection.close()
+
+    return asyncio.run(main())
+
+
+def get_property(name: str, request_id: int) -> dict:
+    return {"command": ["get_property", name], "request_id": request_id}
+
+
+def test_concurrent_requests_get_their_own_replies():
+    names = ["volume", "pause", "duration", "title", "aid", "mpv-version"]
+
+    async def test(server, connection):
+        return await asyncio.gather(
+            *(
+                connection.request(get_property(name, request_id))
+                for request_id, name in enumerate(names, start=1)
+            )
+        )
+
+    replies = run_with_server(test, response_delay=0.001)
+    assert [reply["request_id"] for reply in replies] == list(range(1, 7))
+    assert [reply["data"] for reply in replies] == [
+        100.0,
+        False,
+        1440.0,
+        "fake.mkv",
+        1,
+        "mpv 0.38.0 (fake)",
+    ]
+
+
+def test_events_are_dispatched_alongside_replies():
+    async def test(server, connection):
+        events = []
+        connection.event_listeners.add(events.append)
+        await connection.request(
+            {"command": ["observe_property", 1, "pause"], "request_id": 1}
+        )
+        reply = await connection.request(
+            {"command": ["set_property", "pause", True], "request_id": 2}
+        )
+        server.emit_event("seek")
+        await asyncio.sleep(0.05)
+        return reply, events
+
+    reply, events = run_with_server(test)
+    assert reply == {"error": "success", "request_id": 2}
+    # The initial value on observing, then the change
+    assert events == [
+        {"event": "property-change", "id": 1, "name": "pause", "data": False},
+        {"event": "property-change", "id": 1, "name": "pause", "data": True},
+        {"event": "seek"},
+    ]
+
+
+def test_pending_requests_fail_when_the_socket_drops():
+    async def test(server, connection):
+        closed = []
+        connection.close_listeners.add(lambda: closed.append(True))
+        pending = asyncio.create_task(connection.request(get_property("volume", 1)))
+        await asyncio.sleep(0.05)
+        assert connection.pending_count == 1
+        await server.stop()
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(pending, 1)
+        return closed, connection.pending_count, connection.is_connected
+
+    closed, pending_count, connected = run_with_server(test, response_delay=5)
+    assert closed == [True]
+    assert pending_count == 0
+    assert not connected
+
+
+def test_request_many_sends_one_write():
+    async def test(server, connection):
+        writes = []
+        write = connection._writer.write
+
+        def counting_write(data):
+            writes.append(data)
+            write(data)
+
+        connection._writer.write = counting_write
+        replies = await connection.request_many(
+            [get_property(name, n) for n, name in enumerate(["pause", "volume"], 1)]
+        )
+        return replies, writes
+
+    replies, writes = run_with_server(test)
+    assert len(writes) == 1
+    assert writes[0].count(b"\n") == 2
+    assert [(reply["request_id"], reply["data"]) for reply in replies] == [
+        (1, False),
+        (2, 100.0),
+    ]
+
+
+def test_request_on_closed_connection_raises():
+    async def test(server, connection):
+        await connection.close()
+        with pytest.raises(ConnectionError):
+            await connection.request(get_property("volume", 1))
+
+    run_with_server(test)
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from config import settings
+
+# python-mpv raises OSError on import when libmpv itself is missing
+try:
+    from services.mpv_libmpv import (
+        CLIENT_NAME,
+        LibMPVBackend,
+        LibMPVConnection,
+        parse_mpv_args,
+    )
+except (ImportError, OSError) as e:
+    pytest.skip(f"python-mpv/libmpv unavailable: {e}", allow_module_level=True)
+
+import mpv  # noqa: E402
+
+from services.mpv_backend import create_backend  # noqa: E402
+
+
+def test_create_backend_picks_libmpv():
+    assert isinstance(create_backend("libmpv"), LibMPVBackend)
+
+
+def test_parse_mpv_args(monkeypatch):
+    monkeypatch.setattr(settings, "libmpv_options", {"hwdec": "auto"})
+    options, files = parse_mpv_args(
+        [
+            "mpv",
+            "--input-ipc-server=/tmp/mpvsocket_x",
+            "--player-operation-mode=pseudo-gui",
+            "--idle",
+            "--volume=50",
+            "/media/episode.mkv",
+        ]
+    )
+
+    assert "input-ipc-server" not in options
+    assert "player-operation-mode" not in options
+    assert options["idle"] == "yes"
+    assert options["volume"] == "50"
+    assert options["osc"] == "yes"
+    assert options["hwdec"] == "auto"
+    assert files == ["/media/episode.mkv"]
+
+
+def test_connection_speaks_ipc_replies():
+    player = mpv.MPV(idle="yes", vo="null", ao="null")
+
+    async def main():
+        connection = LibMPVConnection(player, asyncio.get_running_loop())
+        try:
+            set_reply = await connection.request(
+                {"command": ["set_property", "volume", 40], "request_id": 1}
+            )
+            replies = await connection.request_many(
+                [
+                    {"command": ["get_property", "volume"], "request_id": 2},
+                    {"command": ["client_name"], "request_id": 3},
+                    {"command": ["get_property", "no-such-property"], "request_id": 4},
+                    {"command": [], "request_id": 5},
+                ]
+            )
+            return set_reply, replies
+        finally:
+            await connection.close()
+
+    try:
+        set_reply, replies = asyncio.run(main())
+    finally:
+        player.terminate()
+
+    assert set_reply == {"error": "success", "request_id": 1}
+    assert replies[0] == {"error": "success", "request_id": 2, "data": 40.0}
+    assert replies[1]["data"] == CLIENT_NAME
+    assert replies[2]["error"] != "success"
+    assert replies[3]["error"] == "invalid parameter"
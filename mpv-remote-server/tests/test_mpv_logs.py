@@ -0,0 +1,86 @@
+import asyncio
+import subprocess
+import sys
+
+from services.mpv_logs import MAX_LINE_BYTES, LogRing, MPVLogCollector
+
+
+def test_ring_drops_oldest_lines():
+    ring = LogRing(3)
+    for n in range(5):
+        ring.append("stdout", f"line {n}\n".encode())
+    # Blank lines are not kept
+    ring.append("stdout", b"  \n")
+
+    assert [entry[4] for entry in ring.lines] == ["line 2", "line 3", "line 4"]
+    assert [entry[0] for entry in ring.lines] == [3, 4, 5]
+    assert (ring.seq, ring.dropped) == (5, 2)
+
+
+def test_lines_are_classified_by_stream_and_text():
+    ring = LogRing(10)
+    ring.append("stdout", b"Playing: episode.mkv")
+    ring.append("stderr", b"[ffmpeg] deprecated pixel format used")
+    ring.append("stderr", b"Failed to open episode.mkv.")
+    ring.append("stdout", b"Cannot load cover art")
+
+    assert [entry[3] for entry in ring.lines] == ["info", "warn", "error", "error"]
+
+
+def test_query_filters_level_limit_and_since():
+    ring = LogRing(10)
+    for line in (b"a", b"b error", b"c", b"d error"):
+        ring.append("stdout", line)
+
+    def texts(level: str, limit: int = 0, since: int = 0):
+        return [entry[4] for entry in ring.query(level, limit, since)]
+
+    assert texts("info") == ["a", "b error", "c", "d error"]
+    assert texts("error") == ["b error", "d error"]
+    assert texts("info", limit=2) == ["c", "d error"]
+    assert texts("info", since=2) == ["c", "d error"]
+
+
+def test_long_lines_are_cut():
+    ring = LogRing(1)
+    ring.append("stdout", b"x" * (MAX_LINE_BYTES * 2))
+
+    assert len(ring.lines[0][4]) == MAX_LINE_BYTES
+
+
+def test_collector_drains_process_pipes():
+    collector = MPVLogCollector(100)
+    script = (
+        "import sys\n"
+        "print('first'); print('second', end='\\r'); print('third')\n"
+        "print('could not open device', file=sys.stderr)\n"
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-c", script],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    async def main():
+        collector.attach("i", process)
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if not collector._drains.get("i"):
+                break
+        return collector.get_logs("i")
+
+    try:
+        logs = asyncio.run(main())
+    finally:
+        process.wait()
+
+    lines = [(line["stream"], line["level"], line["text"]) for line in logs["lines"]]
+    assert sorted(lines) == [
+        ("stderr", "error", "could not open device"),
+        ("stdout", "info", "first"),
+        ("stdout", "info", "second"),
+        ("stdout", "info", "third"),
+    ]
+    # Both pipes hit EOF once the process exited
+    assert not logs["draining"]
+    assert collector.get_logs("other") is None
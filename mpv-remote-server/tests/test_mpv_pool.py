@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+import pytest
+
+from config import settings
+from models.model import MPVInstance, MPVStatus
+from services.mpv_pool import MPVWarmPool
+
+
+class FakeProcess:
+    def __init__(self):
+        self.pid = 4242
+        self.returncode: Optional[int] = None
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+
+class FakeManager:
+    """The parts of MPVManager the warm pool calls"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.created = 0
+        self.disposed = []
+        self.unhealthy = set()
+
+    async def create_pooled_instance(self) -> MPVInstance:
+        if self.failures:
+            self.failures -= 1
+            raise Exception("mpv did not start")
+        self.created += 1
+        return MPVInstance(
+            id=f"pooled-{self.created}",
+            pipeName=f"mpvsocket_pooled_{self.created}",
+            status=MPVStatus.RUNNING,
+            lastSeen=datetime.now(),
+            process=FakeProcess(),
+        )
+
+    async def dispose_instance(self, instance: MPVInstance):
+        self.disposed.append(instance.id)
+
+    async def probe_instance(self, instance: MPVInstance, timeout: float):
+        if instance.id in self.unhealthy:
+            raise asyncio.TimeoutError()
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        await sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+
+def test_refill_fills_to_size():
+    manager = FakeManager()
+    pool = MPVWarmPool(manager, 2)
+
+    async def main():
+        pool.refill()
+        # A refill already running is not started twice
+        pool.refill()
+        await pool._refill_task
+
+    asyncio.run(main())
+    assert [instance.id for instance in pool.idle] == ["pooled-1", "pooled-2"]
+    assert pool.spawned == 2
+
+
+def test_refill_gives_up_after_repeated_failures(no_backoff):
+    manager = FakeManager(failures=5)
+    pool = MPVWarmPool(manager, 2)
+
+    async def main():
+        pool.refill()
+        await pool._refill_task
+
+    asyncio.run(main())
+    assert pool.idle == []
+    assert manager.failures == 2
+
+
+def test_claim_skips_dead_instances():
+    manager = FakeManager()
+    pool = MPVWarmPool(manager, 3)
+
+    async def main():
+        pool.refill()
+        await pool._refill_task
+        pool.idle[0].process.returncode = 1
+        claimed = await pool.claim()
+        pool.idle.clear()
+        return claimed, await pool.claim()
+
+    claimed, missed = asyncio.run(main())
+    assert claimed.id == "pooled-2"
+    assert missed is None
+    assert manager.disposed == ["pooled-1"]
+    assert (pool.hits, pool.misses, pool.discarded) == (1, 1, 1)
+
+
+def test_health_loop_replaces_failing_instances(monkeypatch):
+    monkeypatch.setattr(settings, "mpv_pool_health_interval", 0.01)
+    manager = FakeManager()
+    pool = MPVWarmPool(manager, 2)
+
+    async def main():
+        await pool.start()
+        await pool._refill_task
+        manager.unhealthy.add("pooled-1")
+        pool.idle[1].process.returncode = 0
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if manager.created == 4 and len(pool.idle) == 2:
+                break
+        await pool.shutdown()
+
+    asyncio.run(main())
+    assert manager.disposed[:2] == ["pooled-1", "pooled-2"]
+    assert pool.discarded == 2
+    assert manager.created == 4
+    # Shutdown disposes of the replacements as well
+    assert sorted(manager.disposed[2:]) == ["pooled-3", "pooled-4"]
+    assert pool.idle == []
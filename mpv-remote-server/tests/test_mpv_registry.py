@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from models.model import MPVInstance, MPVStatus
+from services import mpv_manager as mpv_manager_module
+from services.mpv_manager import MPVManager
+from services.mpv_registry import AdoptedProcess, MPVRegistry, pid_alive
+
+
+class FakeProcess:
+    def __init__(self, pid: int):
+        self.pid = pid
+
+
+def make_instance(instance_id: str, pid: int, stream_audio: bool = False):
+    return MPVInstance(
+        id=instance_id,
+        pipeName=f"mpvsocket_{instance_id}",
+        status=MPVStatus.RUNNING,
+        lastSeen=datetime.now(),
+        streamAudio=stream_audio,
+        process=FakeProcess(pid),
+    )
+
+
+def test_registry_round_trip(tmp_path):
+    path = tmp_path / "mpv-instances.json"
+    registry = MPVRegistry(path)
+    registry.record(make_instance("a", 101), "/tmp/mpvsocket_a")
+    registry.record(make_instance("b", 102, True), "/tmp/mpvsocket_b", pooled=True)
+    registry.remove("a")
+
+    records = MPVRegistry(path).load()
+    assert list(records) == ["b"]
+    assert records["b"]["pid"] == 102
+    assert records["b"]["address"] == "/tmp/mpvsocket_b"
+    assert records["b"]["streamAudio"] is True
+    assert records["b"]["pooled"] is True
+    # Written through a temporary file that is renamed over the registry
+    assert not path.with_suffix(".tmp").exists()
+
+
+def test_failed_save_keeps_previous_registry(tmp_path, monkeypatch):
+    path = tmp_path / "mpv-instances.json"
+    registry = MPVRegistry(path)
+    registry.record(make_instance("a", 101), "/tmp/mpvsocket_a")
+
+    def broken_dump(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json, "dump", broken_dump)
+    registry.record(make_instance("b", 102), "/tmp/mpvsocket_b")
+    monkeypatch.undo()
+
+    assert list(MPVRegistry(path).load()) == ["a"]
+
+
+def test_corrupt_registry_loads_empty(tmp_path):
+    path = tmp_path / "mpv-instances.json"
+    path.write_text('{"instances": {"a": ')
+
+    assert MPVRegistry(path).load() == {}
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs /proc")
+def test_pid_alive():
+    assert pid_alive(os.getpid())
+
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    assert not pid_alive(process.pid)
+
+    # Exited but not reaped yet
+    zombie = subprocess.Popen([sys.executable, "-c", "pass"])
+    try:
+        os.waitid(os.P_PID, zombie.pid, os.WEXITED | os.WNOWAIT)
+        assert not pid_alive(zombie.pid)
+        assert AdoptedProcess(zombie.pid).poll() == 0
+    finally:
+        zombie.wait()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs Unix sockets")
+def test_collect_stale_sockets(tmp_path, monkeypatch):
+    stale = str(tmp_path / "mpvsocket_stale")
+    live = str(tmp_path / "mpvsocket_live")
+    adopted = str(tmp_path / "mpvsocket_adopted")
+
+    # Bound and closed without unlinking: nobody accepts on it any more
+    for path in (stale, adopted):
+        dead = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        dead.bind(path)
+        dead.close()
+
+    monkeypatch.setattr(
+        mpv_manager_module, "list_socket_paths", lambda: [stale, live, adopted]
+    )
+    manager = MPVManager()
+
+    async def main():
+        server = await asyncio.start_unix_server(lambda r, w: w.close(), live)
+        async with server:
+            await manager._collect_stale_sockets({adopted})
+            # It still accepts connections, so it is not ours to remove
+            assert os.path.exists(live)
+
+    asyncio.run(main())
+
+    assert not os.path.exists(stale)
+    assert os.path.exists(adopted)
+    assert manager.registry.sockets_removed == 1
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs Unix sockets")
+def test_adopted_streaming_player_gets_encoder_and_logs(tmp_path, monkeypatch):
+    from benchmarks.fake_mpv import FakeMPVServer
+    from services.hls_stream import hls_stream_service
+
+    # Stands in for the mpv process the previous server started
+    player = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    pipe_name = f"mpvsocket_test_{os.getpid()}"
+    registry_path = tmp_path / "mpv-instances.json"
+    registry_path.write_text(
+        json.dumps(
+            {
+                "instances": {
+                    "adopted": {
+                        "pid": player.pid,
+                        "pipeName": pipe_name,
+                        "address": f"/tmp/{pipe_name}",
+                        "streamAudio": True,
+                        "pooled": False,
+                    }
+                }
+            }
+        )
+    )
+    started = []
+
+    async def start_stream(instance_id, media_file, config=None):
+        started.append((instance_id, media_file))
+        return True
+
+    monkeypatch.setattr(hls_stream_service, "start_stream", start_stream)
+    monkeypatch.setattr(mpv_manager_module, "list_socket_paths", lambda: [])
+    manager = MPVManager()
+    manager.registry = MPVRegistry(registry_path)
+
+    async def main():
+        properties = {"pid": player.pid, "path": "/media/episode.mkv"}
+        async with FakeMPVServer(f"/tmp/{pipe_name}", properties=properties):
+            await manager.adopt_instances()
+            await asyncio.sleep(0.05)
+            logs = manager.logs.get_logs("adopted")
+            await manager.supervisor.shutdown()
+            await manager.release_instance(manager.instances["adopted"])
+            return logs
+
+    try:
+        logs = asyncio.run(main())
+    finally:
+        player.kill()
+        player.wait()
+
+    assert manager.registry.adopted == 1
+    assert started == [("adopted", "/media/episode.mkv")]
+    assert logs is not None
+    assert logs["lines"] == [] and not logs["draining"]
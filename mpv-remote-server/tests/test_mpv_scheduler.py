@@ -0,0 +1,118 @@
+import asyncio
+
+from config import settings
+from models.model import CommandPriority
+from services.mpv_scheduler import CommandScheduler
+
+
+def recorder(log: list, name: str, delay: float = 0.0):
+    async def run():
+        log.append(name)
+        if delay:
+            await asyncio.sleep(delay)
+        return name
+
+    return run
+
+
+def test_lone_seek_is_not_delayed():
+    async def main():
+        loop = asyncio.get_running_loop()
+        scheduler = CommandScheduler("test")
+        log: list = []
+        started = loop.time()
+        result = await scheduler.submit(recorder(log, "seek 10"), coalesce_key="seek")
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(main())
+    assert result == "seek 10"
+    assert elapsed < settings.command_coalesce_window / 2
+
+
+def test_seek_burst_coalesces_to_latest():
+    async def main():
+        scheduler = CommandScheduler("test")
+        log: list = []
+        first = asyncio.create_task(
+            scheduler.submit(recorder(log, "seek 1"), coalesce_key="seek")
+        )
+        await asyncio.sleep(0)
+        rest = [
+            asyncio.create_task(
+                scheduler.submit(recorder(log, f"seek {n}"), coalesce_key="seek")
+            )
+            for n in range(2, 6)
+        ]
+        results = await asyncio.gather(first, *rest)
+        return log, results, scheduler.get_stats()
+
+    log, results, stats = asyncio.run(main())
+    # The first goes out at once, the rest fold into one at the window's end
+    assert log == ["seek 1", "seek 5"]
+    assert results == ["seek 1"] + ["seek 5"] * 4
+    assert stats["interactive"]["dropped"] == 3
+
+
+def test_discrete_commands_are_barriers():
+    async def main():
+        scheduler = CommandScheduler("test")
+        log: list = []
+        await scheduler.submit(recorder(log, "seek 1"), coalesce_key="seek")
+        tasks = [
+            asyncio.create_task(scheduler.submit(recorder(log, name), coalesce_key=key))
+            for name, key in [
+                ("seek 2", "seek"),
+                ("pause", None),
+                ("seek 3", "seek"),
+            ]
+        ]
+        await asyncio.gather(*tasks)
+        return log
+
+    assert asyncio.run(main()) == ["seek 1", "seek 2", "pause", "seek 3"]
+
+
+def test_other_keys_dispatch_while_a_seek_settles():
+    async def main():
+        scheduler = CommandScheduler("test")
+        log: list = []
+        await scheduler.submit(recorder(log, "seek 1"), coalesce_key="seek")
+        seek = asyncio.create_task(
+            scheduler.submit(recorder(log, "seek 2"), coalesce_key="seek")
+        )
+        volume = asyncio.create_task(
+            scheduler.submit(recorder(log, "volume 50"), coalesce_key="volume")
+        )
+        await volume
+        settling = list(log)
+        await seek
+        return settling, log
+
+    settling, log = asyncio.run(main())
+    assert settling == ["seek 1", "volume 50"]
+    assert log == ["seek 1", "volume 50", "seek 2"]
+
+
+def test_interactive_lane_is_not_held_up_by_background():
+    async def main():
+        scheduler = CommandScheduler("test")
+        log: list = []
+        background = [
+            asyncio.create_task(
+                scheduler.submit(
+                    recorder(log, f"poll {n}", delay=0.2),
+                    priority=CommandPriority.BACKGROUND,
+                )
+            )
+            for n in range(10)
+        ]
+        await asyncio.sleep(0)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await scheduler.submit(recorder(log, "pause"))
+        elapsed = loop.time() - started
+        scheduler.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        return elapsed
+
+    assert asyncio.run(main()) < 0.1
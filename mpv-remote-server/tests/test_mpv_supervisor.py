@@ -0,0 +1,212 @@
+import asyncio
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from config import settings
+from models.model import MPVInstance, MPVStatus
+from services.mpv_supervisor import MPVSupervisor
+
+
+class FakeProcess:
+    def __init__(self, pid: int = 4242):
+        self.pid = pid
+
+
+class FakeManager:
+    """The parts of MPVManager the supervisor calls"""
+
+    def __init__(self, relaunch_failures: int = 0):
+        self.instances = {}
+        self.relaunch_failures = relaunch_failures
+        self.relaunched = []
+        self.stopped_streams = []
+
+    def get_player_state(self, instance_id):
+        return {"path": "/media/episode.mkv", "time-pos": 12.5}
+
+    async def release_instance(self, instance):
+        instance.process = None
+
+    async def relaunch_instance(self, instance, state):
+        self.relaunched.append(state)
+        if len(self.relaunched) <= self.relaunch_failures:
+            raise Exception("mpv did not start")
+        instance.process = FakeProcess()
+        instance.status = MPVStatus.RUNNING
+
+    async def dispose_instance(self, instance):
+        instance.process = None
+
+    async def stop_hls_stream(self, instance_id):
+        self.stopped_streams.append(instance_id)
+
+    async def remove_instance(self, instance):
+        self.instances.pop(instance.id, None)
+
+
+def make_instance(manager: FakeManager, process=None) -> MPVInstance:
+    instance = MPVInstance(
+        id="instance",
+        pipeName="mpvsocket_instance",
+        status=MPVStatus.RUNNING,
+        lastSeen=datetime.now(),
+        process=process or FakeProcess(),
+    )
+    manager.instances[instance.id] = instance
+    return instance
+
+
+@pytest.fixture
+def restart_settings(monkeypatch):
+    monkeypatch.setattr(settings, "mpv_auto_restart", True)
+    monkeypatch.setattr(settings, "mpv_restart_max_attempts", 3)
+    monkeypatch.setattr(settings, "mpv_restart_initial_backoff", 1.0)
+    monkeypatch.setattr(settings, "mpv_restart_max_backoff", 3.0)
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Backoff delays the supervisor sleeps for, without sleeping"""
+    recorded = []
+    sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        recorded.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    return recorded
+
+
+def run_exit(supervisor: MPVSupervisor, instance: MPVInstance, exit_code):
+    async def main():
+        supervisor._started_at[instance.id] = asyncio.get_running_loop().time()
+        await supervisor._handle_exit(instance, exit_code)
+        task = supervisor._restart_tasks.get(instance.id)
+        if task is not None:
+            await task
+        await supervisor.shutdown()
+
+    asyncio.run(main())
+
+
+def test_crash_restarts_with_backoff(restart_settings, delays, monkeypatch):
+    manager = FakeManager(relaunch_failures=2)
+    supervisor = MPVSupervisor(manager)
+    instance = make_instance(manager)
+    watched = []
+    monkeypatch.setattr(supervisor, "watch", watched.append)
+
+    run_exit(supervisor, instance, 1)
+
+    assert delays == [1.0, 2.0, 3.0]
+    assert manager.relaunched == [manager.get_player_state(instance.id)] * 3
+    assert instance.status == MPVStatus.RUNNING
+    assert instance.restarts == 1
+    assert watched == [instance]
+    assert (supervisor.crashes, supervisor.restarts) == (1, 1)
+    assert manager.stopped_streams == []
+
+
+def test_gives_up_after_max_attempts(restart_settings, delays):
+    manager = FakeManager(relaunch_failures=10)
+    supervisor = MPVSupervisor(manager)
+    instance = make_instance(manager)
+
+    run_exit(supervisor, instance, 1)
+
+    assert len(manager.relaunched) == 3
+    assert instance.status == MPVStatus.ERROR
+    assert manager.stopped_streams == [instance.id]
+    assert supervisor.restarts == 0
+
+
+def test_clean_exit_is_not_restarted(restart_settings, delays):
+    manager = FakeManager()
+    supervisor = MPVSupervisor(manager)
+    instance = make_instance(manager)
+
+    run_exit(supervisor, instance, 0)
+
+    assert manager.relaunched == []
+    assert instance.status == MPVStatus.STOPPED
+    assert supervisor.crashes == 0
+
+
+def test_stopped_instance_is_not_restarted(restart_settings, delays):
+    manager = FakeManager()
+    supervisor = MPVSupervisor(manager)
+    instance = make_instance(manager)
+    instance.status = MPVStatus.STOPPED
+
+    run_exit(supervisor, instance, 1)
+
+    assert manager.relaunched == []
+    assert instance.status == MPVStatus.STOPPED
+
+
+def test_attempts_reset_after_a_healthy_run(restart_settings, monkeypatch):
+    monkeypatch.setattr(settings, "mpv_restart_reset_after", 60.0)
+    supervisor = MPVSupervisor(FakeManager())
+
+    async def main():
+        now = asyncio.get_running_loop().time()
+        supervisor._attempts["instance"] = 3
+        supervisor._started_at["instance"] = now
+        exhausted = supervisor._may_restart("instance")
+        supervisor._started_at["instance"] = now - 61.0
+        return exhausted, supervisor._may_restart("instance")
+
+    assert asyncio.run(main()) == (False, True)
+    assert supervisor._attempts["instance"] == 0
+
+
+def watch_real_process(supervisor: MPVSupervisor, manager: FakeManager):
+    """Watch a child that exits with code 3, returning what _handle_exit saw"""
+    process = subprocess.Popen([sys.executable, "-c", "raise SystemExit(3)"])
+    instance = make_instance(manager, process)
+    exit_codes = []
+
+    async def handle_exit(instance, exit_code):
+        exit_codes.append(exit_code)
+
+    supervisor._handle_exit = handle_exit
+
+    async def main():
+        supervisor.watch(instance)
+        for _ in range(100):
+            if exit_codes:
+                break
+            await asyncio.sleep(0.05)
+        await supervisor.shutdown()
+
+    try:
+        asyncio.run(main())
+    finally:
+        process.wait()
+    return exit_codes
+
+
+@pytest.mark.skipif(not hasattr(os, "pidfd_open"), reason="needs pidfd_open")
+def test_exit_is_seen_through_pidfd():
+    manager = FakeManager()
+    supervisor = MPVSupervisor(manager)
+
+    assert watch_real_process(supervisor, manager) == [3]
+    assert (supervisor.pidfd_watches, supervisor.thread_watches) == (1, 0)
+
+
+def test_exit_is_seen_from_a_thread_without_pidfd(monkeypatch):
+    def no_pidfd(pid):
+        raise OSError("pidfd_open not supported")
+
+    monkeypatch.setattr(os, "pidfd_open", no_pidfd, raising=False)
+    manager = FakeManager()
+    supervisor = MPVSupervisor(manager)
+
+    assert watch_real_process(supervisor, manager) == [3]
+    assert (supervisor.pidfd_watches, supervisor.thread_watches) == (0, 1)
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+from services.state_hub import DeltaStateSubscriber, StateSubscriber
+
+
+async def next_json(subscriber: DeltaStateSubscriber) -> dict:
+    message = await asyncio.wait_for(subscriber.next_message(), 1)
+    assert message is not None
+    return json.loads(message)
+
+
+def test_delta_starts_with_snapshot_then_sends_changes():
+    async def main():
+        subscriber = DeltaStateSubscriber(["time-pos", "pause"], max_rate=0)
+        subscriber.publish_state({"time-pos": 1.0, "pause": False, "volume": 50})
+        first = await next_json(subscriber)
+        subscriber.publish_state({"time-pos": 2.0, "pause": False, "volume": 60})
+        second = await next_json(subscriber)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == {
+        "v": 2,
+        "seq": 1,
+        "type": "snapshot",
+        "state": {"time-pos": 1.0, "pause": False},
+    }
+    # volume is not subscribed, pause did not change
+    assert second == {"v": 2, "seq": 2, "type": "delta", "changes": {"time-pos": 2.0}}
+
+
+def test_delta_folds_updates_and_skips_no_ops():
+    async def main():
+        subscriber = DeltaStateSubscriber(["time-pos", "pause"], max_rate=0)
+        subscriber.publish_state({"time-pos": 1.0, "pause": False})
+        await next_json(subscriber)
+
+        # Several updates before the client reads fold into one delta
+        for position in (2.0, 3.0, 4.0):
+            subscriber.publish_state({"time-pos": position, "pause": False})
+        folded = await next_json(subscriber)
+
+        # An update that changes nothing subscribed sends nothing
+        subscriber.publish_state({"time-pos": 4.0, "pause": False})
+        subscriber.publish_state({"time-pos": 4.0, "pause": True})
+        paused = await next_json(subscriber)
+        return folded, paused, subscriber.dropped
+
+    folded, paused, dropped = asyncio.run(main())
+    assert folded["changes"] == {"time-pos": 4.0}
+    assert paused == {"v": 2, "seq": 3, "type": "delta", "changes": {"pause": True}}
+    assert dropped == 3
+
+
+def test_delta_resync_errors_and_close():
+    async def main():
+        subscriber = DeltaStateSubscriber(["pause"], max_rate=0)
+        subscriber.publish_state({"pause": False})
+        await next_json(subscriber)
+
+        subscriber.resync()
+        snapshot = await next_json(subscriber)
+        subscriber.publish_error("Instance not found")
+        error = await next_json(subscriber)
+        subscriber.close()
+        closed = await asyncio.wait_for(subscriber.next_message(), 1)
+        return snapshot, error, closed
+
+    snapshot, error, closed = asyncio.run(main())
+    assert snapshot["type"] == "snapshot" and snapshot["seq"] == 2
+    assert error == {"v": 2, "type": "error", "error": "Instance not found"}
+    assert closed is None
+
+
+def test_delta_respects_max_rate():
+    async def main():
+        loop = asyncio.get_running_loop()
+        subscriber = DeltaStateSubscriber(["time-pos"], max_rate=10)
+        subscriber.publish_state({"time-pos": 1.0})
+        await next_json(subscriber)
+        started = loop.time()
+        subscriber.publish_state({"time-pos": 2.0})
+        await next_json(subscriber)
+        return loop.time() - started
+
+    assert asyncio.run(main()) >= 0.09
+
+
+def test_protocol_1_drops_oldest_when_full():
+    async def main():
+        subscriber = StateSubscriber(max_queue=2)
+        for message in ("a", "b", "c"):
+            subscriber.push(message)
+        return [await subscriber.next_message() for _ in range(2)], subscriber.dropped
+
+    assert asyncio.run(main()) == (["b", "c"], 1)
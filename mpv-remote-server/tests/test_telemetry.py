@@ -0,0 +1,106 @@
+import math
+
+from services.telemetry import (
+    TelemetryCollector,
+    TelemetrySeries,
+    _counter_increase,
+)
+
+
+def test_series_wraps_around_oldest_first():
+    series = TelemetrySeries(3)
+    for n in range(5):
+        series.append({"time": float(n), "avsync": n / 10})
+
+    assert series.values("time") == [2.0, 3.0, 4.0]
+    assert series.values("time", last=2) == [3.0, 4.0]
+    assert series.values("time", last=10) == [2.0, 3.0, 4.0]
+    assert series.values("time", last=0) == []
+    # Metrics missing from a sample are NaN
+    assert all(math.isnan(v) for v in series.values("vfFps"))
+
+
+def test_counter_increase_survives_resets():
+    assert _counter_increase([2.0, 5.0, math.nan, 7.0]) == 5
+    # A new file restarts the count at zero
+    assert _counter_increase([10.0, 12.0, 1.0, 3.0]) == 5
+    assert _counter_increase([math.nan]) is None
+
+
+def health(samples):
+    collector = TelemetryCollector(None)
+    series = collector.series["i"] = TelemetrySeries(10)
+    for time, sample in enumerate(samples):
+        series.append({"time": float(time), **sample})
+    return collector.get_health("i")
+
+
+def test_healthy_playback():
+    report = health(
+        [
+            {
+                "cacheDuration": 20.0,
+                "underrun": 0.0,
+                "bufferingPercent": 100.0,
+                "frameDrops": 3.0,
+                "decoderFrameDrops": 0.0,
+                "vfFps": 24.0,
+            }
+        ]
+        * 3
+    )
+
+    assert report["sampleCount"] == 3
+    assert report["summary"]["verdict"] == "healthy"
+    assert report["summary"]["frameDrops"] == 0
+    assert report["summary"]["avgVfFps"] == 24.0
+
+
+def test_starved_source():
+    report = health(
+        [
+            {"cacheDuration": 8.0, "underrun": 0.0, "bufferingPercent": 100.0},
+            {"cacheDuration": 0.4, "underrun": 0.0, "bufferingPercent": 35.0},
+            # Dropped frames too, but the starved source explains them
+            {"cacheDuration": 0.0, "underrun": 1.0, "frameDrops": 4.0},
+        ]
+    )
+
+    summary = report["summary"]
+    assert summary["verdict"] == "source-starved"
+    assert summary["minCacheDuration"] == 0.0
+    assert (summary["underrunSamples"], summary["bufferingSamples"]) == (1, 1)
+
+
+def test_overloaded_decoder():
+    report = health(
+        [
+            {
+                "cacheDuration": 30.0,
+                "underrun": 0.0,
+                "decoderFrameDrops": 0.0,
+                "avsync": 0.01,
+            },
+            {
+                "cacheDuration": 30.0,
+                "underrun": 0.0,
+                "decoderFrameDrops": 12.0,
+                "avsync": -0.25,
+            },
+        ]
+    )
+
+    summary = report["summary"]
+    assert summary["verdict"] == "decode-overload"
+    assert summary["decoderFrameDrops"] == 12
+    assert summary["maxAbsAvsync"] == 0.25
+    assert report["samples"]["avsync"] == [0.01, -0.25]
+    assert report["samples"]["vfFps"] == [None, None]
+
+
+def test_unsampled_instance_reads_empty():
+    report = TelemetryCollector(None).get_health("missing")
+
+    assert report["sampleCount"] == 0
+    assert report["summary"]["verdict"] == "healthy"
+    assert report["summary"]["frameDrops"] is None